@@ -182,6 +182,10 @@ Commands:
         enable_memory=args.enable_memory
     )
 
+    # Models load in the background, the first request waits only if it needs them
+    from src.warmup import start_warmup
+    start_warmup(enable_memory=args.enable_memory)
+
     # Run interactive session
     try:
         await run_interactive_session(thread_id=args.thread_id, graph=agent_app)
@@ -196,6 +196,10 @@ Multi-Agent Communication:
         await connection_manager.connect()
         print("Connected to agent network\n")
 
+        # Registered on the bus, load the models in the background while the graph is built
+        from src.warmup import start_warmup
+        start_warmup(enable_memory=args.enable_memory)
+
         # Build and compile the agent graph with communication enabled
         from src.agent.agent_graph import create_agent_app
 
@@ -1,8 +1,8 @@
+import asyncio
 from typing import Literal
 from langchain_anthropic import ChatAnthropic
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver    # type: ignore 
-from langchain_core.messages import ToolMessage                  # type: ignore
 import aiosqlite                                                     # type: ignore
 
 from src.config import (
@@ -10,7 +10,11 @@ from src.config import (
     AGENT_MODEL,
     AGENT_TEMPERATURE,
     AGENT_CHECKPOINT_DB,
-    AGENT_VERBOSE
+    AGENT_VERBOSE,
+    AGENT_PLAN_FAST_PATH,
+    AGENT_PLAN_CACHE_SIZE,
+    AGENT_TOOL_WORKERS,
+    AGENT_TOOL_TIMEOUT
 )
 from src.agent.agent_state import ReviewAgentState
 from src.agent.prompts import get_system_prompt
@@ -20,15 +24,15 @@ from src.agent.tools import (
     log_reviews_to_notion,
     get_current_datetime
 )
-from src.agent.tools.memory_tool import memory_search_tool
-from src.memory.qdrant_store import QdrantStore
-from src.memory.memory_manager import ClaudeMemoryManager
 
 # Import communication tool (will be created dynamically when needed)
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../..')))
 
+from common.agent.PlanRouter import PlanRouter
+from common.agent.ToolExecutor import ToolExecutor
+
 
 class ReviewAgent:
     """A Review Classification Agent class for analyzing customer reviews"""
@@ -75,6 +79,11 @@ class ReviewAgent:
         # add memory components if enabled
         if self.enable_memory:
             try:
+                # chromadb and the embedding model are only needed with memory on
+                from src.agent.tools.memory_tool import memory_search_tool
+                from src.memory.qdrant_store import QdrantStore
+                from src.memory.memory_manager import ClaudeMemoryManager
+
                 self.tools.append(memory_search_tool)
                 self.memory_store = QdrantStore(collection_name="ReviewAgent")
                 self.memory_manager = ClaudeMemoryManager()
@@ -93,6 +102,12 @@ class ReviewAgent:
         # Bind tools to LLM
         self.llm_with_tools = self.llm.bind_tools(self.tools)
 
+        # decides when the planner can be skipped and caches plans per request
+        self.plan_router = PlanRouter(enabled=AGENT_PLAN_FAST_PATH, cache_size=AGENT_PLAN_CACHE_SIZE)
+
+        # tools_by_name is built once here, not on every tools_node call
+        self.tool_executor = ToolExecutor(self.tools, max_workers=AGENT_TOOL_WORKERS, timeout=AGENT_TOOL_TIMEOUT)
+
         if AGENT_VERBOSE:
             print(f"[{self.name}] Initialized with {len(self.tools)} tools")
             print(f"[{self.name}] Critique enabled: {self.enable_critique}")
@@ -132,7 +147,11 @@ class ReviewAgent:
 
         return {}
 
-    def planner(self, state: ReviewAgentState) -> ReviewAgentState:
+    async def aretrieve_memory(self, state: ReviewAgentState) -> ReviewAgentState:
+        """retrieve_memory on a worker thread, the vector store client is synchronous"""
+        return await asyncio.to_thread(self.retrieve_memory, state)
+
+    async def planner(self, state: ReviewAgentState) -> ReviewAgentState:
         """
         Create a step-by-step plan for handling the user's request
 
@@ -148,6 +167,21 @@ class ReviewAgent:
         # Get the latest user message
         user_message = state["messages"][-1].content if state["messages"] else ""
 
+        # no plan for acknowledgements and notifications, an empty plan also clears the previous turn's
+        if not self.plan_router.needs_plan(user_message):
+            if AGENT_VERBOSE:
+                print(f"[{self.name}] No plan needed, going straight to chat")
+            return {"plan": ""}
+
+        # plans depend on retrieved memories, so only plans made without any are reused
+        use_cache = not state.get("memory_context")
+        if use_cache:
+            plan = self.plan_router.cached_plan(user_message)
+            if plan is not None:
+                if AGENT_VERBOSE:
+                    print(f"[{self.name}] Reusing cached plan:\n{plan}")
+                return {"plan": plan}
+
         system_msg = (
             "You are an expert planner for a review classification system. "
             "Create a concise, step-by-step plan to answer the user's request. "
@@ -164,14 +198,16 @@ class ReviewAgent:
 
         planner_messages = [("system", system_msg), ("user", user_message)]
 
-        plan = self.llm.invoke(planner_messages).content
+        plan = (await self.llm.ainvoke(planner_messages)).content
+        if use_cache:
+            self.plan_router.remember(user_message, plan)
 
         if AGENT_VERBOSE:
             print(f"[{self.name}] Plan created:\n{plan}")
 
         return {"plan": plan}
 
-    def chat(self, state: ReviewAgentState) -> ReviewAgentState:
+    async def chat(self, state: ReviewAgentState) -> ReviewAgentState:
         """
         Main agent node that processes messages and calls tools
 
@@ -201,7 +237,7 @@ class ReviewAgent:
         messages_with_prompt = [("system", system_prompt)] + state["messages"]
 
         # Invoke LLM with tools
-        ai_response = self.llm_with_tools.invoke(messages_with_prompt)
+        ai_response = await self.llm_with_tools.ainvoke(messages_with_prompt)
 
         if AGENT_VERBOSE:
             if hasattr(ai_response, "tool_calls") and ai_response.tool_calls:
@@ -212,51 +248,36 @@ class ReviewAgent:
 
         return {"messages": [ai_response]}
 
-    def tools_node(self, state: ReviewAgentState) -> ReviewAgentState:
+    async def tools_node(self, state: ReviewAgentState) -> ReviewAgentState:
         """
-        Execute tools called by the agent
+        Execute tools called by the agent, independent calls run concurrently
 
         Args:
             state: Current agent state
 
         Returns:
-            Updated state with tool results
+            Updated state with tool results, in the order of the tool calls
         """
-        outputs = []
         last_message = state["messages"][-1]
 
-        tools_by_name = {tool.name: tool for tool in self.tools}
-
-        if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-            for tool_call in last_message.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-                tool_id = tool_call["id"]
+        if not (hasattr(last_message, "tool_calls") and last_message.tool_calls):
+            return {"messages": []}
 
-                if AGENT_VERBOSE:
-                    print(f"[Tool] Executing {tool_name}...")
+        if AGENT_VERBOSE:
+            print(f"[Tool] Executing {[tc['name'] for tc in last_message.tool_calls]}...")
 
-                tool = tools_by_name[tool_name]
-                try:
-                    result = tool.invoke(tool_args)
-                    if AGENT_VERBOSE:
-                        print(f"[Tool] {tool_name} completed successfully")
-                except Exception as e:
-                    result = f"Error executing {tool_name}: {str(e)}"
-                    if AGENT_VERBOSE:
-                        print(f"[Tool] {tool_name} failed: {str(e)}")
+        outputs = await self.tool_executor.run(last_message.tool_calls)
 
-                # Create tool message
-                tool_message = ToolMessage(
-                    content=result,
-                    name=tool_name,
-                    tool_call_id=tool_id
-                )
-                outputs.append(tool_message)
+        if AGENT_VERBOSE:
+            for tool_message in outputs:
+                if isinstance(tool_message.content, str) and tool_message.content.startswith("Error executing"):
+                    print(f"[Tool] {tool_message.name} failed: {tool_message.content}")
+                else:
+                    print(f"[Tool] {tool_message.name} completed successfully")
 
         return {"messages": outputs}
 
-    def critique(self, state: ReviewAgentState) -> ReviewAgentState:
+    async def critique(self, state: ReviewAgentState) -> ReviewAgentState:
         """
         Review the agent's response for quality and completeness
 
@@ -289,7 +310,7 @@ class ReviewAgent:
             ("system", critique_prompt)
         ]
 
-        critique = self.llm.invoke(critique_message).content
+        critique = (await self.llm.ainvoke(critique_message)).content
 
         if AGENT_VERBOSE:
             print(f"[{self.name}] Critique: {critique}")
@@ -384,6 +405,14 @@ class ReviewAgent:
 
         return {}
 
+    async def astore_memory(self, state: ReviewAgentState) -> ReviewAgentState:
+        """store_memory on a worker thread, extraction and the vector store are synchronous"""
+        return await asyncio.to_thread(self.store_memory, state)
+
+    def close(self):
+        """Release the tool thread pool"""
+        self.tool_executor.shutdown()
+
     async def build_graph(self, connection) -> StateGraph:
         """
         Build and compile the agent graph with checkpointing
@@ -409,8 +438,8 @@ class ReviewAgent:
             graph.add_node("critique", self.critique)
 
         if self.enable_memory:
-            graph.add_node("retrieve_memory", self.retrieve_memory)
-            graph.add_node("store_memory", self.store_memory)
+            graph.add_node("retrieve_memory", self.aretrieve_memory)
+            graph.add_node("store_memory", self.astore_memory)
 
         # Add edges
         if self.enable_memory:
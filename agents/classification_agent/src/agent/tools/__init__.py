@@ -1,16 +1,29 @@
 """Agent Tools for Review Classification"""
 
-# Import tool classes
-from src.agent.tools.criticality_tool import CriticalityTool
-from src.agent.tools.sentiment_tool import SentimentTool
-from src.agent.tools.notion_tool import NotionTool
-from src.agent.tools.date_time import DateTime
+import importlib
+
+# Tool modules are imported on first access, so importing the package stays cheap
+_LAZY = {
+    # Tool classes
+    "CriticalityTool": "src.agent.tools.criticality_tool",
+    "SentimentTool": "src.agent.tools.sentiment_tool",
+    "NotionTool": "src.agent.tools.notion_tool",
+    "DateTime": "src.agent.tools.date_time",
+    # Default instances for backward compatibility
+    "classify_review_criticality": "src.agent.tools.criticality_tool",
+    "analyze_review_sentiment": "src.agent.tools.sentiment_tool",
+    "log_reviews_to_notion": "src.agent.tools.notion_tool",
+    "get_current_datetime": "src.agent.tools.date_time",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Import default instances for backward compatibility
-from src.agent.tools.criticality_tool import classify_review_criticality
-from src.agent.tools.sentiment_tool import analyze_review_sentiment
-from src.agent.tools.notion_tool import log_reviews_to_notion
-from src.agent.tools.date_time import get_current_datetime
 
 __all__ = [
     # Tool classes (for direct instantiation with custom config)
@@ -11,7 +11,7 @@ from langchain_core.tools import BaseTool
 from src.config import AGENT_MODEL
 from src.utils import RawReview
 from src.nodes.detect_errors import detect_errors_with_ollama
-from src.database import load_unprocessed_reviews, get_connection
+from src.database import load_unprocessed_reviews, load_reviews_by_ids
 
 
 class CriticalityTool(BaseTool):
@@ -74,44 +74,7 @@ class CriticalityTool(BaseTool):
         Returns:
             List of RawReview objects
         """
-        if not review_ids:
-            return []
-
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        placeholders = ','.join(['%s'] * len(review_ids))
-        query = f"""
-            SELECT review_id, review, username, email, date, reviewer_name, rating
-            FROM raw_reviews
-            WHERE review_id IN ({placeholders})
-            ORDER BY created_at DESC
-        """
-
-        cursor.execute(query, review_ids)
-        rows = cursor.fetchall()
-
-        reviews = []
-        for row in rows:
-            # Convert datetime to string
-            date_str = row[4]
-            if hasattr(date_str, 'strftime'):
-                date_str = date_str.strftime('%Y-%m-%d %H:%M:%S')
-
-            reviews.append(RawReview(
-                review_id=row[0],
-                review=row[1],
-                username=row[2],
-                email=row[3],
-                date=str(date_str),
-                reviewer_name=row[5],
-                rating=row[6]
-            ))
-
-        cursor.close()
-        conn.close()
-
-        return reviews
+        return load_reviews_by_ids(review_ids)
 
     def _load_unprocessed_reviews(self, limit: int) -> List[RawReview]:
         """
@@ -128,8 +91,7 @@ class CriticalityTool(BaseTool):
         else:
             # Fallback to CSV
             from src.nodes.load_reviews import load_reviews
-            all_reviews = load_reviews(self.data_path)
-            return all_reviews[:limit]
+            return load_reviews(self.data_path, stop=limit)
 
     def _classify_errors(self, reviews: List[RawReview]) -> List[dict]:
         """
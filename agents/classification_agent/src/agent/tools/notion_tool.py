@@ -115,8 +115,11 @@ class NotionTool(BaseTool):
                 rating=review_item.get("rating", 3)
             )
 
-            # Get sentiment data for this review
+            # Get sentiment data for this review, reuse an earlier score when the payload has none
             sentiment_data = sentiment_map.get(review_id)
+            if sentiment_data is None and review.review:
+                from src.nodes.sentiment_analysis import cached_sentiment
+                sentiment_data = cached_sentiment(review)
 
             # Process each error in the review
             errors = review_item.get("errors", [])
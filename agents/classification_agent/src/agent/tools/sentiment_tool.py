@@ -8,9 +8,8 @@ import json
 from typing import Optional, List, Any, Dict
 from langchain_core.tools import BaseTool
 
-from src.utils import RawReview
-from src.nodes.sentiment_analysis import analyze_review_sentiment as analyze_sentiment_node
-from src.database import load_unprocessed_reviews
+from src.utils import RawReview, SentimentData
+from src.database import load_unprocessed_reviews, load_reviews_by_ids
 
 
 class SentimentTool(BaseTool):
@@ -73,46 +72,7 @@ class SentimentTool(BaseTool):
         Returns:
             List of RawReview objects
         """
-        if not review_ids:
-            return []
-
-        from src.database import get_connection
-
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        placeholders = ','.join(['%s'] * len(review_ids))
-        query = f"""
-            SELECT review_id, review, username, email, date, reviewer_name, rating
-            FROM raw_reviews
-            WHERE review_id IN ({placeholders})
-            ORDER BY created_at DESC
-        """
-
-        cursor.execute(query, review_ids)
-        rows = cursor.fetchall()
-
-        reviews = []
-        for row in rows:
-            # Convert datetime to string
-            date_str = row[4]
-            if hasattr(date_str, 'strftime'):
-                date_str = date_str.strftime('%Y-%m-%d %H:%M:%S')
-
-            reviews.append(RawReview(
-                review_id=row[0],
-                review=row[1],
-                username=row[2],
-                email=row[3],
-                date=str(date_str),
-                reviewer_name=row[5],
-                rating=row[6]
-            ))
-
-        cursor.close()
-        conn.close()
-
-        return reviews
+        return load_reviews_by_ids(review_ids)
 
     def _load_unprocessed_reviews(self, limit: int) -> List[RawReview]:
         """
@@ -129,8 +89,7 @@ class SentimentTool(BaseTool):
         else:
             # Fallback to CSV
             from src.nodes.load_reviews import load_reviews
-            all_reviews = load_reviews(self.data_path)
-            return all_reviews[:limit]
+            return load_reviews(self.data_path, stop=limit)
 
     def _analyze_sentiments(self, reviews: List[RawReview]) -> List[dict]:
         """
@@ -142,23 +101,23 @@ class SentimentTool(BaseTool):
         Returns:
             List of sentiment analysis results
         """
+        # torch and transformers are only imported once the tool is actually used
+        from src.nodes.sentiment_analysis import analyze_review_sentiment as analyze_sentiment_node, analyze_batch_sentiments
+
+        try:
+            return [self._format_result(review, sentiment_data)
+                    for review, sentiment_data in zip(reviews, analyze_batch_sentiments(reviews))]
+        except Exception as batch_error:
+            # one bad review fails the whole batch, redo them one by one to isolate it
+            print(f"  Batched sentiment failed ({type(batch_error).__name__}: {batch_error}), analyzing one by one")
+
         results = []
 
         for idx, review in enumerate(reviews, 1):
             try:
                 sentiment_data = analyze_sentiment_node(review)
 
-                results.append({
-                    "review_id": review.review_id,
-                    "review_text": review.review[:200] + "..." if len(review.review) > 200 else review.review,
-                    "rating": review.rating,
-                    "reviewer_name": review.reviewer_name,
-                    "sentiment": {
-                        "overall_sentiment": sentiment_data.overall_sentiment,
-                        "confidence": round(sentiment_data.overall_confidence, 4),
-                        "polarity": round(sentiment_data.sentiment_polarity, 4)
-                    }
-                })
+                results.append(self._format_result(review, sentiment_data))
 
                 # Progress logging
                 if idx % 10 == 0:
@@ -183,6 +142,19 @@ class SentimentTool(BaseTool):
 
         return results
 
+    def _format_result(self, review: RawReview, sentiment_data: SentimentData) -> dict:
+        return {
+            "review_id": review.review_id,
+            "review_text": review.review[:200] + "..." if len(review.review) > 200 else review.review,
+            "rating": review.rating,
+            "reviewer_name": review.reviewer_name,
+            "sentiment": {
+                "overall_sentiment": sentiment_data.overall_sentiment,
+                "confidence": round(sentiment_data.overall_confidence, 4),
+                "polarity": round(sentiment_data.sentiment_polarity, 4)
+            }
+        }
+
     def _run(
         self,
         review_ids: Optional[List[str]] = None,
@@ -0,0 +1,258 @@
+"""
+Persistent Result Cache
+
+Content-addressed SQLite cache for expensive results (LLM classifications, model
+outputs). Entries are grouped by namespace, expire after a TTL, and the least
+recently used entries are evicted once a namespace is over its size limit.
+
+A namespace can carry a version (e.g. a hash of the prompt that produced the
+results). Opening it with a different version drops the old entries, so changing
+the prompt invalidates everything computed with the previous one.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from src.config import (RESULT_CACHE_ENABLED, RESULT_CACHE_PATH, RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES,
+                        RESULT_CACHE_TOUCH_INTERVAL)
+
+# keys per SELECT ... IN query, below SQLite's limit on bound parameters
+_KEYS_PER_QUERY = 500
+
+
+def make_key(*parts: Any) -> str:
+    """sha256 of the parts joined with '|'"""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    One namespace of the on-disk result cache.
+
+    Values are stored as JSON. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        path: str = RESULT_CACHE_PATH,
+        version: Optional[str] = None,
+        ttl: float = RESULT_CACHE_TTL,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        touch_interval: float = RESULT_CACHE_TOUCH_INTERVAL,
+    ):
+        """
+        Open (or create) a cache namespace.
+
+        Args:
+            namespace (str): Name separating this cache from others in the same file
+            path (str): SQLite file
+            version (str): Entries written under another version are dropped on open
+            ttl (float): Seconds an entry stays valid, 0 keeps entries until evicted
+            max_entries (int): Entries kept in the namespace, 0 for no limit
+            touch_interval (float): A hit only writes the entry's access time when the stored
+                one is older than this many seconds, so most hits are plain reads
+        """
+        self.namespace = namespace
+        self.path = path
+        self.version = version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (namespace, accessed)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS namespaces (namespace TEXT PRIMARY KEY, version TEXT)"
+            )
+        if version is not None:
+            self._check_version(version)
+
+    def _check_version(self, version: str):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT version FROM namespaces WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+            if row is not None and row[0] != version:
+                dropped = self._conn.execute(
+                    "DELETE FROM results WHERE namespace = ?", (self.namespace,)
+                ).rowcount
+                print(f"[ResultCache] {self.namespace}: version changed, dropped {dropped} entries")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO namespaces (namespace, version) VALUES (?, ?)",
+                (self.namespace, version),
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for key, None on a miss or when the entry has expired"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Look up several keys at once.
+
+        Expired entries are deleted. Access times are only written for entries
+        last touched more than touch_interval seconds ago, all in one transaction.
+
+        Returns:
+            Dict[str, Any]: Cached value per key found, misses and expired keys are left out
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock, self._conn:
+            rows = []
+            for start in range(0, len(keys), _KEYS_PER_QUERY):
+                chunk = keys[start:start + _KEYS_PER_QUERY]
+                rows.extend(self._conn.execute(
+                    f"SELECT key, value, created, accessed FROM results "
+                    f"WHERE namespace = ? AND key IN ({', '.join('?' * len(chunk))})",
+                    (self.namespace, *chunk),
+                ).fetchall())
+            expired, touched = [], []
+            for key, value, created, accessed in rows:
+                if self.ttl > 0 and now - created > self.ttl:
+                    expired.append((self.namespace, key))
+                    continue
+                if now - accessed >= self.touch_interval:
+                    touched.append((now, self.namespace, key))
+                found[key] = json.loads(value)
+            if expired:
+                self._conn.executemany("DELETE FROM results WHERE namespace = ? AND key = ?", expired)
+            if touched:
+                self._conn.executemany(
+                    "UPDATE results SET accessed = ? WHERE namespace = ? AND key = ?", touched
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]):
+        """Store several entries in one transaction"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (namespace, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                [(self.namespace, key, json.dumps(value), now, now) for key, value in items.items()],
+            )
+            if self.max_entries > 0:
+                self.evictions += self._conn.execute(
+                    """DELETE FROM results WHERE namespace = ? AND key IN (
+                        SELECT key FROM results WHERE namespace = ?
+                        ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.namespace, self.namespace, self.max_entries),
+                ).rowcount
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """
+        Drop one entry, or the whole namespace when key is None.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock, self._conn:
+            if key is None:
+                cur = self._conn.execute("DELETE FROM results WHERE namespace = ?", (self.namespace,))
+            else:
+                cur = self._conn.execute(
+                    "DELETE FROM results WHERE namespace = ? AND key = ?", (self.namespace, key)
+                )
+            return cur.rowcount
+
+    def purge_expired(self) -> int:
+        if self.ttl <= 0:
+            return 0
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM results WHERE namespace = ? AND created < ?",
+                (self.namespace, time.time() - self.ttl),
+            ).rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM results WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(
+    namespace: str,
+    version: Optional[str] = None,
+    ttl: Optional[float] = None,
+    max_entries: Optional[int] = None,
+) -> Optional[ResultCache]:
+    """
+    Shared cache for a namespace, None when RESULT_CACHE_ENABLED is off.
+
+    Args:
+        namespace (str): Cache namespace, e.g. "detect"
+        version (str): Version of whatever produces the values, see ResultCache
+        ttl (float): Overrides RESULT_CACHE_TTL for the namespace
+        max_entries (int): Overrides RESULT_CACHE_MAX_ENTRIES for the namespace
+
+    Returns:
+        ResultCache: The process-wide instance for the namespace
+    """
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = ResultCache(
+                namespace,
+                version=version,
+                ttl=RESULT_CACHE_TTL if ttl is None else ttl,
+                max_entries=RESULT_CACHE_MAX_ENTRIES if max_entries is None else max_entries,
+            )
+        return _caches[namespace]
@@ -8,11 +8,42 @@ DATA_PATH = os.getenv("DATA_PATH", "./data/tech_service_reviews_500_with_names_r
 # LLM
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
 
+# Error detection calls to Claude, shared client with local rate limits (0 disables a limit)
+DETECT_CONCURRENCY = int(os.getenv("DETECT_CONCURRENCY", "8"))
+DETECT_RPM = float(os.getenv("DETECT_RPM", "50"))
+DETECT_TPM = float(os.getenv("DETECT_TPM", "40000"))
+DETECT_MAX_RETRIES = int(os.getenv("DETECT_MAX_RETRIES", "5"))
+# reviews per Claude call, >1 shares one copy of the system prompt between them (bulk backfills)
+DETECT_PACK_SIZE = int(os.getenv("DETECT_PACK_SIZE", "1"))
+
+# Persistent cache of LLM and model results (src/cache.py), TTL in seconds, 0 = no expiry
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "./data/result_cache.db")
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(30 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "100000"))
+# a hit refreshes the entry's access time (for LRU eviction) at most once per interval, in seconds
+RESULT_CACHE_TOUCH_INTERVAL = float(os.getenv("RESULT_CACHE_TOUCH_INTERVAL", "3600"))
+
 # Sentiment Analysis Configuration
 ENABLE_SENTIMENT = os.getenv("ENABLE_SENTIMENT", "true").lower() in ("true", "1", "yes")
 SENTIMENT_MODEL = os.getenv("SENTIMENT_MODEL", "yangheng/deberta-v3-base-absa-v1.1")
+# torch, int8 (dynamic quantization) or onnx (ONNX Runtime, exported once to SENTIMENT_EXPORT_DIR)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "torch").lower()
+SENTIMENT_EXPORT_DIR = os.getenv("SENTIMENT_EXPORT_DIR", "./data/sentiment_models")
 SENTIMENT_CONFIDENCE_THRESHOLD = float(os.getenv("SENTIMENT_CONFIDENCE_THRESHOLD", "0.8"))
 SENTIMENT_BOOST_THRESHOLD = float(os.getenv("SENTIMENT_BOOST_THRESHOLD", "-0.85"))
+# reviews per forward pass and torch CPU threads (0 = torch default)
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "32"))
+SENTIMENT_THREADS = int(os.getenv("SENTIMENT_THREADS", "0"))
+# scores are cached per model, backend and review text (LRU, no expiry)
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "50000"))
+
+# Streaming pipeline (src/pipeline.py), PIPELINE_MODE=stream makes src/run.py use it
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "graph")
+PIPELINE_DETECT_CONCURRENCY = int(os.getenv("PIPELINE_DETECT_CONCURRENCY", "8"))
+PIPELINE_SENTIMENT_BATCH = int(os.getenv("PIPELINE_SENTIMENT_BATCH", str(SENTIMENT_BATCH_SIZE)))
+PIPELINE_NOTION_WRITERS = int(os.getenv("PIPELINE_NOTION_WRITERS", "3"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
 
 # Notion
 NOTION_API_KEY = os.getenv("NOTION_API_KEY")
@@ -29,6 +60,14 @@ AGENT_TEMPERATURE = float(os.getenv("AGENT_TEMPERATURE", "0"))
 AGENT_CHECKPOINT_DB = os.getenv("AGENT_CHECKPOINT_DB", "classification_agent.db")
 AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "true").lower() in ("true", "1", "yes")
 AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", "10"))
+# skip the planner for acknowledgements and notifications, reuse plans for repeated requests
+AGENT_PLAN_FAST_PATH = os.getenv("AGENT_PLAN_FAST_PATH", "true").lower() in ("true", "1", "yes")
+AGENT_PLAN_CACHE_SIZE = int(os.getenv("AGENT_PLAN_CACHE_SIZE", "128"))
+# tool calls of one turn run concurrently, sync tools on a bounded thread pool
+AGENT_TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", "8"))
+AGENT_TOOL_TIMEOUT = float(os.getenv("AGENT_TOOL_TIMEOUT", "120"))
+# load the sentiment and embedding models on a background thread once the agent is up
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "true").lower() in ("true", "1", "yes")
 
 # Memory Configuration (local, no docker/api needed)
 MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "false").lower() in ("true", "1", "yes")
@@ -1,5 +1,12 @@
 import os
+import atexit
+import asyncio
+import threading
+import weakref
+from contextlib import contextmanager, asynccontextmanager
 import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
 from typing import List, Optional
 from src.utils import RawReview
 
@@ -16,15 +23,111 @@ DB_CONFIG = {
 if os.getenv('DB_PASSWORD'):
     DB_CONFIG['password'] = os.getenv('DB_PASSWORD')
 
+# Connections kept open per process, shared by the pipeline, the tools and the review server
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+
+REVIEW_COLUMNS = "review_id, review, username, email, date, reviewer_name, rating"
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+# an async pool is bound to the event loop that opened it
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncConnectionPool]" = weakref.WeakKeyDictionary()
+
+
 def get_connection():
-    """Get database connection"""
+    """Get an unpooled database connection (one-off scripts, caller closes it)"""
     return psycopg.connect(**DB_CONFIG)
 
+def get_pool() -> ConnectionPool:
+    """Shared connection pool, opened on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    make_conninfo(**DB_CONFIG),
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    name="reviews",
+                    open=True,
+                )
+    return _pool
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection.
+
+    The transaction is committed when the block exits normally and rolled back
+    if it raises, then the connection goes back to the pool.
+    """
+    with get_pool().connection() as conn:
+        yield conn
+
+def get_async_pool() -> AsyncConnectionPool:
+    """Async connection pool for the running event loop"""
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        pool = AsyncConnectionPool(
+            make_conninfo(**DB_CONFIG),
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            name="reviews-async",
+            open=False,
+        )
+        _async_pools[loop] = pool
+    return pool
+
+@asynccontextmanager
+async def aconnection():
+    """Async version of connection()"""
+    pool = get_async_pool()
+    await pool.open()
+    async with pool.connection() as conn:
+        yield conn
+
+def close_pool():
+    """Close the shared sync pool (a later call to connection() opens a new one)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+async def aclose_pool():
+    """Close the running loop's async pool"""
+    pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+atexit.register(close_pool)
+
+
+def _row_to_review(row) -> RawReview:
+    #DT to string
+    date_str = row[4]
+    if hasattr(date_str, 'strftime'):
+        date_str = date_str.strftime('%Y-%m-%d %H:%M:%S')
+
+    return RawReview(
+        review_id=row[0],
+        review=row[1],
+        username=row[2],
+        email=row[3],
+        date=str(date_str),
+        reviewer_name=row[5],
+        rating=row[6]
+    )
+
 def init_database():
     """Initialize database with required tables"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with connection() as conn, conn.cursor() as cursor:
+        _create_tables(cursor)
+    print("Database initialized successfully")
 
+def _create_tables(cursor):
     #reviews table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS raw_reviews (
@@ -55,142 +158,168 @@ def init_database():
         );
     """)
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print("Database initialized successfully")
-
 
 #ONLY AT INIT
-def migrate_csv_to_db(csv_path: str):
-    """Migrate CSV data to PostgreSQL"""
-    from src.nodes.load_reviews import load_reviews
+def migrate_csv_to_db(csv_path: str, chunksize: Optional[int] = None):
+    """
+    Bulk import a review CSV into PostgreSQL.
 
-   
-    reviews = load_reviews(csv_path)
+    Chunks of the CSV are streamed with COPY into a temporary staging table,
+    then merged into raw_reviews with one INSERT ... SELECT. Reviews already in
+    the table are skipped, of a review_id repeated in the file the first row is kept.
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    Args:
+        csv_path: CSV with the RawReview columns
+        chunksize: Rows read from the CSV at a time
+    """
+    import io
+    import time
+    from src.nodes.load_reviews import COLUMNS, CHUNK_SIZE, iter_review_chunks
+
+    columns = ", ".join(COLUMNS)
+    start = time.perf_counter()
+    rows = 0
 
-    for review in reviews:
+    with connection() as conn, conn.cursor() as cursor:
         cursor.execute("""
-            INSERT INTO raw_reviews (review_id, review, username, email, date, reviewer_name, rating)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            CREATE TEMP TABLE raw_reviews_staging (
+                review_id VARCHAR(20),
+                review TEXT,
+                username VARCHAR(100),
+                email VARCHAR(255),
+                date TIMESTAMP,
+                reviewer_name VARCHAR(100),
+                rating INTEGER,
+                -- filled in file order by COPY, picks the first of repeated review_ids
+                line BIGSERIAL
+            ) ON COMMIT DROP
+        """)
+
+        for chunk in iter_review_chunks(csv_path, chunksize or CHUNK_SIZE):
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, header=False, index=False)
+            with cursor.copy(f"COPY raw_reviews_staging ({columns}) FROM STDIN (FORMAT csv)") as copy:
+                copy.write(buffer.getvalue())
+            rows += len(chunk)
+
+        cursor.execute(f"""
+            INSERT INTO raw_reviews ({columns})
+            SELECT DISTINCT ON (review_id) {columns} FROM raw_reviews_staging
+            ORDER BY review_id, line
             ON CONFLICT (review_id) DO NOTHING
-        """, (
-            review.review_id,
-            review.review,
-            review.username,
-            review.email,
-            review.date,
-            review.reviewer_name,
-            review.rating
-        ))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print(f"Migrated {len(reviews)} reviews to database")
+        """)
+        inserted = cursor.rowcount
+
+    elapsed = time.perf_counter() - start
+    print(f"Migrated {inserted} reviews to database ({rows - inserted} duplicates skipped) "
+          f"in {elapsed:.2f}s, {rows / elapsed if elapsed else 0:,.0f} rows/s")
+    return inserted
+
+# hot queries run as server-side prepared statements (prepare=True), parsed and planned once per connection
+UNPROCESSED_QUERY = f"""
+    SELECT {REVIEW_COLUMNS}
+    FROM raw_reviews
+    WHERE processed = FALSE
+    ORDER BY created_at ASC
+    LIMIT %s
+"""
+BY_IDS_QUERY = f"""
+    SELECT {REVIEW_COLUMNS}
+    FROM raw_reviews
+    WHERE review_id = ANY(%s)
+    ORDER BY created_at DESC
+"""
+MARK_PROCESSED_QUERY = "UPDATE raw_reviews SET processed = TRUE WHERE review_id = ANY(%s)"
+STATS_QUERY = """
+    SELECT
+        COUNT(*) as total,
+        COUNT(CASE WHEN processed = TRUE THEN 1 END) as processed,
+        COUNT(CASE WHEN processed = FALSE THEN 1 END) as unprocessed
+    FROM raw_reviews
+"""
+NEXT_ID_QUERY = """
+    SELECT review_id FROM raw_reviews
+    WHERE review_id ~ '^REV-[0-9]+$'
+    ORDER BY CAST(SUBSTRING(review_id FROM 5) AS INTEGER) DESC
+    LIMIT 1
+"""
+
+def _report_loaded(reviews: List[RawReview]):
+    if reviews:
+        print(f" Loaded {len(reviews)} unprocessed reviews")
+    else:
+        print(" No unprocessed reviews found")
 
 def load_unprocessed_reviews(batch_size: Optional[int] = None) -> List[RawReview]:
     """load unprocessed reviews from PostgreSQL DB"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
     #default to reasonable batch size
     if batch_size is None:
         batch_size = int(os.getenv('BATCH_SIZE', '50'))
 
-    query = """
-        SELECT review_id, review, username, email, date, reviewer_name, rating
-        FROM raw_reviews
-        WHERE processed = FALSE
-        ORDER BY created_at ASC
-        LIMIT %s
-    """
+    with connection() as conn:
+        rows = conn.execute(UNPROCESSED_QUERY, (batch_size,), prepare=True).fetchall()
 
-    cursor.execute(query, (batch_size,))
-    rows = cursor.fetchall()
-
-    reviews = []
-    for row in rows:
-        #DT to stirng
-        date_str = row[4]
-        if hasattr(date_str, 'strftime'):
-            date_str = date_str.strftime('%Y-%m-%d %H:%M:%S')
-
-        reviews.append(RawReview(
-            review_id=row[0],  
-            review=row[1],     
-            username=row[2],   
-            email=row[3],      
-            date=str(date_str),
-            reviewer_name=row[5],
-            rating=row[6]      
-        ))
-
-    cursor.close()
-    conn.close()
+    reviews = [_row_to_review(row) for row in rows]
+    _report_loaded(reviews)
+    return reviews
 
-    if reviews:
-        print(f" Loaded {len(reviews)} unprocessed reviews")
-    else:
-        print(" No unprocessed reviews found")
+async def aload_unprocessed_reviews(batch_size: Optional[int] = None) -> List[RawReview]:
+    """Async version of load_unprocessed_reviews"""
+    if batch_size is None:
+        batch_size = int(os.getenv('BATCH_SIZE', '50'))
 
+    async with aconnection() as conn:
+        cursor = await conn.execute(UNPROCESSED_QUERY, (batch_size,), prepare=True)
+        rows = await cursor.fetchall()
+
+    reviews = [_row_to_review(row) for row in rows]
+    _report_loaded(reviews)
     return reviews
 
+def load_reviews_by_ids(review_ids: List[str]) -> List[RawReview]:
+    """Load specific reviews by their IDs, newest first"""
+    if not review_ids:
+        return []
+
+    with connection() as conn:
+        rows = conn.execute(BY_IDS_QUERY, (list(review_ids),), prepare=True).fetchall()
+
+    return [_row_to_review(row) for row in rows]
+
 def load_reviews_from_db(limit: Optional[int] = None) -> List[RawReview]:
     """Legacy function - redirects to load_unprocessed_reviews"""
     return load_unprocessed_reviews(limit)
 
 def mark_review_processed(review_id: str):
     """Mark a single review as processed"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("UPDATE raw_reviews SET processed = TRUE WHERE review_id = %s", (review_id,))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    mark_reviews_processed([review_id])
 
 def mark_reviews_processed(review_ids: List[str]):
     """Mark multiple reviews as processed in a single transaction"""
     if not review_ids:
         return
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    # one array parameter, so the statement is the same (and stays prepared) for any batch size
+    with connection() as conn:
+        affected_rows = conn.execute(MARK_PROCESSED_QUERY, (list(review_ids),), prepare=True).rowcount
 
-    
-    placeholders = ','.join(['%s'] * len(review_ids))
-    query = f"UPDATE raw_reviews SET processed = TRUE WHERE review_id IN ({placeholders})"
+    print(f" Marked {affected_rows} reviews as processed")
 
-    cursor.execute(query, review_ids)
-    affected_rows = cursor.rowcount
+async def amark_reviews_processed(review_ids: List[str]):
+    """Async version of mark_reviews_processed"""
+    if not review_ids:
+        return
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+    async with aconnection() as conn:
+        cursor = await conn.execute(MARK_PROCESSED_QUERY, (list(review_ids),), prepare=True)
+        affected_rows = cursor.rowcount
 
     print(f" Marked {affected_rows} reviews as processed")
 
 def get_processing_stats():
     """Get statistics about processed vs unprocessed reviews"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT
-            COUNT(*) as total,
-            COUNT(CASE WHEN processed = TRUE THEN 1 END) as processed,
-            COUNT(CASE WHEN processed = FALSE THEN 1 END) as unprocessed
-        FROM raw_reviews
-    """)
-
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute(STATS_QUERY, prepare=True).fetchone()
 
     return {
         'total': row[0],
@@ -200,20 +329,12 @@ def get_processing_stats():
 
 def get_next_review_id():
     """Generate next review ID in sequence (REV-XXXX)"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with connection() as conn:
+        return _next_review_id(conn)
 
+def _next_review_id(conn) -> str:
     #find the highest existing review ID
-    cursor.execute("""
-        SELECT review_id FROM raw_reviews
-        WHERE review_id ~ '^REV-[0-9]+$'
-        ORDER BY CAST(SUBSTRING(review_id FROM 5) AS INTEGER) DESC
-        LIMIT 1
-    """)
-
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    row = conn.execute(NEXT_ID_QUERY, prepare=True).fetchone()
 
     if row:
         #extract number and increment
@@ -228,20 +349,13 @@ def get_next_review_id():
 def insert_new_review(review_text: str, username: str, email: str,
                      reviewer_name: str, rating: int):
     """Insert a new review with auto-generated ID"""
-    review_id = get_next_review_id()
-
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO raw_reviews
-        (review_id, review, username, email, date, reviewer_name, rating, processed)
-        VALUES (%s, %s, %s, %s, NOW(), %s, %s, FALSE)
-    """, (review_id, review_text, username, email, reviewer_name, rating))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with connection() as conn:
+        review_id = _next_review_id(conn)
+        conn.execute("""
+            INSERT INTO raw_reviews
+            (review_id, review, username, email, date, reviewer_name, rating, processed)
+            VALUES (%s, %s, %s, %s, NOW(), %s, %s, FALSE)
+        """, (review_id, review_text, username, email, reviewer_name, rating), prepare=True)
 
     print(f" Added new review {review_id} by {reviewer_name}")
     return review_id
\ No newline at end of file
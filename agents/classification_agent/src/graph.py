@@ -6,50 +6,74 @@ from langgraph.graph import Graph
 from src.config import DATA_PATH, OLLAMA_MODEL
 from src.nodes.load_reviews import load_reviews
 from src.database import load_unprocessed_reviews, mark_reviews_processed, get_processing_stats
-from src.nodes.detect_errors import detect_errors_with_ollama
+from src.nodes.detect_errors import detect_errors_batch_sync
 from src.nodes.normalize import normalize
 from src.utils import RawReview, DetectedError, EnrichedError, SentimentData
 from src.nodes.notion_logger import upsert_enriched_error
-from src.nodes.sentiment_analysis import analyze_review_sentiment
+from src.nodes.sentiment_analysis import analyze_batch_sentiments
 
 
 def _sha12(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
 
 
+# steps shared by the graph nodes and the streaming runner in src/pipeline.py
+def load_input_reviews() -> List[RawReview]:
+    use_db = os.getenv("USE_DATABASE", "false").lower() == "true"
 
-def build_graph() -> Graph:
-    g = Graph()
+    if use_db:
+        #proccessed vs unporcessed stats
+        stats = get_processing_stats()
+        print(f" Processing stats: {stats['unprocessed']} unprocessed / {stats['total']} total reviews")
+
+        #load unprocessed reviews
+        data = load_unprocessed_reviews()
+
+        if not data:
+            print("All reviews are up to date")
+            return []
+    #DB ERR FALLBACK TO CSV
+    else:
+        data = load_reviews(DATA_PATH, start=511)
+        print(f"Loaded {len(data)} reviews from CSV")
+
+    return data
+
+
+def sentiment_enabled() -> bool:
+    return os.getenv("ENABLE_SENTIMENT", "true").lower() != "false"
 
-    def n_load(_: dict) -> List[RawReview]:
-        use_db = os.getenv("USE_DATABASE", "false").lower() == "true"
 
-        if use_db:
-            #proccessed vs unporcessed stats
-            stats = get_processing_stats()
-            print(f" Processing stats: {stats['unprocessed']} unprocessed / {stats['total']} total reviews")
+def neutral_sentiment(review: RawReview) -> SentimentData:
+    #placeholder sentiment when analysis is disabled
+    return SentimentData(
+        review_id=review.review_id,
+        overall_sentiment="Neutral",
+        overall_confidence=0.0,
+        sentiment_polarity=0.0
+    )
 
-            #load unprocessed reviews
-            data = load_unprocessed_reviews()
 
-            if not data:
-                print("All reviews are up to date")
-                return []
-        #DB ERR FALLBACK TO CSV
-        else:
-            data = load_reviews(DATA_PATH)
-            data = data[511:] 
-            print(f"Loaded {len(data)} reviews from CSV")
+def log_enriched(e: EnrichedError, dry: bool) -> None:
+    hash_value = getattr(e, "error_hash", None) or _sha12(
+        f"{e.review.review_id}|{e.error.error_summary}"
+    )
+    if dry:
+        print(f"[dry-run] Would upsert {e.review.review_id} | {e.error.error_summary} | {hash_value}")
+    else:
+        upsert_enriched_error(e)
 
-        return data
 
-    #detect errors with LLM
+def build_graph() -> Graph:
+    g = Graph()
+
+    def n_load(_: dict) -> List[RawReview]:
+        return load_input_reviews()
+
+    #detect errors with LLM, DETECT_CONCURRENCY calls in flight
     def n_detect(reviews: List[RawReview]) -> List[Tuple[RawReview, List[DetectedError]]]:
-        pairs: List[Tuple[RawReview, List[DetectedError]]] = []
-        for r in reviews:
-            errs = detect_errors_with_ollama(r, OLLAMA_MODEL)
-            pairs.append((r, errs))
-        return pairs
+        errors = detect_errors_batch_sync(reviews, model=OLLAMA_MODEL)
+        return list(zip(reviews, errors))
 
     #analyze sentiment for each review
     def n_sentiment(pairs: List[Tuple[RawReview, List[DetectedError]]]) -> List[Tuple[RawReview, List[DetectedError], SentimentData]]:
@@ -60,28 +84,13 @@ def build_graph() -> Graph:
         OUTPUT: List[Tuple[RawReview, List[DetectedError], SentimentData]]
         """
         # Check if sentiment is enabled
-        if os.getenv("ENABLE_SENTIMENT", "true").lower() == "false":
+        if not sentiment_enabled():
             # Return with dummy sentiment data
             print("Sentiment analysis disabled (ENABLE_SENTIMENT=false)")
-            return [(r, errs, SentimentData(
-                review_id=r.review_id,
-                overall_sentiment="Neutral",
-                overall_confidence=0.0,
-                sentiment_polarity=0.0
-            )) for r, errs in pairs]
-
-        print(f"Analyzing sentiment for {len(pairs)} reviews...")
-        enriched = []
-
-        for idx, (review, errors) in enumerate(pairs, 1):
-            sentiment = analyze_review_sentiment(review)
-            enriched.append((review, errors, sentiment))
-
-            if idx % 10 == 0:
-                print(f"  ... {idx}/{len(pairs)} analyzed")
+            return [(r, errs, neutral_sentiment(r)) for r, errs in pairs]
 
-        print("Sentiment analysis complete")
-        return enriched
+        sentiments = analyze_batch_sentiments([review for review, _ in pairs])
+        return [(review, errors, sentiment) for (review, errors), sentiment in zip(pairs, sentiments)]
 
     #normalise and classify based on severity (now with sentiment)
     def n_normalize(enriched_pairs: List[Tuple[RawReview, List[DetectedError], SentimentData]]) -> List[EnrichedError]:
@@ -100,13 +109,7 @@ def build_graph() -> Graph:
         processed_review_ids = []
 
         for i, e in enumerate(items, 1):
-            hash_value = getattr(e, "error_hash", None) or _sha12(
-                f"{e.review.review_id}|{e.error.error_summary}"
-            )
-            if dry:
-                print(f"[dry-run] Would upsert {e.review.review_id} | {e.error.error_summary} | {hash_value}")
-            else:
-                upsert_enriched_error(e)
+            log_enriched(e, dry)
 
             #review IDs for batch processing
             if use_db:
@@ -1,7 +1,20 @@
 from .schemas import Episode, Semantic
-from .embedding import EmbeddingGenerator
-from .qdrant_store import QdrantStore
-from .memory_manager import ClaudeMemoryManager
+
+# the store and manager pull in chromadb and the LLM client, import them on first access
+_LAZY = {
+    "EmbeddingGenerator": ".embedding",
+    "QdrantStore": ".qdrant_store",
+    "ClaudeMemoryManager": ".memory_manager",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     "Episode",
@@ -1,7 +1,20 @@
-from sentence_transformers import SentenceTransformer
+import threading
 from typing import Union, List
 from .schemas import Episode, Semantic
 
+# one instance per model name, shared by the memory store and the category normalizer
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_sentence_model(model: str = "all-MiniLM-L6-v2"):
+    """shared sentence transformer, imported and loaded on first use"""
+    with _models_lock:
+        if model not in _models:
+            from sentence_transformers import SentenceTransformer
+            _models[model] = SentenceTransformer(model)
+        return _models[model]
+
 
 class EmbeddingGenerator:
     """generates embeddings using sentence transformers - runs locally, no api needed"""
@@ -9,7 +22,11 @@ class EmbeddingGenerator:
     def __init__(self, model: str = "all-MiniLM-L6-v2"):
         # lightweight model
         # downloads automatically on first use
-        self.model = SentenceTransformer(model)
+        self.model_name = model
+
+    @property
+    def model(self):
+        return get_sentence_model(self.model_name)
 
     def memory_to_text(self, memory: Union[Episode, Semantic]) -> str:
         """convert memory obj to text for embedding"""
@@ -5,25 +5,49 @@ Ensures semantic consistency across review categories using embedding-based simi
 
 import os
 import json
+import atexit
+import weakref
+import threading
 from typing import List, Dict, Optional
-from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from src.memory.embedding import get_sentence_model
+from src.taxonomy_store import TaxonomyStore, get_taxonomy_store
+
+
+# live normalizers, so pending saves can be flushed at exit or before another instance loads the file
+_live: "weakref.WeakSet[CategoryNormalizer]" = weakref.WeakSet()
+
 
 class CategoryNormalizer:
     """
     Normalizes categories using semantic similarity.
     Maps similar categories (e.g., "Claim Delay", "Lengthy claim process") to a canonical name.
+
+    Mappings are stored in cache_file (names and variants) with the embeddings in a
+    .npz file next to it, which also holds the canonical name of every row so the
+    two files are paired by name, never by position. Changes are written behind:
+    saves are debounced by save_delay seconds and replace both files atomically.
+
+    With a TaxonomyStore the mappings live in the shared store instead, and this
+    instance keeps a read cache of it that picks up other workers' changes before
+    each lookup. cache_file is then only read once, to seed an empty store.
     """
 
     def __init__(
         self,
         model: str = "all-MiniLM-L6-v2",
         similarity_threshold: float = 0.75,
-        cache_file: str = None
+        cache_file: str = None,
+        save_delay: float = 2.0,
+        store: Optional[TaxonomyStore] = None
     ):
-        self.model = SentenceTransformer(model)
+        # loaded on the first category that needs an embedding
+        self.model_name = model
         self.similarity_threshold = similarity_threshold
+        self.save_delay = save_delay
+        self.store = store
+        self._store_state = None
 
         if cache_file is None:
             cache_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data")
@@ -31,80 +55,277 @@ class CategoryNormalizer:
             cache_file = os.path.join(cache_dir, "category_mappings.json")
 
         self.cache_file = cache_file
+        self.embeddings_file = os.path.splitext(cache_file)[0] + ".npz"
         self.categories: Dict[str, Dict] = {}
-        self._load_cache()
+        # detection may run on several threads, lookups and inserts must not interleave
+        self._lock = threading.RLock()
+        # one writer at a time, a snapshot older than the last one written is dropped
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._snapshots = 0
+        self._written = 0
+
+        for other in list(_live):
+            if other.cache_file == self.cache_file:
+                other.flush()
+        if store is not None:
+            self._load_store()
+            return
+        self._rebuild_index(self._load_cache())
+        _live.add(self)
+        if self._dirty:
+            # migrate older files to the current layout
+            self._save_cache()
+
+    @property
+    def model(self):
+        return get_sentence_model(self.model_name)
+
+    def _load_cache(self) -> Dict[str, np.ndarray]:
+        """Load the mappings, returns the embedding of each canonical name"""
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as f:
+                categories = json.load(f)
+        except Exception as e:
+            print(f"[CategoryNormalizer] Failed to load cache: {e}")
+            return {}
 
-    def _load_cache(self):
-        if os.path.exists(self.cache_file):
+        stored = {}
+        if os.path.exists(self.embeddings_file):
             try:
-                with open(self.cache_file, 'r') as f:
-                    self.categories = json.load(f)
-                    print(f"[CategoryNormalizer] Loaded {len(self.categories)} category mappings")
+                with np.load(self.embeddings_file) as saved:
+                    stored = dict(zip(saved["names"].tolist(), saved["embeddings"]))
             except Exception as e:
-                print(f"[CategoryNormalizer] Failed to load cache: {e}")
+                print(f"[CategoryNormalizer] Failed to load embeddings: {e}")
+        # a crash between the two replaces leaves files from different saves,
+        # only embeddings saved under the same name are reused
+        vectors = {name: stored[name] for name in categories if name in stored}
+        if categories and list(stored) != list(categories):
+            self._dirty = True
+
+        # older files keep the embedding inline as a list of floats
+        for name, data in categories.items():
+            embedding = data.pop("embedding", None)
+            if name not in vectors and embedding is not None:
+                vectors[name] = np.asarray(embedding, dtype=np.float32)
+
+        missing = [name for name in categories if name not in vectors]
+        if missing:
+            print(f"[CategoryNormalizer] Re-encoding {len(missing)} categories without stored embeddings")
+            vectors.update(zip(missing, self._encode(missing)))
+
+        self.categories = categories
+        print(f"[CategoryNormalizer] Loaded {len(self.categories)} category mappings")
+        return vectors
+
+    def _load_store(self):
+        if len(self.store) == 0:
+            vectors = self._load_cache()
+            if self.categories:
+                added = self.store.import_categories(
+                    self.categories, {name: self._unit(v) for name, v in vectors.items()}
+                )
+                print(f"[CategoryNormalizer] Seeded taxonomy store with {added} categories")
+        self._dirty = False
+        self._store_state, self.categories, vectors = self.store.snapshot()
+        self._rebuild_index(vectors)
+
+    def _sync(self):
+        """Apply changes other workers made to the shared store since the last sync"""
+        if self.store is None:
+            return
+        state = self.store.state()
+        if state == self._store_state:
+            return
+        if self._store_state is None or state[0] != self._store_state[0]:
+            # a merge or reset, reload everything
+            self._store_state, self.categories, vectors = self.store.snapshot()
+            self._rebuild_index(vectors)
+            return
+
+        revision, changes, vectors = self.store.changes_since(self._store_state[1])
+        for name, data in changes.items():
+            if name not in self.categories and name in vectors:
+                self.categories[name] = {"variants": []}
+                self._lookup.setdefault(name.lower(), name)
+                self._append_embedding(name, vectors[name])
+            entry = self.categories.get(name)
+            if entry is None:
+                continue
+            for variant in data["variants"]:
+                if variant not in entry["variants"]:
+                    entry["variants"].append(variant)
+                self._lookup.setdefault(variant.lower(), name)
+        self._store_state = (state[0], revision)
 
     def _save_cache(self):
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.categories, f, indent=2)
-        except Exception as e:
-            print(f"[CategoryNormalizer] Failed to save cache: {e}")
-
-    def _compute_embedding(self, text: str) -> List[float]:
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
-
-    def _cosine_similarity(self, emb1: List[float], emb2: List[float]) -> float:
-        a = np.array(emb1)
-        b = np.array(emb2)
-        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
-
-    def _find_similar_category(self, category: str, embedding: List[float]) -> Optional[str]:
-        best_match = None
-        best_similarity = 0.0
-
+        """Mark the mappings changed, the files are written save_delay seconds later"""
+        with self._lock:
+            self._dirty = True
+            if self.save_delay <= 0:
+                self.flush()
+            elif self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Write pending changes now"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._snapshots += 1
+            snapshot = self._snapshots
+            categories = {name: {"variants": list(data.get("variants", []))}
+                          for name, data in self.categories.items()}
+            names = np.array(self._names, dtype=str)
+            matrix = self._matrix[:len(self._names)].copy() if self._names else np.empty((0, 0), np.float32)
+
+        with self._save_lock:
+            if snapshot < self._written:
+                return
+            self._written = snapshot
+            try:
+                # write both files next to the targets, then swap them in
+                tmp_embeddings = self.embeddings_file + ".tmp"
+                with open(tmp_embeddings, 'wb') as f:
+                    np.savez(f, names=names, embeddings=matrix)
+                tmp_mappings = self.cache_file + ".tmp"
+                with open(tmp_mappings, 'w') as f:
+                    json.dump(categories, f, indent=2)
+                os.replace(tmp_embeddings, self.embeddings_file)
+                os.replace(tmp_mappings, self.cache_file)
+            except Exception as e:
+                print(f"[CategoryNormalizer] Failed to save cache: {e}")
+
+    def _rebuild_index(self, vectors: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Build the lookup structures from self.categories:
+        _lookup maps lowercased names and variants to their canonical name,
+        _matrix holds one unit-length embedding per canonical name (row i is _names[i]).
+
+        Args:
+            vectors: Embedding per canonical name, defaults to the rows of the current matrix
+        """
+        if vectors is None:
+            vectors = {name: self._matrix[i] for i, name in enumerate(self._names)}
+        self._lookup: Dict[str, str] = {}
+        self._names: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
         for canonical_name, data in self.categories.items():
-            canonical_embedding = data["embedding"]
-            similarity = self._cosine_similarity(embedding, canonical_embedding)
-
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_match = canonical_name
-
-        if best_similarity >= self.similarity_threshold:
-            return best_match
+            self._lookup.setdefault(canonical_name.lower(), canonical_name)
+            for variant in data.get("variants", []):
+                self._lookup.setdefault(variant.lower(), canonical_name)
+            self._append_embedding(canonical_name, vectors[canonical_name])
+
+    def _append_embedding(self, canonical_name: str, embedding: np.ndarray):
+        vector = self._unit(embedding)
+        size = len(self._names)
+        if self._matrix is None:
+            self._matrix = np.empty((64, vector.shape[0]), dtype=np.float32)
+        elif size == self._matrix.shape[0]:
+            # grow by doubling so appends stay amortised O(dim)
+            grown = np.empty((size * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+        self._matrix[size] = vector
+        self._names.append(canonical_name)
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed several labels in one model call"""
+        return np.asarray(self.model.encode(texts, convert_to_numpy=True), dtype=np.float32)
+
+    def _find_similar_category(self, category: str, embedding: np.ndarray) -> Optional[str]:
+        if not self._names:
+            return None
+
+        similarities = self._matrix[:len(self._names)] @ self._unit(embedding)
+        best = int(np.argmax(similarities))
+
+        if similarities[best] >= self.similarity_threshold:
+            return self._names[best]
 
         return None
 
     def normalize_category(self, category: str) -> str:
-        category = category.strip()
+        return self.normalize_batch([category])[0]
+
+    def normalize_batch(self, categories: List[str]) -> List[str]:
+        """
+        Map each label to its canonical category.
+
+        Labels without an exact match are embedded together in one model call,
+        then matched in order, so a label can join a category created earlier
+        in the same batch.
+
+        Args:
+            categories: Raw category labels
+
+        Returns:
+            List[str]: Canonical name for each label, in input order
+        """
+        labels = [category.strip() for category in categories]
+        with self._lock:
+            self._sync()
+            # first spelling of each new label, later ones resolve through the lookup
+            unseen: Dict[str, str] = {}
+            for label in labels:
+                if label and label.lower() not in self._lookup:
+                    unseen.setdefault(label.lower(), label)
+            embeddings = dict(zip(unseen, self._encode(list(unseen.values())))) if unseen else {}
+            return [self._normalize_category(label, embeddings.get(label.lower())) for label in labels]
+
+    def _normalize_category(self, category: str, embedding: Optional[np.ndarray]) -> str:
         if not category:
             return "Other"
 
         # Check exact match first
-        category_lower = category.lower()
-        for canonical_name, data in self.categories.items():
-            if canonical_name.lower() == category_lower:
-                return canonical_name
-
-            if category_lower in [v.lower() for v in data.get("variants", [])]:
-                return canonical_name
+        canonical_name = self._lookup.get(category.lower())
+        if canonical_name is not None:
+            return canonical_name
 
         # Semantic matching
-        embedding = self._compute_embedding(category)
         similar_category = self._find_similar_category(category, embedding)
 
+        if similar_category and self.store is not None:
+            canonical_name = self.store.add_variant(category, similar_category)
+            self._sync()
+            return canonical_name
+
         if similar_category:
             if category not in self.categories[similar_category].get("variants", []):
                 self.categories[similar_category].setdefault("variants", []).append(category)
+                self._lookup.setdefault(category.lower(), similar_category)
                 self._save_cache()
             return similar_category
 
         # Create new canonical category
+        if self.store is not None:
+            # the store may answer with a matching category another worker just created
+            canonical_name = self.store.add_category(
+                category, self._unit(embedding), since=self._store_state[1], threshold=self.similarity_threshold
+            )
+            self._sync()
+            return canonical_name
+
         self.categories[category] = {
-            "embedding": embedding,
             "variants": []
         }
+        self._lookup[category.lower()] = category
+        self._append_embedding(category, embedding)
         self._save_cache()
 
         return category
@@ -113,8 +334,7 @@ class CategoryNormalizer:
         normalized = []
         seen = set()
 
-        for category in categories:
-            canonical = self.normalize_category(category)
+        for canonical in self.normalize_batch(categories):
             if canonical not in seen:
                 normalized.append(canonical)
                 seen.add(canonical)
@@ -122,37 +342,55 @@ class CategoryNormalizer:
         return normalized or ["Other"]
 
     def get_all_categories(self) -> List[str]:
-        return sorted(self.categories.keys())
+        with self._lock:
+            self._sync()
+            return sorted(self.categories.keys())
 
     def get_category_variants(self, canonical_name: str) -> List[str]:
-        return self.categories.get(canonical_name, {}).get("variants", [])
+        with self._lock:
+            self._sync()
+            return self.categories.get(canonical_name, {}).get("variants", [])
 
     def merge_categories(self, category1: str, category2: str, keep: str = None) -> bool:
-        if category1 not in self.categories or category2 not in self.categories:
-            return False
+        with self._lock:
+            self._sync()
+            if category1 not in self.categories or category2 not in self.categories:
+                return False
 
-        if keep is None:
-            keep = category1
+            if keep is None:
+                keep = category1
 
-        discard = category2 if keep == category1 else category1
+            discard = category2 if keep == category1 else category1
 
-        keep_data = self.categories[keep]
-        discard_data = self.categories[discard]
+            if self.store is not None:
+                merged = self.store.merge(keep, discard)
+                self._sync()
+                return merged
 
-        keep_data.setdefault("variants", []).append(discard)
+            keep_data = self.categories[keep]
+            discard_data = self.categories[discard]
 
-        for variant in discard_data.get("variants", []):
-            if variant not in keep_data["variants"]:
-                keep_data["variants"].append(variant)
+            keep_data.setdefault("variants", []).append(discard)
 
-        del self.categories[discard]
+            for variant in discard_data.get("variants", []):
+                if variant not in keep_data["variants"]:
+                    keep_data["variants"].append(variant)
 
-        self._save_cache()
-        return True
+            del self.categories[discard]
+
+            self._rebuild_index()
+            self._save_cache()
+            return True
 
     def reset(self):
-        self.categories = {}
-        self._save_cache()
+        with self._lock:
+            if self.store is not None:
+                self.store.reset()
+                self._sync()
+                return
+            self.categories = {}
+            self._rebuild_index()
+            self._save_cache()
 
     def set_similarity_threshold(self, threshold: float):
         if 0.0 <= threshold <= 1.0:
@@ -161,15 +399,30 @@ class CategoryNormalizer:
             raise ValueError("Threshold must be between 0.0 and 1.0")
 
 
+@atexit.register
+def _flush_all():
+    for normalizer in list(_live):
+        normalizer.flush()
+
+
 _normalizer_instance = None
+_normalizer_lock = threading.Lock()
 
 
 def get_normalizer(similarity_threshold: float = None, reset: bool = False) -> CategoryNormalizer:
     global _normalizer_instance
 
     if _normalizer_instance is None:
-        threshold = similarity_threshold or float(os.getenv("CATEGORY_SIMILARITY_THRESHOLD", "0.75"))
-        _normalizer_instance = CategoryNormalizer(similarity_threshold=threshold)
+        with _normalizer_lock:
+            if _normalizer_instance is None:
+                threshold = similarity_threshold or float(os.getenv("CATEGORY_SIMILARITY_THRESHOLD", "0.75"))
+                save_delay = float(os.getenv("CATEGORY_SAVE_DELAY", "2.0"))
+                # set to share one taxonomy between processes, e.g. ./data/taxonomy.db
+                store_path = os.getenv("CATEGORY_STORE_PATH")
+                store = get_taxonomy_store(store_path) if store_path else None
+                _normalizer_instance = CategoryNormalizer(
+                    similarity_threshold=threshold, save_delay=save_delay, store=store
+                )
     elif similarity_threshold is not None:
         _normalizer_instance.set_similarity_threshold(similarity_threshold)
 
@@ -1,10 +1,19 @@
 import os
 import json
-from typing import List
+import hashlib
+import random
+import time
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_anthropic import ChatAnthropic
 from src.utils import RawReview, DetectedError
 from src.nodes.category_normalizer import get_normalizer
+from src.cache import get_cache, make_key
+from src.config import DETECT_CONCURRENCY, DETECT_RPM, DETECT_TPM, DETECT_MAX_RETRIES, DETECT_PACK_SIZE
 
 # using claude for better accuracy - less hallucination than ollama
 
@@ -100,15 +109,154 @@ FEWSHOT_ASSISTANT_2 = """{
 }"""
 
 
-def make_llm(model: str = "claude-3-5-sonnet-20241022"):
+def make_llm(model: str = "claude-3-5-sonnet-20241022", max_retries: int = 2):
     # use claude for better accuracy
     from src.config import ANTHROPIC_API_KEY
     return ChatAnthropic(
         model=model,
         anthropic_api_key=ANTHROPIC_API_KEY,
-        temperature=0
+        temperature=0,
+        max_retries=max_retries
     )
 
+
+# one client per model, async clients also per event loop since their http pool is bound to it
+_clients: Dict[str, ChatAnthropic] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, ChatAnthropic]]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_llm(model: str = "claude-3-5-sonnet-20241022") -> ChatAnthropic:
+    """
+    Shared client for a model, rate limit retries are left to _invoke_with_retry.
+
+    Args:
+        model (str): Claude model name
+
+    Returns:
+        ChatAnthropic: Client reused by every detection call on this thread or event loop
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _clients_lock:
+        clients = _clients if loop is None else _async_clients.setdefault(loop, {})
+        if model not in clients:
+            clients[model] = make_llm(model, max_retries=0)
+        return clients[model]
+
+
+class TokenBucket:
+    """
+    Budget of units per minute, refilled continuously.
+
+    reserve() takes the units straight away and returns how long the caller has to
+    wait for them, so concurrent callers queue up behind each other instead of all
+    waking at the same moment.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, units: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= units
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, units: float):
+        """Give back over-estimated units, or take more when units is negative"""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self.level = min(self.capacity, self.level + units)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets shared by every detection call"""
+
+    def __init__(self, rpm: float = DETECT_RPM, tpm: float = DETECT_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def reserve(self, tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        if actual is not None:
+            self.tokens.refund(estimated - actual)
+
+
+_limiter = RateLimiter()
+
+# rough size of the JSON answer, counted against the token budget before the call
+_OUTPUT_TOKENS = 512
+
+
+def _estimate_tokens(prompt: str, answers: int = 1) -> int:
+    return len(prompt) // 4 + _OUTPUT_TOKENS * answers
+
+
+def _used_tokens(resp) -> Optional[int]:
+    usage = getattr(resp, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+def _retry_delay(exc: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying a rate limited or overloaded call, None when not retryable"""
+    status = getattr(exc, "status_code", None)
+    if status not in (429, 529):
+        return None
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        base = float(retry_after)
+    except (TypeError, ValueError):
+        base = min(60.0, 2.0 ** attempt)
+    # jitter so the waiting workers do not retry in lockstep
+    return base + random.uniform(0, base)
+
+
+def _invoke_with_retry(prompt: str, model: str) -> str:
+    estimated = _estimate_tokens(prompt)
+    for attempt in range(DETECT_MAX_RETRIES + 1):
+        time.sleep(_limiter.reserve(estimated))
+        try:
+            resp = get_llm(model).invoke(prompt)
+            _limiter.settle(estimated, _used_tokens(resp))
+            return (getattr(resp, "content", "") or "").strip()
+        except Exception as exc:
+            delay = _retry_delay(exc, attempt)
+            if delay is None or attempt == DETECT_MAX_RETRIES:
+                raise
+            print(f" Claude rate limited, retrying in {delay:.1f}s ({attempt + 1}/{DETECT_MAX_RETRIES})")
+            time.sleep(delay)
+
+
+async def _ainvoke_with_retry(prompt: str, model: str, answers: int = 1) -> str:
+    estimated = _estimate_tokens(prompt, answers)
+    for attempt in range(DETECT_MAX_RETRIES + 1):
+        await asyncio.sleep(_limiter.reserve(estimated))
+        try:
+            resp = await get_llm(model).ainvoke(prompt)
+            _limiter.settle(estimated, _used_tokens(resp))
+            return (getattr(resp, "content", "") or "").strip()
+        except Exception as exc:
+            delay = _retry_delay(exc, attempt)
+            if delay is None or attempt == DETECT_MAX_RETRIES:
+                raise
+            print(f" Claude rate limited, retrying in {delay:.1f}s ({attempt + 1}/{DETECT_MAX_RETRIES})")
+            await asyncio.sleep(delay)
+
 def _json_load(s: str) -> dict:
     if not s:
         return {"errors": []}
@@ -198,14 +346,58 @@ def _fallback_suggestion(text: str) -> List[DetectedError]:
             )]
     return []
 
-def detect_errors_with_ollama(
-    review: RawReview,
-    ollama_model: str = "claude-3-5-sonnet-20241022",  # now uses claude by default
-) -> List[DetectedError]:
-    force_fallback = os.getenv("USE_FALLBACK_DETECT", "false").lower() in {"1", "true", "yes"}
+# results cached under an older SYSTEM prompt are dropped when the prompt changes
+PROMPT_VERSION = hashlib.sha256(SYSTEM.encode("utf-8")).hexdigest()[:12]
+
+
+def _cache_key(review: RawReview, model: str) -> str:
+    return make_key(model, PROMPT_VERSION, review.review[:4000])
+
+
+def _cached_errors(review: RawReview, model: str) -> Optional[List[DetectedError]]:
+    cache = get_cache("detect", version=PROMPT_VERSION)
+    if cache is None:
+        return None
+    value = cache.get(_cache_key(review, model))
+    if value is None:
+        return None
+    return [DetectedError(**e) for e in value]
+
+
+def _cached_errors_many(reviews: List[RawReview], model: str) -> List[Optional[List[DetectedError]]]:
+    """_cached_errors for several reviews with one cache lookup"""
+    cache = get_cache("detect", version=PROMPT_VERSION)
+    if cache is None:
+        return [None] * len(reviews)
+    keys = [_cache_key(review, model) for review in reviews]
+    found = cache.get_many(keys)
+    return [[DetectedError(**e) for e in found[key]] if key in found else None for key in keys]
+
+
+def _remember_errors(review: RawReview, model: str, errors: List[DetectedError]):
+    _remember_errors_many([(review, errors)], model)
+
+
+def _remember_errors_many(results: List[Tuple[RawReview, List[DetectedError]]], model: str):
+    """Cache the errors of several reviews in one transaction"""
+    cache = get_cache("detect", version=PROMPT_VERSION)
+    if cache is not None:
+        cache.set_many({_cache_key(review, model): [e.model_dump() for e in errors] for review, errors in results})
+
+
+def detect_cache_stats() -> Optional[Dict]:
+    """Hit rate of the detection cache in this process, None when caching is off"""
+    cache = get_cache("detect", version=PROMPT_VERSION)
+    return cache.stats() if cache is not None else None
+
+
+def _use_fallback() -> bool:
+    return os.getenv("USE_FALLBACK_DETECT", "false").lower() in {"1", "true", "yes"}
 
+
+def _build_prompt(review: RawReview) -> str:
     # simpler prompt for claude - no few shots to prevent contamination
-    full_prompt = f"""{SYSTEM}
+    return f"""{SYSTEM}
 
 Review to analyze:
 ```
@@ -214,24 +406,19 @@ Review to analyze:
 
 Return ONLY the JSON object with business_type and errors array. If no issues found, return {{"business_type": "...", "errors": []}}"""
 
-    raw = ""
 
-    if not force_fallback:
-        try:
-            llm = make_llm(ollama_model)
-            resp = llm.invoke(full_prompt)
-            raw = (getattr(resp, "content", "") or "").strip()
-        except Exception as exc:
-            print(f" Claude call failed ({exc}); using heuristic detection instead.")
-            force_fallback = True
+def _heuristic_detect(review: RawReview) -> List[DetectedError]:
+    out = _fallback_detect(review.review)
+    if not out:
+        out = _fallback_suggestion(review.review)
+    return out
+
 
-    if force_fallback:
-        out = _fallback_detect(review.review)
-        if not out:
-            out = _fallback_suggestion(review.review)
-        return out
+def _parse_errors(raw: str, review: RawReview) -> List[DetectedError]:
+    return _errors_from_data(_json_load(raw), review)
 
-    data = _json_load(raw)
+
+def _errors_from_data(data: dict, review: RawReview) -> List[DetectedError]:
     items = data.get("errors", [])
     out: List[DetectedError] = []
 
@@ -265,8 +452,227 @@ Return ONLY the JSON object with business_type and errors array. If no issues fo
                 ))
 
     if not out:
-        out = _fallback_detect(review.review)
-    if not out:
-        out = _fallback_suggestion(review.review)
+        out = _heuristic_detect(review)
 
     return out
+
+
+def detect_errors_with_ollama(
+    review: RawReview,
+    ollama_model: str = "claude-3-5-sonnet-20241022",  # now uses claude by default
+) -> List[DetectedError]:
+    if _use_fallback():
+        return _heuristic_detect(review)
+
+    cached = _cached_errors(review, ollama_model)
+    if cached is not None:
+        return cached
+
+    try:
+        raw = _invoke_with_retry(_build_prompt(review), ollama_model)
+    except Exception as exc:
+        print(f" Claude call failed ({exc}); using heuristic detection instead.")
+        return _heuristic_detect(review)
+
+    out = _parse_errors(raw, review)
+    _remember_errors(review, ollama_model, out)
+    return out
+
+
+async def adetect_errors(
+    review: RawReview,
+    model: str = "claude-3-5-sonnet-20241022",
+) -> List[DetectedError]:
+    """
+    Async version of detect_errors_with_ollama sharing its client and rate limits.
+
+    Args:
+        review (RawReview): The review to analyze
+        model (str): Claude model name
+
+    Returns:
+        List[DetectedError]: Detected errors, heuristic ones when the call fails
+    """
+    if _use_fallback():
+        return _heuristic_detect(review)
+
+    # the cache is a SQLite file, its reads and writes stay off the event loop too
+    cached = await asyncio.to_thread(_cached_errors, review, model)
+    if cached is not None:
+        return cached
+
+    try:
+        raw = await _ainvoke_with_retry(_build_prompt(review), model)
+    except Exception as exc:
+        print(f" Claude call failed ({exc}); using heuristic detection instead.")
+        return _heuristic_detect(review)
+
+    # category normalization computes embeddings, keep it off the event loop
+    out = await asyncio.to_thread(_parse_errors, raw, review)
+    await asyncio.to_thread(_remember_errors, review, model, out)
+    return out
+
+
+# packed mode: several reviews share one copy of SYSTEM, answers come back keyed by id
+PACKED_INSTRUCTIONS = """
+You will receive SEVERAL reviews, each introduced by its id (R1, R2, ...). Analyze every review
+independently with the rules above.
+
+Return ONLY a JSON array with exactly one object per review, in any order:
+[
+  {"id": "R1", "business_type": "...", "errors": [...]},
+  {"id": "R2", "business_type": "...", "errors": []}
+]
+"""
+
+
+def _build_packed_prompt(reviews: List[RawReview]) -> str:
+    blocks = "\n\n".join(
+        f"Review {_pack_id(i)}:\n```\n{review.review[:4000]}\n```" for i, review in enumerate(reviews)
+    )
+    return f"""{SYSTEM}
+{PACKED_INSTRUCTIONS}
+Reviews to analyze:
+
+{blocks}
+
+Return ONLY the JSON array, one object per review id."""
+
+
+def _pack_id(index: int) -> str:
+    return f"R{index + 1}"
+
+
+def _json_load_array(s: str) -> List[dict]:
+    if not s:
+        return []
+    s = s.strip()
+    try:
+        data = json.loads(s)
+    except Exception:
+        a, b = s.find("["), s.rfind("]")
+        if a == -1 or b <= a:
+            return []
+        try:
+            data = json.loads(s[a:b+1])
+        except Exception:
+            return []
+    return [d for d in data if isinstance(d, dict)] if isinstance(data, list) else []
+
+
+def _split_packed(raw: str, reviews: List[RawReview]) -> List[Optional[dict]]:
+    """Answer for each review in order, None when it is missing or unusable"""
+    answers = {}
+    for entry in _json_load_array(raw):
+        key = str(entry.get("id", "")).strip().upper()
+        if isinstance(entry.get("errors"), list):
+            answers[key] = entry
+    return [answers.get(_pack_id(i)) for i in range(len(reviews))]
+
+
+async def adetect_errors_packed(
+    reviews: List[RawReview],
+    model: str = "claude-3-5-sonnet-20241022",
+) -> List[List[DetectedError]]:
+    """
+    Detect errors for several reviews with one Claude call.
+
+    Cached reviews are left out of the prompt. Reviews missing from the answer, or
+    with a garbled entry, are retried with single-review calls, so the result is
+    never worse than adetect_errors.
+
+    Args:
+        reviews (List[RawReview]): Reviews to analyze together
+        model (str): Claude model name
+
+    Returns:
+        List[List[DetectedError]]: Detected errors per review, in the order of reviews
+    """
+    if _use_fallback():
+        return [_heuristic_detect(review) for review in reviews]
+
+    results = await asyncio.to_thread(_cached_errors_many, reviews, model)
+    todo = [i for i, cached in enumerate(results) if cached is None]
+    if len(todo) <= 1:
+        for i in todo:
+            results[i] = await adetect_errors(reviews[i], model)
+        return results
+
+    pack = [reviews[i] for i in todo]
+    try:
+        raw = await _ainvoke_with_retry(_build_packed_prompt(pack), model, answers=len(pack))
+        answers = _split_packed(raw, pack)
+    except Exception as exc:
+        print(f" Packed Claude call failed ({exc}); analyzing {len(pack)} reviews one by one.")
+        answers = [None] * len(pack)
+
+    async def resolve(review: RawReview, answer: Optional[dict]) -> List[DetectedError]:
+        if answer is None:
+            return await adetect_errors(review, model)
+        return await asyncio.to_thread(_errors_from_data, answer, review)
+
+    missing = sum(answer is None for answer in answers)
+    if missing:
+        print(f" {missing}/{len(pack)} reviews missing from the packed answer, retrying them one by one")
+    resolved = await asyncio.gather(*(resolve(r, a) for r, a in zip(pack, answers)))
+    # reviews retried on their own were cached by adetect_errors
+    answered = [(review, out) for review, answer, out in zip(pack, answers, resolved) if answer is not None]
+    await asyncio.to_thread(_remember_errors_many, answered, model)
+    for i, out in zip(todo, resolved):
+        results[i] = out
+    return results
+
+
+async def detect_errors_batch(
+    reviews: List[RawReview],
+    concurrency: int = DETECT_CONCURRENCY,
+    model: str = "claude-3-5-sonnet-20241022",
+    pack_size: int = DETECT_PACK_SIZE,
+) -> List[List[DetectedError]]:
+    """
+    Detect errors for many reviews with a bounded number of Claude calls in flight.
+
+    Args:
+        reviews (List[RawReview]): Reviews to analyze
+        concurrency (int): Maximum concurrent calls, DETECT_RPM and DETECT_TPM still apply
+        model (str): Claude model name
+        pack_size (int): Reviews sent per call, 1 sends each review on its own
+
+    Returns:
+        List[List[DetectedError]]: Detected errors per review, in the order of reviews
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    pack_size = max(1, pack_size)
+    packs = [reviews[i:i + pack_size] for i in range(0, len(reviews), pack_size)]
+
+    async def one(pack: List[RawReview]) -> List[List[DetectedError]]:
+        async with semaphore:
+            return await adetect_errors_packed(pack, model)
+
+    results = await asyncio.gather(*(one(pack) for pack in packs))
+    return [errors for pack_result in results for errors in pack_result]
+
+
+def detect_errors_batch_sync(
+    reviews: List[RawReview],
+    concurrency: int = DETECT_CONCURRENCY,
+    model: str = "claude-3-5-sonnet-20241022",
+    pack_size: int = DETECT_PACK_SIZE,
+) -> List[List[DetectedError]]:
+    """
+    detect_errors_batch for sync callers such as the LangGraph nodes.
+
+    The batch runs on its own event loop. When the calling thread already runs
+    one (wf.invoke from async code or a notebook) asyncio.run() cannot start
+    another there, so the batch runs on a worker thread instead.
+
+    Returns:
+        List[List[DetectedError]]: Detected errors per review, in the order of reviews
+    """
+    batch = detect_errors_batch(reviews, concurrency=concurrency, model=model, pack_size=pack_size)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(batch)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, batch).result()
@@ -1,29 +1,45 @@
 import pandas as pd
-from typing import List
+from itertools import islice
+from typing import Iterator, List, Optional
 from src.utils import RawReview
 
 #check schema for required columns
 REQUIRED = {"review_id","review","username","email","date","reviewer_name","rating"}
+COLUMNS = ["review_id", "review", "username", "email", "date", "reviewer_name", "rating"]
 
+# rows per chunk, large exports are never read into memory at once
+CHUNK_SIZE = 50_000
 
-def load_reviews(path: str) -> List[RawReview]:
-    df = pd.read_csv(path)
-    missing = REQUIRED - set(df.columns)
-    if missing:
-        raise ValueError(f"Missing columns: {missing}")
-
-# convert row from csv to model
-    records: List[RawReview] = []
-    for _, row in df.iterrows():
-        records.append(
-            RawReview(
-                review_id=str(row["review_id"]),
-                review=str(row["review"]),
-                username=str(row["username"]),
-                email=str(row["email"]),
-                date=str(row["date"]),
-                reviewer_name=str(row["reviewer_name"]),
-                rating=int(row["rating"]),
-            )
-        )
-    return records
+
+def iter_review_chunks(path: str, chunksize: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Read the CSV in chunks, each converted to the RawReview column types.
+
+    Args:
+        path: CSV file
+        chunksize: Rows per chunk
+
+    Yields:
+        pd.DataFrame: The COLUMNS, as str except rating (int)
+    """
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        missing = REQUIRED - set(chunk.columns)
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+
+        # same conversions as str()/int() per value, applied per column
+        ratings = chunk["rating"].astype(int)
+        chunk = chunk[COLUMNS].astype(str)
+        chunk["rating"] = ratings
+        yield chunk
+
+
+def iter_reviews(path: str, chunksize: int = CHUNK_SIZE) -> Iterator[RawReview]:
+    for chunk in iter_review_chunks(path, chunksize):
+        for record in chunk.to_dict("records"):
+            yield RawReview(**record)
+
+
+def load_reviews(path: str, start: int = 0, stop: Optional[int] = None) -> List[RawReview]:
+    # rows outside [start, stop) are skipped while streaming, reading ends at stop
+    return list(islice(iter_reviews(path), start, stop))
@@ -2,6 +2,7 @@
 import os
 import time
 import hashlib
+import threading
 from datetime import datetime
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
@@ -15,10 +16,20 @@ load_dotenv()
 NOTION_API_KEY = os.getenv("NOTION_API_KEY")
 NOTION_DATABASE_ID = os.getenv("NOTION_DATABASE_ID") or os.getenv("NOTION_DB_ID")
 
-assert NOTION_API_KEY, "Missing NOTION_API_KEY"
-assert NOTION_DATABASE_ID, "Missing NOTION_DATABASE_ID"
+_notion: Optional[Client] = None
+_notion_lock = threading.Lock()
 
-notion = Client(auth=NOTION_API_KEY)
+
+def get_notion() -> Client:
+    """Notion client, created (and the credentials checked) on first use"""
+    global _notion
+    if _notion is None:
+        with _notion_lock:
+            if _notion is None:
+                assert NOTION_API_KEY, "Missing NOTION_API_KEY"
+                assert NOTION_DATABASE_ID, "Missing NOTION_DATABASE_ID"
+                _notion = Client(auth=NOTION_API_KEY)
+    return _notion
 
 
 def _sha12(text: str) -> str:
@@ -83,7 +94,7 @@ def _props_from_enriched(e: EnrichedError, hash_value: str) -> Dict[str, Any]:
 
 
 def _find_page_by_hash(hash_value: str) -> Optional[str]:
-    res = notion.databases.query(
+    res = get_notion().databases.query(
         database_id=NOTION_DATABASE_ID,
         filter={"property": "Hash", "rich_text": {"equals": hash_value}},
         page_size=1,
@@ -102,7 +113,7 @@ def upsert_enriched_error(e: EnrichedError) -> str:
 
     # Create or update
     if page_id:
-        page = notion.pages.update(page_id=page_id, properties=props)
+        page = get_notion().pages.update(page_id=page_id, properties=props)
     else:
-        page = notion.pages.create(parent={"database_id": NOTION_DATABASE_ID}, properties=props)
+        page = get_notion().pages.create(parent={"database_id": NOTION_DATABASE_ID}, properties=props)
     return page["id"]
@@ -3,62 +3,133 @@ Sentiment Analysis Node for Classification Agent
 
 Provides sentiment analysis functionality integrated with the review classification pipeline.
 Uses DeBERTa model for aspect-based sentiment analysis.
+
+Inference backends (SENTIMENT_BACKEND):
+    torch: full-precision PyTorch (default)
+    int8:  PyTorch with dynamic int8 quantization of the Linear layers
+    onnx:  ONNX Runtime via optimum, exported once to SENTIMENT_EXPORT_DIR
 """
 
 import os
-from typing import List
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
-
+import threading
+import time
+from typing import List, Optional
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from src.config import (
+    SENTIMENT_MODEL,
+    SENTIMENT_BACKEND,
+    SENTIMENT_EXPORT_DIR,
+    SENTIMENT_CONFIDENCE_THRESHOLD,
+    SENTIMENT_BATCH_SIZE,
+    SENTIMENT_THREADS,
+    SENTIMENT_CACHE_MAX_ENTRIES,
+)
+from src.cache import get_cache, make_key
 from src.utils import RawReview, SentimentData
 
+BACKENDS = ("torch", "int8", "onnx")
+
 
 class SentimentAnalyzer:
     """
     Singleton sentiment analyzer to avoid reloading model multiple times.
 
-    This class loads the DeBERTa model once and reuses it for all analyses.
-    First initialization will download the model (~1-2 minutes).
+    This class loads the DeBERTa model once per (model, backend) and reuses it
+    for all analyses. First initialization will download the model (~1-2 minutes).
     """
-    _instance = None
-    _initialized = False
-
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-
-    def __init__(self, confidence_threshold=0.8, model_name="yangheng/deberta-v3-base-absa-v1.1"):
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, confidence_threshold=SENTIMENT_CONFIDENCE_THRESHOLD, model_name=SENTIMENT_MODEL,
+                backend=SENTIMENT_BACKEND):
+        with cls._lock:
+            key = (model_name, backend)
+            if key not in cls._instances:
+                instance = super().__new__(cls)
+                instance._initialized = False
+                cls._instances[key] = instance
+            return cls._instances[key]
+
+    def __init__(self, confidence_threshold=SENTIMENT_CONFIDENCE_THRESHOLD, model_name=SENTIMENT_MODEL,
+                 backend=SENTIMENT_BACKEND):
         """
         Initialize the sentiment analyzer (only runs once due to singleton pattern).
 
         Args:
-            confidence_threshold (float): Minimum confidence for results (default: 0.8)
-            model_name (str): HuggingFace model name for sentiment analysis
+            confidence_threshold (float): Minimum confidence for results (default: SENTIMENT_CONFIDENCE_THRESHOLD)
+            model_name (str): HuggingFace model name for sentiment analysis (default: SENTIMENT_MODEL)
+            backend (str): Inference backend, one of BACKENDS (default: SENTIMENT_BACKEND)
         """
         # Only initialize once
-        if SentimentAnalyzer._initialized:
-            return
+        with SentimentAnalyzer._lock:
+            if self._initialized:
+                return
+            self._load(confidence_threshold, model_name, backend)
+            self._initialized = True
+
+    def _load(self, confidence_threshold, model_name, backend):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown SENTIMENT_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
 
         print("Loading sentiment model (first run only)")
-        print(f"   Model: {model_name}")
+        print(f"   Model: {model_name} ({backend})")
         print("   (This may take 1-2 minutes on first run)")
 
         self.confidence_threshold = confidence_threshold
         self.model_name = model_name
+        self.backend = backend
+
+        # CPU threads used by torch for inference, 0 keeps torch's default
+        if SENTIMENT_THREADS > 0:
+            torch.set_num_threads(SENTIMENT_THREADS)
 
         # Load tokenizer and model
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
-
-        # Create sentiment pipeline
-        self.sentiment_pipeline = pipeline(
-            "sentiment-analysis",
-            model=self.model,
-            tokenizer=self.tokenizer
-        )
+        if backend == "onnx":
+            self.model = self._load_onnx(model_name)
+        else:
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            self.model.eval()
+            if backend == "int8":
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+        # marker put between the head and tail of truncated reviews, as in truncate_text
+        self._gap_ids = self.tokenizer.encode(" [...] ", add_special_tokens=False)
+        # special tokens the model expects around a sequence, e.g. [CLS] ... [SEP]
+        wrapped = self.tokenizer.encode(" [...] ", add_special_tokens=True)
+        gap_at = next(i for i in range(len(wrapped)) if wrapped[i:i + len(self._gap_ids)] == self._gap_ids)
+        self._prefix_ids = wrapped[:gap_at]
+        self._suffix_ids = wrapped[gap_at + len(self._gap_ids):]
 
         print("Sentiment model loaded successfully")
-        SentimentAnalyzer._initialized = True
+
+    def _load_onnx(self, model_name: str):
+        """Load the ONNX Runtime model, exporting it on first use"""
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError as e:
+            raise ImportError(
+                "SENTIMENT_BACKEND=onnx needs optimum with onnxruntime: pip install 'optimum[onnxruntime]'"
+            ) from e
+
+        session_options = onnxruntime.SessionOptions()
+        if SENTIMENT_THREADS > 0:
+            session_options.intra_op_num_threads = SENTIMENT_THREADS
+
+        export_dir = os.path.join(SENTIMENT_EXPORT_DIR, model_name.strip("/").replace("/", "--"))
+        if os.path.exists(os.path.join(export_dir, "model.onnx")):
+            return ORTModelForSequenceClassification.from_pretrained(export_dir, session_options=session_options)
+
+        print(f"   Exporting to ONNX (first run only): {export_dir}")
+        model = ORTModelForSequenceClassification.from_pretrained(
+            model_name, export=True, session_options=session_options
+        )
+        model.save_pretrained(export_dir)
+        return model
 
     def truncate_text(self, text: str, max_tokens: int = 450) -> str:
         """
@@ -86,6 +157,32 @@ class SentimentAnalyzer:
 
         return f"{start_text} [...] {end_text}"
 
+    def truncate_ids(self, ids: List[int], max_tokens: int = 450) -> List[int]:
+        """
+        Token-level version of truncate_text, keeps the first 200 and last 250 ids.
+
+        Args:
+            ids (List[int]): Token ids without special tokens
+            max_tokens (int): Maximum tokens to keep (default: 450 to stay under 512 limit)
+
+        Returns:
+            List[int]: Truncated ids
+        """
+        if len(ids) <= max_tokens:
+            return ids
+        return ids[:200] + self._gap_ids + ids[-250:]
+
+    def _pad(self, sequences: List[List[int]]):
+        """Pad id sequences to the longest one, on the side the tokenizer pads"""
+        width = max(len(ids) for ids in sequences)
+        input_ids = torch.full((len(sequences), width), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+        for row, ids in enumerate(sequences):
+            span = slice(width - len(ids), width) if self.tokenizer.padding_side == "left" else slice(0, len(ids))
+            input_ids[row, span] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, span] = 1
+        return input_ids, attention_mask
+
     def analyze(self, text: str) -> dict:
         """
         Analyze sentiment of text.
@@ -97,12 +194,43 @@ class SentimentAnalyzer:
             dict: Sentiment result with 'label' and 'score'
                   Example: {"label": "Positive", "score": 0.95}
         """
-        # Truncate if necessary
-        truncated_text = self.truncate_text(text)
+        return self.analyze_batch([text])[0]
 
-        # Analyze sentiment
-        result = self.sentiment_pipeline(truncated_text)[0]
-        return result
+    def analyze_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[dict]:
+        """
+        Analyze sentiment of many texts with batched inference.
+
+        Every text is tokenized once, truncated on token ids and fed to the model
+        as input_ids/attention_mask. Texts are sorted by token count so each padded
+        batch holds similar lengths, then results are put back in the input order.
+
+        Args:
+            texts (List[str]): The texts to analyze
+            batch_size (int): Texts per forward pass (default: SENTIMENT_BATCH_SIZE)
+
+        Returns:
+            List[dict]: Sentiment result per text with 'label' and 'score'
+        """
+        batch_size = max(1, batch_size or SENTIMENT_BATCH_SIZE)
+        if not texts:
+            return []
+        encoded_ids = self.tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]
+        inputs = [self._prefix_ids + self.truncate_ids(ids) + self._suffix_ids for ids in encoded_ids]
+        order = sorted(range(len(inputs)), key=lambda i: len(inputs[i]))
+        results: List[Optional[dict]] = [None] * len(inputs)
+        id2label = self.model.config.id2label
+
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            input_ids, attention_mask = self._pad([inputs[i] for i in chunk])
+            with torch.inference_mode():
+                logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+                probs = torch.softmax(logits, dim=-1)
+            scores, labels = probs.max(dim=-1)
+            for i, label, score in zip(chunk, labels.tolist(), scores.tolist()):
+                results[i] = {"label": id2label[label], "score": score}
+
+        return results
 
 
 def analyze_review_sentiment(review: RawReview) -> SentimentData:
@@ -115,9 +243,97 @@ def analyze_review_sentiment(review: RawReview) -> SentimentData:
     Returns:
         SentimentData: Sentiment analysis results
     """
-    analyzer = SentimentAnalyzer()
-    result = analyzer.analyze(review.review)
+    return _to_sentiment_data(review, score_texts([review.review])[0])
+
+
+def _sentiment_cache():
+    # scores only change with the model, so entries never expire, the LRU bound keeps the file small
+    return get_cache("sentiment", ttl=0, max_entries=SENTIMENT_CACHE_MAX_ENTRIES)
+
+
+def score_texts(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    model_name: str = SENTIMENT_MODEL,
+    backend: str = SENTIMENT_BACKEND,
+) -> List[dict]:
+    """
+    Sentiment of each text, scoring only texts not already in the sentiment cache.
+
+    The model is only loaded when something has to be scored.
+
+    Args:
+        texts (List[str]): The texts to analyze
+        batch_size (int): Texts per forward pass (default: SENTIMENT_BATCH_SIZE)
+        model_name (str): HuggingFace model name
+        backend (str): Inference backend
+
+    Returns:
+        List[dict]: Sentiment result per text with 'label' and 'score'
+    """
+    cache = _sentiment_cache()
+    keys = [make_key(model_name, backend, text) for text in texts]
+    known = cache.get_many(keys) if cache is not None else {}
 
+    # identical texts in one batch are scored once
+    todo = {key: text for key, text in zip(keys, texts) if key not in known}
+    if todo:
+        analyzer = SentimentAnalyzer(model_name=model_name, backend=backend)
+        scored = dict(zip(todo, analyzer.analyze_batch(list(todo.values()), batch_size)))
+        if cache is not None:
+            cache.set_many(scored)
+        known.update(scored)
+
+    return [known[key] for key in keys]
+
+
+def cached_sentiment(review: RawReview) -> Optional[SentimentData]:
+    """Sentiment of a review if it has been scored before, without loading the model"""
+    cache = _sentiment_cache()
+    if cache is None:
+        return None
+    result = cache.get(make_key(SENTIMENT_MODEL, SENTIMENT_BACKEND, review.review))
+    return _to_sentiment_data(review, result) if result is not None else None
+
+
+def compare_backends(texts: List[str], backend: str, model_name: str = SENTIMENT_MODEL) -> dict:
+    """
+    Accuracy parity of a backend against full-precision PyTorch.
+
+    Args:
+        texts (List[str]): Texts to score with both backends
+        backend (str): Backend to check, one of BACKENDS
+        model_name (str): HuggingFace model name
+
+    Returns:
+        dict: Label agreement, score differences and time taken by each backend
+    """
+    reference = SentimentAnalyzer(model_name=model_name, backend="torch")
+    candidate = SentimentAnalyzer(model_name=model_name, backend=backend)
+
+    started = time.perf_counter()
+    expected = reference.analyze_batch(texts)
+    reference_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = candidate.analyze_batch(texts)
+    candidate_seconds = time.perf_counter() - started
+
+    diffs = [abs(e["score"] - a["score"]) for e, a in zip(expected, actual)]
+    mismatches = [i for i, (e, a) in enumerate(zip(expected, actual)) if e["label"] != a["label"]]
+    return {
+        "backend": backend,
+        "texts": len(texts),
+        "label_agreement": 1 - len(mismatches) / len(texts) if texts else 1.0,
+        "mismatches": mismatches,
+        "max_score_diff": max(diffs, default=0.0),
+        "mean_score_diff": sum(diffs) / len(diffs) if diffs else 0.0,
+        "torch_seconds": reference_seconds,
+        f"{backend}_seconds": candidate_seconds,
+    }
+
+
+def _to_sentiment_data(review: RawReview, result: dict) -> SentimentData:
     label = result['label']
     score = result['score']
 
@@ -140,25 +356,20 @@ def analyze_review_sentiment(review: RawReview) -> SentimentData:
     )
 
 
-def analyze_batch_sentiments(reviews: List[RawReview]) -> List[SentimentData]:
+def analyze_batch_sentiments(reviews: List[RawReview], batch_size: Optional[int] = None) -> List[SentimentData]:
     """
     Analyze sentiment for a batch of reviews.
 
     Args:
         reviews (List[RawReview]): List of reviews to analyze
+        batch_size (int): Reviews per forward pass (default: SENTIMENT_BATCH_SIZE)
 
     Returns:
         List[SentimentData]: List of sentiment analysis results
     """
     print(f" Analyzing sentiment for {len(reviews)} reviews...")
 
-    results = []
-    for idx, review in enumerate(reviews, 1):
-        sentiment = analyze_review_sentiment(review)
-        results.append(sentiment)
-
-        if idx % 10 == 0:
-            print(f"  ... {idx}/{len(reviews)} analyzed")
+    results = score_texts([review.review for review in reviews], batch_size)
 
     print("Sentiment analysis complete")
-    return results
+    return [_to_sentiment_data(review, result) for review, result in zip(reviews, results)]
@@ -0,0 +1,206 @@
+"""
+Streaming Pipeline Runner
+
+Runs the same steps as src/graph.py (load -> detect -> sentiment -> normalize -> tee)
+as concurrent stages connected by bounded queues, so a review can be written to
+Notion while later reviews are still waiting on the LLM.
+
+- detect:    several workers call the LLM at once, within the DETECT_RPM/DETECT_TPM budgets
+- sentiment: reviews are grouped into micro-batches for the model (CPU bound)
+- normalize: sentiment-aware criticality, cheap, runs on the event loop
+- tee:       a few writers upsert to Notion (I/O bound, rate limited by the API)
+
+The returned list has the same order as the sequential graph, whatever order
+the stages finish in.
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.config import (
+    OLLAMA_MODEL,
+    DETECT_PACK_SIZE,
+    PIPELINE_DETECT_CONCURRENCY,
+    PIPELINE_SENTIMENT_BATCH,
+    PIPELINE_NOTION_WRITERS,
+    PIPELINE_QUEUE_SIZE,
+)
+from src.database import amark_reviews_processed, aclose_pool
+from src.graph import load_input_reviews, sentiment_enabled, neutral_sentiment, log_enriched
+from src.nodes.detect_errors import adetect_errors_packed, detect_cache_stats
+from src.nodes.normalize import normalize
+from src.nodes.sentiment_analysis import analyze_batch_sentiments
+from src.utils import RawReview, EnrichedError
+
+# end of stream marker, every consumer of a queue gets one
+_DONE = object()
+
+
+class StageStats:
+    """Items handled and time spent working by one stage, summed over its workers"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+
+    def add(self, items: int, seconds: float):
+        self.items += items
+        self.busy += seconds
+
+    def summary(self, wall: float) -> str:
+        rate = self.items / self.busy if self.busy else 0.0
+        utilisation = self.busy / (wall * self.workers) if wall else 0.0
+        return (f"  {self.name:<10} workers={self.workers:<3} items={self.items:<5} "
+                f"busy={self.busy:7.2f}s  {rate:7.2f} items/s  utilisation={utilisation:.0%}")
+
+
+async def _fan_in(workers: List, out: Optional[asyncio.Queue], consumers: int):
+    """Run a stage's workers, then tell each downstream consumer the stream has ended"""
+    await asyncio.gather(*workers)
+    if out is not None:
+        for _ in range(consumers):
+            await out.put(_DONE)
+
+
+async def run_pipeline(
+    reviews: Optional[List[RawReview]] = None,
+    detect_concurrency: int = PIPELINE_DETECT_CONCURRENCY,
+    sentiment_batch_size: int = PIPELINE_SENTIMENT_BATCH,
+    notion_writers: int = PIPELINE_NOTION_WRITERS,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+) -> List[EnrichedError]:
+    """
+    Process reviews through the streaming pipeline.
+
+    Args:
+        reviews (List[RawReview]): Reviews to process, loaded like the graph's load node when None
+        detect_concurrency (int): Concurrent LLM detection calls
+        sentiment_batch_size (int): Largest sentiment micro-batch
+        notion_writers (int): Concurrent Notion upserts
+        queue_size (int): Capacity of each queue between stages
+
+    Returns:
+        List[EnrichedError]: Enriched errors in the same order as the sequential graph
+    """
+    if reviews is None:
+        reviews = await asyncio.to_thread(load_input_reviews)
+    if not reviews:
+        return []
+
+    detect_concurrency = max(1, detect_concurrency)
+    sentiment_batch_size = max(1, sentiment_batch_size)
+    notion_writers = max(1, notion_writers)
+
+    dry = os.getenv("NOTION_DRY_RUN", "0") in ("1", "true", "True")
+    use_db = os.getenv("USE_DATABASE", "false").lower() == "true"
+    use_sentiment = sentiment_enabled()
+    if not use_sentiment:
+        print("Sentiment analysis disabled (ENABLE_SENTIMENT=false)")
+
+    detect_q: asyncio.Queue = asyncio.Queue(queue_size)
+    sentiment_q: asyncio.Queue = asyncio.Queue(queue_size)
+    write_q: asyncio.Queue = asyncio.Queue(queue_size)
+
+    stats = {
+        "detect": StageStats("detect", detect_concurrency),
+        "sentiment": StageStats("sentiment", 1),
+        "normalize": StageStats("normalize", 1),
+        "tee": StageStats("tee", notion_writers),
+    }
+    # (review index, position within the review) -> written item
+    written: Dict[Tuple[int, int], EnrichedError] = {}
+
+    async def source():
+        for idx, review in enumerate(reviews):
+            await detect_q.put((idx, review))
+        for _ in range(detect_concurrency):
+            await detect_q.put(_DONE)
+
+    async def detect_worker():
+        done = False
+        while not done:
+            pack = [await detect_q.get()]
+            # with DETECT_PACK_SIZE > 1 reviews already waiting share one call
+            while len(pack) < DETECT_PACK_SIZE and not detect_q.empty() and pack[-1] is not _DONE:
+                pack.append(detect_q.get_nowait())
+            if pack[-1] is _DONE:
+                pack.pop()
+                done = True
+            if not pack:
+                continue
+
+            started = time.perf_counter()
+            results = await adetect_errors_packed([review for _, review in pack], OLLAMA_MODEL)
+            stats["detect"].add(len(pack), time.perf_counter() - started)
+            for (idx, review), errs in zip(pack, results):
+                await sentiment_q.put((idx, review, errs))
+
+    async def sentiment_stage():
+        # a single consumer, so the end marker is always the last item it sees
+        done = False
+        while not done:
+            batch = [await sentiment_q.get()]
+            # take whatever else is already waiting, up to the batch size
+            while len(batch) < sentiment_batch_size and not sentiment_q.empty():
+                batch.append(sentiment_q.get_nowait())
+            if batch[-1] is _DONE:
+                batch.pop()
+                done = True
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            batch_reviews = [review for _, review, _ in batch]
+            if use_sentiment:
+                sentiments = await asyncio.to_thread(analyze_batch_sentiments, batch_reviews)
+            else:
+                sentiments = [neutral_sentiment(r) for r in batch_reviews]
+            stats["sentiment"].add(len(batch), time.perf_counter() - started)
+
+            for (idx, review, errs), sentiment in zip(batch, sentiments):
+                started = time.perf_counter()
+                enriched = normalize(review, errs, sentiment)
+                stats["normalize"].add(1, time.perf_counter() - started)
+                for pos, e in enumerate(enriched):
+                    await write_q.put((idx, pos, e))
+
+    async def writer():
+        while (item := await write_q.get()) is not _DONE:
+            idx, pos, e = item
+            started = time.perf_counter()
+            await asyncio.to_thread(log_enriched, e, dry)
+            stats["tee"].add(1, time.perf_counter() - started)
+            written[(idx, pos)] = e
+            if len(written) % 20 == 0:
+                print(f"… processed {len(written)} rows")
+
+    print(f"Streaming {len(reviews)} reviews "
+          f"(detect x{detect_concurrency}, sentiment batch {sentiment_batch_size}, notion x{notion_writers})")
+    wall_start = time.perf_counter()
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(source())
+        tg.create_task(_fan_in([detect_worker() for _ in range(detect_concurrency)], sentiment_q, 1))
+        tg.create_task(_fan_in([sentiment_stage()], write_q, notion_writers))
+        tg.create_task(_fan_in([writer() for _ in range(notion_writers)], None, 0))
+
+    wall = time.perf_counter() - wall_start
+    items = [written[key] for key in sorted(written)]
+
+    #mark all reviews as processed in batch
+    if use_db and items:
+        await amark_reviews_processed([e.review.review_id for e in items])
+        await aclose_pool()
+
+    print(f"Pipeline finished in {wall:.2f}s ({len(reviews) / wall:.2f} reviews/s)")
+    for stage in stats.values():
+        print(stage.summary(wall))
+    cache = detect_cache_stats()
+    if cache is not None:
+        print(f"  detect cache: {cache['hits']} hits / {cache['misses']} misses ({cache['hit_rate']:.0%})")
+
+    return items
@@ -1,7 +1,14 @@
+import asyncio
+
+from src.config import PIPELINE_MODE
 from src.graph import wf
 
 if __name__ == "__main__":
-    enriched = wf.invoke({})  
+    if PIPELINE_MODE == "stream":
+        from src.pipeline import run_pipeline
+        enriched = asyncio.run(run_pipeline())
+    else:
+        enriched = wf.invoke({})  
     print(f"\n Done. Processed {len(enriched)} enriched errors.\n")
     print("────────────────────────────────────────────────────────────")
 
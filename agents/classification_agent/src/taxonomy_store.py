@@ -0,0 +1,306 @@
+"""
+Shared Category Taxonomy Store
+
+SQLite (WAL) store for canonical categories, their embeddings and variants, so
+classification workers in different processes converge on the same names.
+
+Every write bumps a revision counter and stamps the rows it touches, so a worker
+only reads what changed since its last sync. Writers don't hold a lock while
+they compute embeddings: a new category is checked again, inside the write
+transaction, against the categories other workers added since the writer's
+snapshot, and becomes a variant of one of them if it matches (optimistic merge).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class TaxonomyStore:
+    """
+    Canonical categories and variants shared through one SQLite file.
+
+    Safe to share between threads. Each process opens its own instance.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) a taxonomy store.
+
+        Args:
+            path (str): SQLite file
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS categories (
+                    name TEXT PRIMARY KEY,
+                    name_lower TEXT NOT NULL UNIQUE,
+                    embedding BLOB NOT NULL,
+                    rev INTEGER NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS variants (
+                    variant_lower TEXT PRIMARY KEY,
+                    variant TEXT NOT NULL,
+                    canonical TEXT NOT NULL,
+                    rev INTEGER NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS categories_rev ON categories (rev)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS variants_rev ON variants (rev)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # generation changes on merges and resets, which readers can't apply incrementally
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0), ('generation', 0)")
+            self._conn.execute("COMMIT")
+            self._data_version = None
+            self._state = (0, 0)
+            self._refresh()
+
+    def _refresh(self):
+        """Re-read (generation, revision) if another connection committed since the last check"""
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+            self._state = (meta["generation"], meta["revision"])
+
+    def state(self) -> Tuple[int, int]:
+        """
+        Current (generation, revision) of the store.
+
+        Cheap enough to call before every lookup: it only queries the tables when
+        SQLite reports a commit from another connection.
+        """
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def snapshot(self) -> Tuple[Tuple[int, int], Dict[str, Dict], Dict[str, np.ndarray]]:
+        """
+        Full copy of the taxonomy.
+
+        Returns:
+            Tuple: (generation, revision), categories {name: {"variants": [...]}}, embedding per name
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+                categories, vectors = self._read_since(-1)
+            finally:
+                self._conn.execute("COMMIT")
+            self._refresh()
+            return (meta["generation"], meta["revision"]), categories, vectors
+
+    def changes_since(self, revision: int) -> Tuple[int, Dict[str, Dict], Dict[str, np.ndarray]]:
+        """
+        Categories and variants written after revision.
+
+        Returns:
+            Tuple: New revision, categories {name: {"variants": [...]}} (new names, or
+            existing names with new variants), embedding per new name
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                current = self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+                categories, vectors = self._read_since(revision)
+            finally:
+                self._conn.execute("COMMIT")
+            return current, categories, vectors
+
+    def _read_since(self, revision: int) -> Tuple[Dict[str, Dict], Dict[str, np.ndarray]]:
+        categories: Dict[str, Dict] = {}
+        vectors: Dict[str, np.ndarray] = {}
+        for name, blob in self._conn.execute(
+            "SELECT name, embedding FROM categories WHERE rev > ? ORDER BY rev, rowid", (revision,)
+        ):
+            categories[name] = {"variants": []}
+            vectors[name] = np.frombuffer(blob, dtype=np.float32)
+        for variant, canonical in self._conn.execute(
+            "SELECT variant, canonical FROM variants WHERE rev > ? ORDER BY rev, rowid", (revision,)
+        ):
+            categories.setdefault(canonical, {"variants": []})["variants"].append(variant)
+        return categories, vectors
+
+    def _bump(self, key: str = "revision") -> int:
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = ?", (key,))
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _write(self, fn, *args):
+        """Run fn in a write transaction, retrying if the database stays busy"""
+        with self._lock:
+            for attempt in range(5):
+                try:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    break
+                except sqlite3.OperationalError as e:
+                    if "locked" not in str(e) or attempt == 4:
+                        raise
+                    time.sleep(0.05 * (attempt + 1))
+            try:
+                result = fn(*args)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            # our own commits don't change data_version, re-read the meta table
+            self._data_version = None
+            self._refresh()
+            return result
+
+    def add_category(self, name: str, embedding: np.ndarray, since: int, threshold: float) -> str:
+        """
+        Create a canonical category, unless a matching one was added after since.
+
+        Args:
+            name (str): Proposed canonical name
+            embedding (np.ndarray): Unit-length embedding of name
+            since (int): Revision the caller's view of the taxonomy is based on
+            threshold (float): Cosine similarity at which name joins an existing category
+
+        Returns:
+            str: The canonical name name now resolves to
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        return self._write(self._add_category, name, vector, since, threshold)
+
+    def _add_category(self, name: str, vector: np.ndarray, since: int, threshold: float) -> str:
+        name_lower = name.lower()
+        existing = self._resolve(name_lower)
+        if existing is not None:
+            return existing
+
+        best, best_similarity = None, threshold
+        for other, blob in self._conn.execute(
+            "SELECT name, embedding FROM categories WHERE rev > ?", (since,)
+        ):
+            similarity = float(np.dot(np.frombuffer(blob, dtype=np.float32), vector))
+            if similarity >= best_similarity:
+                best, best_similarity = other, similarity
+
+        revision = self._bump()
+        if best is not None:
+            self._conn.execute(
+                "INSERT INTO variants (variant_lower, variant, canonical, rev) VALUES (?, ?, ?, ?)",
+                (name_lower, name, best, revision),
+            )
+            return best
+        self._conn.execute(
+            "INSERT INTO categories (name, name_lower, embedding, rev) VALUES (?, ?, ?, ?)",
+            (name, name_lower, vector.tobytes(), revision),
+        )
+        return name
+
+    def add_variant(self, variant: str, canonical: str) -> str:
+        """
+        Record variant as a spelling of canonical.
+
+        Returns:
+            str: The canonical name variant resolves to, which is another one if a
+            different worker mapped it first
+        """
+        return self._write(self._add_variant, variant, canonical)
+
+    def _add_variant(self, variant: str, canonical: str) -> str:
+        existing = self._resolve(variant.lower())
+        if existing is not None:
+            return existing
+        self._conn.execute(
+            "INSERT INTO variants (variant_lower, variant, canonical, rev) VALUES (?, ?, ?, ?)",
+            (variant.lower(), variant, canonical, self._bump()),
+        )
+        return canonical
+
+    def _resolve(self, name_lower: str) -> Optional[str]:
+        row = self._conn.execute("SELECT name FROM categories WHERE name_lower = ?", (name_lower,)).fetchone()
+        if row is None:
+            row = self._conn.execute(
+                "SELECT canonical FROM variants WHERE variant_lower = ?", (name_lower,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def merge(self, keep: str, discard: str) -> bool:
+        """Fold discard (and its variants) into keep"""
+        return self._write(self._merge, keep, discard)
+
+    def _merge(self, keep: str, discard: str) -> bool:
+        names = {row[0] for row in self._conn.execute(
+            "SELECT name FROM categories WHERE name IN (?, ?)", (keep, discard)
+        )}
+        if names != {keep, discard}:
+            return False
+        revision = self._bump()
+        self._bump("generation")
+        self._conn.execute("DELETE FROM categories WHERE name = ?", (discard,))
+        self._conn.execute("UPDATE variants SET canonical = ?, rev = ? WHERE canonical = ?", (keep, revision, discard))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO variants (variant_lower, variant, canonical, rev) VALUES (?, ?, ?, ?)",
+            (discard.lower(), discard, keep, revision),
+        )
+        return True
+
+    def reset(self):
+        self._write(self._reset)
+
+    def _reset(self):
+        self._conn.execute("DELETE FROM categories")
+        self._conn.execute("DELETE FROM variants")
+        self._bump()
+        self._bump("generation")
+
+    def import_categories(self, categories: Dict[str, Dict], vectors: Dict[str, np.ndarray]) -> int:
+        """
+        Seed the store from existing mappings, skipping names it already has.
+
+        Returns:
+            int: Number of categories added
+        """
+        def seed():
+            added = 0
+            for name, data in categories.items():
+                if self._resolve(name.lower()) is None:
+                    self._conn.execute(
+                        "INSERT INTO categories (name, name_lower, embedding, rev) VALUES (?, ?, ?, ?)",
+                        (name, name.lower(), np.asarray(vectors[name], dtype=np.float32).tobytes(), self._bump()),
+                    )
+                    added += 1
+                for variant in data.get("variants", []):
+                    self._add_variant(variant, name)
+            return added
+        return self._write(seed)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_stores: Dict[str, TaxonomyStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_taxonomy_store(path: str) -> TaxonomyStore:
+    """Shared store for a file, one per process"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = TaxonomyStore(path)
+        return _stores[path]
@@ -0,0 +1,105 @@
+"""
+Background Model Warm-up
+
+The agent imports its tools lazily so it can register on the network right away.
+The models the tools need are then loaded here on a daemon thread, so the first
+request does not pay for them. Tools still work before warm-up finishes, they
+just load the model themselves (the loaders are shared and lock-guarded).
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config import AGENT_WARMUP, ENABLE_SENTIMENT, EMBEDDING_MODEL
+
+_ready = threading.Event()
+_thread: Optional[threading.Thread] = None
+_start_lock = threading.Lock()
+_loaded: Dict[str, float] = {}
+_failed: Dict[str, str] = {}
+
+
+def _load_sentiment():
+    from src.nodes.sentiment_analysis import SentimentAnalyzer
+    SentimentAnalyzer()
+
+
+def _load_normalizer():
+    from src.nodes.category_normalizer import get_normalizer
+    get_normalizer().model
+
+
+def _load_embeddings():
+    from src.memory.embedding import get_sentence_model
+    get_sentence_model(EMBEDDING_MODEL)
+
+
+def _components(enable_memory: bool) -> List[Tuple[str, Callable[[], Any]]]:
+    components = []
+    if ENABLE_SENTIMENT:
+        components.append(("sentiment", _load_sentiment))
+    if os.getenv("USE_CATEGORY_NORMALIZATION", "true").lower() in {"1", "true", "yes"}:
+        components.append(("normalizer", _load_normalizer))
+    if enable_memory:
+        components.append(("embeddings", _load_embeddings))
+    return components
+
+
+def _run(components: List[Tuple[str, Callable[[], Any]]]):
+    for name, load in components:
+        start = time.perf_counter()
+        try:
+            load()
+            _loaded[name] = time.perf_counter() - start
+            print(f"[Warmup] {name} ready in {_loaded[name]:.1f}s")
+        except Exception as e:
+            # the tool will retry (and report) the load on first use
+            _failed[name] = f"{type(e).__name__}: {e}"
+            print(f"[Warmup] {name} failed: {_failed[name]}")
+    _ready.set()
+
+
+def start_warmup(enable_memory: bool = False) -> bool:
+    """
+    Start loading the agent's models on a background thread.
+
+    Safe to call more than once, only the first call starts a thread.
+
+    Args:
+        enable_memory (bool): Also load the embedding model used by long term memory
+
+    Returns:
+        bool: True if a warm-up thread was started by this call
+    """
+    global _thread
+    with _start_lock:
+        if _thread is not None or _ready.is_set():
+            return False
+        if not AGENT_WARMUP:
+            _ready.set()
+            return False
+        _thread = threading.Thread(
+            target=_run, args=(_components(enable_memory),), name="model-warmup", daemon=True
+        )
+        _thread.start()
+        return True
+
+
+def is_ready() -> bool:
+    """True once every warm-up component has loaded (or failed)"""
+    return _ready.is_set()
+
+
+def wait_ready(timeout: Optional[float] = None) -> bool:
+    """Block until warm-up has finished, returns False on timeout"""
+    return _ready.wait(timeout)
+
+
+def warmup_status() -> Dict[str, Any]:
+    return {
+        "ready": _ready.is_set(),
+        "loaded": dict(_loaded),
+        "failed": dict(_failed),
+    }
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Accuracy parity check for the sentiment inference backends.
+
+Scores the bundled review CSV with full-precision PyTorch and with the chosen
+backend, then reports label agreement, score drift and timings.
+
+Usage:
+    python tests/sentiment_backend_parity.py --backend onnx
+    python tests/sentiment_backend_parity.py --backend int8 --limit 200 --min-agreement 0.97
+"""
+
+import argparse
+import os
+import sys
+
+# Add parent directory to path to import src modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.config import DATA_PATH, SENTIMENT_MODEL
+from src.nodes.load_reviews import load_reviews
+from src.nodes.sentiment_analysis import BACKENDS, compare_backends
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a sentiment backend against PyTorch")
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "torch"], default="onnx")
+    parser.add_argument("--model", default=SENTIMENT_MODEL)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--limit", type=int, default=None, help="Only score the first N reviews")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="Exit with an error below this label agreement")
+    args = parser.parse_args()
+
+    reviews = load_reviews(args.data)
+    if args.limit:
+        reviews = reviews[:args.limit]
+    texts = [r.review for r in reviews]
+
+    report = compare_backends(texts, args.backend, args.model)
+
+    print("=" * 60)
+    print(f"Backend parity: {args.backend} vs torch ({report['texts']} reviews)")
+    print("=" * 60)
+    print(f"  label agreement: {report['label_agreement']:.2%}")
+    print(f"  max score diff:  {report['max_score_diff']:.4f}")
+    print(f"  mean score diff: {report['mean_score_diff']:.4f}")
+    print(f"  torch:           {report['torch_seconds']:.2f}s")
+    print(f"  {args.backend + ':':<16} {report[args.backend + '_seconds']:.2f}s")
+    if report["mismatches"]:
+        print(f"  mismatched reviews: {[reviews[i].review_id for i in report['mismatches'][:20]]}")
+
+    if report["label_agreement"] < args.min_agreement:
+        print(f"FAIL: agreement below {args.min_agreement:.2%}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -175,6 +175,132 @@ def test_merge_categories():
         os.unlink(f.name)
 
 
+def test_index_matches_brute_force(monkeypatch):
+    """Test that the embedding matrix finds the same nearest category as a full scan"""
+    import numpy as np
+    from src.nodes import category_normalizer
+
+    rng = np.random.default_rng(0)
+    vectors = {}
+
+    class FakeModel:
+        def encode(self, texts, convert_to_numpy=True):
+            for text in texts:
+                if text not in vectors:
+                    vectors[text] = rng.normal(size=16)
+            return np.array([vectors[text] for text in texts])
+
+    monkeypatch.setattr(category_normalizer, "get_sentence_model", lambda name: FakeModel())
+
+    with tempfile.TemporaryDirectory() as d:
+        normalizer = CategoryNormalizer(cache_file=os.path.join(d, "mappings.json"), similarity_threshold=0.99)
+        names = [f"Category {i}" for i in range(200)]
+        for name in names:
+            assert normalizer.normalize_category(name) == name
+        # grew past the initial capacity
+        assert len(normalizer._names) == 200
+
+        for i in range(20):
+            query = vectors[names[i]] + rng.normal(scale=0.01, size=16)
+            scores = [np.dot(query, vectors[n]) / (np.linalg.norm(query) * np.linalg.norm(vectors[n])) for n in names]
+            assert normalizer._find_similar_category("q", query.tolist()) == names[int(np.argmax(scores))]
+
+        # exact and variant lookups go through the lowercase index
+        normalizer.categories["Category 0"]["variants"].append("Zero")
+        normalizer._rebuild_index()
+        assert normalizer.normalize_category("zero") == "Category 0"
+        assert normalizer.normalize_category("CATEGORY 7") == "Category 7"
+
+        # a reload rebuilds the same index
+        reloaded = CategoryNormalizer(cache_file=normalizer.cache_file, similarity_threshold=0.99)
+        assert reloaded._names == normalizer._names
+        assert reloaded.normalize_category("category 199") == "Category 199"
+
+
+
+def test_batch_encoding_and_write_behind(monkeypatch):
+    """Test that unseen labels are embedded in one call and saves are deferred until flush"""
+    import json
+    import numpy as np
+    from src.nodes import category_normalizer
+
+    calls = []
+    axes = {"billing": 0, "invoice": 0, "login": 1, "password": 1}
+
+    class FakeModel:
+        def encode(self, texts, convert_to_numpy=True):
+            calls.append(list(texts))
+            return np.eye(4)[[axes[text.split()[0].lower()] for text in texts]]
+
+    monkeypatch.setattr(category_normalizer, "get_sentence_model", lambda name: FakeModel())
+
+    with tempfile.TemporaryDirectory() as d:
+        cache_file = os.path.join(d, "mappings.json")
+        normalizer = CategoryNormalizer(cache_file=cache_file, similarity_threshold=0.9, save_delay=60)
+
+        result = normalizer.normalize_batch(["Billing", "Login", "Invoice errors", "billing", "Password reset", ""])
+        assert result == ["Billing", "Login", "Billing", "Billing", "Login", "Other"]
+        assert calls == [["Billing", "Login", "Invoice errors", "Password reset"]]
+        assert normalizer.normalize_categories(["LOGIN", "billing"]) == ["Login", "Billing"]
+        assert len(calls) == 1
+
+        # nothing written until the debounce fires or flush() is called
+        assert not os.path.exists(cache_file)
+        normalizer.flush()
+        with open(cache_file) as f:
+            saved = json.load(f)
+        assert saved == {"Billing": {"variants": ["Invoice errors"]}, "Login": {"variants": ["Password reset"]}}
+        with np.load(normalizer.embeddings_file) as stored:
+            assert stored["names"].tolist() == ["Billing", "Login"]
+            assert stored["embeddings"].shape == (2, 4)
+
+        # older files with inline embeddings still load, and are rewritten in the new layout
+        legacy = os.path.join(d, "legacy.json")
+        with open(legacy, "w") as f:
+            json.dump({"Billing": {"embedding": [1.0, 0, 0, 0], "variants": ["Invoice"]}}, f)
+        loaded = CategoryNormalizer(cache_file=legacy, similarity_threshold=0.9, save_delay=0)
+        assert loaded.normalize_category("invoice") == "Billing"
+        assert loaded.normalize_category("Billing overcharge") == "Billing"
+        with open(legacy) as f:
+            assert "embedding" not in json.load(f)["Billing"]
+        assert len(calls) == 2
+
+
+def test_embeddings_paired_by_name(monkeypatch):
+    """Test that embeddings from a different save are never paired with the wrong names"""
+    import json
+    import numpy as np
+    from src.nodes import category_normalizer
+
+    calls = []
+    axes = {"billing": 0, "login": 1, "shipping": 2}
+
+    class FakeModel:
+        def encode(self, texts, convert_to_numpy=True):
+            calls.append(list(texts))
+            return np.eye(4)[[axes[text.split()[0].lower()] for text in texts]]
+
+    monkeypatch.setattr(category_normalizer, "get_sentence_model", lambda name: FakeModel())
+
+    with tempfile.TemporaryDirectory() as d:
+        cache_file = os.path.join(d, "mappings.json")
+        normalizer = CategoryNormalizer(cache_file=cache_file, similarity_threshold=0.9, save_delay=0)
+        normalizer.normalize_batch(["Billing", "Login"])
+
+        # mappings from a later save, renamed with the same count, next to the older embeddings
+        with open(cache_file, "w") as f:
+            json.dump({"Shipping": {"variants": []}, "Billing": {"variants": []}}, f)
+        calls.clear()
+        loaded = CategoryNormalizer(cache_file=cache_file, similarity_threshold=0.9, save_delay=0)
+
+        assert calls == [["Shipping"]]
+        assert loaded.normalize_category("Shipping delays") == "Shipping"
+        assert loaded.normalize_category("Billing overcharge") == "Billing"
+        assert loaded.normalize_category("Login failure") == "Login failure"
+        with np.load(loaded.embeddings_file) as stored:
+            assert stored["names"].tolist()[:2] == ["Shipping", "Billing"]
+
+
 if __name__ == "__main__":
     print("Running category normalization tests...")
 
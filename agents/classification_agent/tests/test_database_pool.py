@@ -0,0 +1,122 @@
+"""
+Tests for the pooled database access layer
+
+Needs a reachable PostgreSQL (DB_HOST / DB_PORT / DB_USER / DB_NAME), skipped otherwise.
+Everything runs in a throwaway schema.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import psycopg
+
+from src import database
+
+
+@pytest.fixture
+def db(monkeypatch):
+    try:
+        admin = psycopg.connect(**database.DB_CONFIG, connect_timeout=3, autocommit=True)
+    except psycopg.OperationalError as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+
+    schema = f"test_{uuid.uuid4().hex[:8]}"
+    admin.execute(f"CREATE SCHEMA {schema}")
+    monkeypatch.setitem(database.DB_CONFIG, "options", f"-c search_path={schema}")
+    database.close_pool()
+    database.init_database()
+    try:
+        yield database
+    finally:
+        database.close_pool()
+        admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+def test_review_roundtrip(db):
+    """Test inserting, loading, marking and counting reviews through the pool"""
+    first = db.insert_new_review("Export is broken", "u1", "u1@example.com", "User One", 2)
+    second = db.insert_new_review("Great support", "u2", "u2@example.com", "User Two", 5)
+    assert (first, second) == ("REV-0001", "REV-0002")
+
+    assert [r.review_id for r in db.load_unprocessed_reviews(10)] == [first, second]
+    assert [r.review_id for r in db.load_reviews_by_ids([first, "REV-9999"])] == [first]
+
+    db.mark_reviews_processed([first])
+    assert db.get_processing_stats() == {"total": 2, "processed": 1, "unprocessed": 1}
+    assert [r.review_id for r in db.load_unprocessed_reviews(10)] == [second]
+
+
+def test_connections_are_reused(db):
+    """Test that repeated calls share pooled connections and prepared statements"""
+    db.insert_new_review("Slow app", "u", "u@example.com", "U", 3)
+    for _ in range(5):
+        db.get_processing_stats()
+
+    stats = db.get_pool().get_stats()
+    assert stats["connections_num"] <= db.DB_POOL_MAX_SIZE
+    assert stats["requests_num"] >= 6
+
+    with db.connection() as conn:
+        prepared = conn.execute("SELECT COUNT(*) FROM pg_prepared_statements").fetchone()[0]
+    assert prepared >= 1
+
+
+def test_async_variants(db):
+    """Test the async pool against the same data"""
+    review_id = db.insert_new_review("Login loop", "u", "u@example.com", "U", 1)
+
+    async def run():
+        loaded = await db.aload_unprocessed_reviews(10)
+        await db.amark_reviews_processed([r.review_id for r in loaded])
+        await db.aclose_pool()
+        return loaded
+
+    loaded = asyncio.run(run())
+    assert [r.review_id for r in loaded] == [review_id]
+    assert db.get_processing_stats()["processed"] == 1
+
+
+def test_bulk_migrate_skips_existing(db, tmp_path):
+    """Test that the COPY import merges new rows, skips stored ones and keeps the first of repeated ones"""
+    db.insert_new_review("Already here", "u", "u@example.com", "U", 4)
+
+    csv_path = tmp_path / "reviews.csv"
+    csv_path.write_text(
+        "review_id,review,username,email,date,reviewer_name,rating\n"
+        "REV-0001,Duplicate of the stored review,u,u@example.com,2024-01-01 10:00:00,U,4\n"
+        "REV-0002,\"Crashes on save, every time\",a,a@example.com,2024-01-02 11:30:00,A,1\n"
+        "REV-0003,Fast and friendly,b,b@example.com,2024-01-03 09:15:00,B,5\n"
+        "REV-0003,Repeated row,b,b@example.com,2024-01-03 09:15:00,B,2\n"
+    )
+
+    assert db.migrate_csv_to_db(str(csv_path), chunksize=2) == 2
+    assert db.get_processing_stats()["total"] == 3
+
+    loaded = {r.review_id: r for r in db.load_reviews_by_ids(["REV-0001", "REV-0002", "REV-0003"])}
+    assert loaded["REV-0001"].review == "Already here"
+    assert loaded["REV-0002"].review == "Crashes on save, every time"
+    assert loaded["REV-0003"].review == "Fast and friendly"
+    assert loaded["REV-0003"].rating == 5
+
+
+def test_load_reviews_window(tmp_path):
+    """Test that the CSV loader skips rows before start and stops reading at stop"""
+    from src.nodes.load_reviews import load_reviews
+
+    csv_path = tmp_path / "reviews.csv"
+    csv_path.write_text(
+        "review_id,review,username,email,date,reviewer_name,rating\n"
+        + "".join(f"REV-{i:04d},Review {i},u,u@example.com,2024-01-01 10:00:00,U,{i % 5 + 1}\n" for i in range(10))
+    )
+
+    assert [r.review_id for r in load_reviews(str(csv_path), start=7)] == ["REV-0007", "REV-0008", "REV-0009"]
+    assert [r.review_id for r in load_reviews(str(csv_path), stop=2)] == ["REV-0000", "REV-0001"]
+    assert len(load_reviews(str(csv_path))) == 10
@@ -0,0 +1,34 @@
+"""
+Tests for running the error detection batch from sync code
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.nodes import detect_errors as detect
+from src.utils import RawReview
+
+
+def _reviews():
+    texts = ["The app crashes every time I open settings.", "Great service, thanks!"]
+    return [RawReview(review_id=f"r{i}", review=text, username="u", email="u@example.com",
+                      date="2024-01-01", reviewer_name="U", rating=2)
+            for i, text in enumerate(texts)]
+
+
+def test_batch_sync_inside_a_running_loop(monkeypatch):
+    """Test that the sync batch works on its own and when the caller already runs an event loop"""
+    monkeypatch.setenv("USE_FALLBACK_DETECT", "true")
+    monkeypatch.setenv("USE_CATEGORY_NORMALIZATION", "false")
+    reviews = _reviews()
+
+    async def from_async_code():
+        return detect.detect_errors_batch_sync(reviews)
+
+    expected = [detect._heuristic_detect(review) for review in reviews]
+    assert detect.detect_errors_batch_sync(reviews) == expected
+    assert asyncio.run(from_async_code()) == expected
@@ -0,0 +1,245 @@
+"""
+Tests for the persistent result cache and cached error detection
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.cache import ResultCache, make_key
+from src.utils import RawReview
+
+
+def _cache(directory, **kwargs):
+    return ResultCache("test", path=os.path.join(directory, "cache.db"), **kwargs)
+
+
+def test_roundtrip_and_stats():
+    """Test that values survive a reopen and lookups are counted"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = _cache(d)
+        key = make_key("model", "v1", "review text")
+
+        assert cache.get(key) is None
+        cache.set(key, [{"error_summary": "x"}])
+        cache.close()
+
+        cache = _cache(d)
+        assert cache.get(key) == [{"error_summary": "x"}]
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 0 and stats["entries"] == 1
+        cache.close()
+
+
+def test_key_depends_on_every_part():
+    """Test that model, prompt version and text all change the key"""
+    base = make_key("model", "v1", "text")
+    assert base == make_key("model", "v1", "text")
+    assert base != make_key("other", "v1", "text")
+    assert base != make_key("model", "v2", "text")
+    assert base != make_key("model", "v1", "text!")
+
+
+def test_ttl_expiry():
+    """Test that expired entries are misses"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = _cache(d, ttl=0.05)
+        cache.set("k", 1)
+        assert cache.get("k") == 1
+        time.sleep(0.1)
+        assert cache.get("k") is None
+        assert len(cache) == 0
+        cache.close()
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = _cache(d, max_entries=2, touch_interval=0)
+        cache.set("a", 1)
+        time.sleep(0.01)
+        cache.set("b", 2)
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+        cache.close()
+
+
+def test_hits_touch_access_time_once_per_interval():
+    """Test that a hit only writes the access time when the stored one is older than the interval"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = _cache(d, touch_interval=60)
+        cache.set_many({"a": 1, "b": 2})
+
+        def accessed():
+            return dict(cache._conn.execute("SELECT key, accessed FROM results").fetchall())
+
+        before = accessed()
+        changes = cache._conn.total_changes
+        assert cache.get_many(["a", "b", "missing", "a"]) == {"a": 1, "b": 2}
+        assert cache._conn.total_changes == changes and accessed() == before
+
+        cache._conn.execute("UPDATE results SET accessed = accessed - 120 WHERE key = 'a'")
+        assert cache.get("a") == 1
+        assert accessed()["a"] > before["a"] - 60 and accessed()["b"] == before["b"]
+        assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+        cache.close()
+
+
+def test_version_change_invalidates():
+    """Test that reopening with another version drops old entries"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = _cache(d, version="prompt-1")
+        cache.set("k", 1)
+        cache.close()
+
+        cache = _cache(d, version="prompt-1")
+        assert cache.get("k") == 1
+        cache.close()
+
+        cache = _cache(d, version="prompt-2")
+        assert cache.get("k") is None
+        cache.close()
+
+
+def test_namespaces_are_separate():
+    """Test that invalidating one namespace leaves the others alone"""
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "cache.db")
+        detect = ResultCache("detect", path=path)
+        sentiment = ResultCache("sentiment", path=path)
+        detect.set("k", "detect")
+        sentiment.set("k", "sentiment")
+
+        assert detect.invalidate() == 1
+        assert detect.get("k") is None
+        assert sentiment.get("k") == "sentiment"
+        detect.close()
+        sentiment.close()
+
+
+def test_detection_uses_cache(monkeypatch):
+    """Test that a repeated review is answered from the cache without an LLM call"""
+    from src.nodes import detect_errors as detect
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = ResultCache("detect", path=os.path.join(d, "cache.db"), version=detect.PROMPT_VERSION)
+        monkeypatch.setattr(detect, "get_cache", lambda namespace, version=None: cache)
+        monkeypatch.setenv("USE_CATEGORY_NORMALIZATION", "false")
+        monkeypatch.delenv("USE_FALLBACK_DETECT", raising=False)
+
+        calls = []
+
+        class FakeResponse:
+            content = json.dumps({"business_type": "software", "errors": [{
+                "error_summary": "Export button does nothing",
+                "error_type": ["User Interface"],
+                "severity": "Minor",
+                "rationale": "Reported directly.",
+            }]})
+            usage_metadata = None
+
+        class FakeLLM:
+            def invoke(self, prompt):
+                calls.append(prompt)
+                return FakeResponse()
+
+            async def ainvoke(self, prompt):
+                return self.invoke(prompt)
+
+        monkeypatch.setattr(detect, "get_llm", lambda model: FakeLLM())
+        review = RawReview(review_id="r1", review="The export button does nothing.", username="u",
+                           email="u@example.com", date="2024-01-01", reviewer_name="U", rating=3)
+
+        first = detect.detect_errors_with_ollama(review, "model-a")
+        second = detect.detect_errors_with_ollama(review, "model-a")
+        third = asyncio.run(detect.adetect_errors(review, "model-a"))
+
+        assert len(calls) == 1
+        assert first == second == third
+        assert cache.stats()["hits"] == 2
+
+        detect.detect_errors_with_ollama(review, "model-b")
+        assert len(calls) == 2
+        cache.close()
+
+
+def test_async_detection_keeps_cache_off_the_loop(monkeypatch):
+    """Test that async and packed detection read and write the cache in worker threads, once per pack"""
+    import threading
+    from src.nodes import detect_errors as detect
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = ResultCache("detect", path=os.path.join(d, "cache.db"), version=detect.PROMPT_VERSION)
+        monkeypatch.setattr(detect, "get_cache", lambda namespace, version=None: cache)
+        monkeypatch.setenv("USE_CATEGORY_NORMALIZATION", "false")
+        monkeypatch.delenv("USE_FALLBACK_DETECT", raising=False)
+
+        calls = []
+        for name in ("get_many", "set_many"):
+            def record(*args, _name=name, _method=getattr(cache, name)):
+                calls.append((_name, threading.current_thread() is threading.main_thread()))
+                return _method(*args)
+            monkeypatch.setattr(cache, name, record)
+
+        class FakeResponse:
+            def __init__(self, content):
+                self.content = content
+                self.usage_metadata = None
+
+        class FakeLLM:
+            async def ainvoke(self, prompt):
+                answers = [{"id": f"R{i}", "business_type": "software", "errors": []} for i in (1, 2)]
+                return FakeResponse(json.dumps(answers if "R2" in prompt else answers[0]))
+
+        monkeypatch.setattr(detect, "get_llm", lambda model: FakeLLM())
+        reviews = [RawReview(review_id=f"r{i}", review=f"Review number {i}.", username="u",
+                             email="u@example.com", date="2024-01-01", reviewer_name="U", rating=3)
+                   for i in (1, 2)]
+
+        asyncio.run(detect.adetect_errors_packed(reviews, "model-a"))
+        assert calls == [("get_many", False), ("set_many", False)]
+        assert asyncio.run(detect.adetect_errors_packed(reviews, "model-a")) == [[], []]
+        assert calls[2:] == [("get_many", False)]
+        cache.close()
+
+
+def test_sentiment_scored_once(monkeypatch):
+    """Test that a text is scored once per model and backend, then served from the cache"""
+    from src.nodes import sentiment_analysis as sentiment
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = ResultCache("sentiment", path=os.path.join(d, "cache.db"), ttl=0)
+        monkeypatch.setattr(sentiment, "_sentiment_cache", lambda: cache)
+
+        scored = []
+
+        class FakeAnalyzer:
+            def __init__(self, model_name=None, backend=None):
+                self.backend = backend
+
+            def analyze_batch(self, texts, batch_size=None):
+                scored.extend((self.backend, text) for text in texts)
+                return [{"label": "Negative", "score": 0.9} for _ in texts]
+
+        monkeypatch.setattr(sentiment, "SentimentAnalyzer", FakeAnalyzer)
+
+        first = sentiment.score_texts(["awful", "awful", "fine"], backend="torch")
+        second = sentiment.score_texts(["fine", "awful"], backend="torch")
+        assert scored == [("torch", "awful"), ("torch", "fine")]
+        assert first[0] == first[1] == second[1] == {"label": "Negative", "score": 0.9}
+
+        sentiment.score_texts(["awful"], backend="int8")
+        assert scored[-1] == ("int8", "awful")
+        cache.close()
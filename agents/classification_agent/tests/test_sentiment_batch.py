@@ -0,0 +1,122 @@
+"""
+Tests for batched sentiment inference, with a stub tokenizer and model
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+torch = pytest.importorskip("torch")
+
+from src.nodes import sentiment_analysis
+from src.nodes.sentiment_analysis import SentimentAnalyzer
+
+CLS, SEP, PAD = 101, 102, 0
+VOCAB = {"good": 5, "bad": 6, "[...]": 7}
+
+
+class StubTokenizer:
+    """One id per whitespace separated word, "w<n>" is id n"""
+    pad_token_id = PAD
+    padding_side = "right"
+
+    def encode(self, text, add_special_tokens=True):
+        ids = [VOCAB[word] if word in VOCAB else int(word[1:]) for word in text.split()]
+        return [CLS] + ids + [SEP] if add_special_tokens else ids
+
+    def decode(self, ids, skip_special_tokens=False):
+        words = {i: word for word, i in VOCAB.items()}
+        return " ".join(words.get(i, f"w{i}") for i in ids if i not in (CLS, SEP) or not skip_special_tokens)
+
+    def __call__(self, texts, add_special_tokens=True, verbose=True):
+        return {"input_ids": [self.encode(text, add_special_tokens) for text in texts]}
+
+
+class StubModel:
+    """Positive if the first token is "good", negative otherwise, records every batch"""
+    config = SimpleNamespace(id2label={0: "Negative", 1: "Positive"})
+
+    def __init__(self):
+        self.batches = []
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_ids, attention_mask):
+        self.batches.append((input_ids.tolist(), attention_mask.tolist()))
+        positive = (input_ids[:, 1] == VOCAB["good"]).float()
+        # longer inputs get more confident scores, so scores show which row they came from
+        strength = attention_mask.sum(dim=-1).float() / 10
+        return SimpleNamespace(logits=torch.stack([(1 - positive) * strength, positive * strength], dim=-1))
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    model = StubModel()
+    monkeypatch.setattr(SentimentAnalyzer, "_instances", {})
+    monkeypatch.setattr(sentiment_analysis, "AutoTokenizer",
+                        SimpleNamespace(from_pretrained=lambda name: StubTokenizer()))
+    monkeypatch.setattr(sentiment_analysis, "AutoModelForSequenceClassification",
+                        SimpleNamespace(from_pretrained=lambda name: model))
+    return SentimentAnalyzer(model_name="stub", backend="torch")
+
+
+def _text(label, length):
+    return " ".join([label] + [f"w{1000 + i}" for i in range(length - 1)])
+
+
+def test_results_in_input_order(analyzer):
+    """Test that results come back in input order although batches are sorted by length"""
+    texts = [_text("good", 9), _text("bad", 2), _text("good", 5), _text("bad", 12), _text("good", 1)]
+    results = analyzer.analyze_batch(texts, batch_size=2)
+
+    assert [r["label"] for r in results] == ["Positive", "Negative", "Positive", "Negative", "Positive"]
+    # every text was scored on its own tokens, [CLS] and [SEP] included
+    expected = [float(torch.softmax(torch.tensor([0.0, (len(t.split()) + 2) / 10]), -1).max())
+                for t in texts]
+    assert [r["score"] for r in results] == pytest.approx(expected)
+
+    # batches hold similar lengths, padded on the right with a matching attention mask
+    lengths = [[sum(mask) for mask in masks] for _, masks in analyzer.model.batches]
+    assert lengths == [[3, 4], [7, 11], [14]]
+    for ids, masks in analyzer.model.batches:
+        for row, mask in zip(ids, masks):
+            assert all(token == PAD for token, m in zip(row, mask) if not m)
+            assert row[0] == CLS and row[sum(mask) - 1] == SEP
+
+
+def test_single_and_empty(analyzer):
+    """Test analyze() on one text and an empty batch"""
+    assert analyzer.analyze(_text("bad", 3))["label"] == "Negative"
+    assert analyzer.analyze_batch([]) == []
+
+
+def test_truncate_ids_keeps_head_and_tail(analyzer):
+    """Test that long reviews keep their first 200 and last 250 tokens around the gap marker"""
+    assert analyzer._gap_ids == [VOCAB["[...]"]]
+    assert (analyzer._prefix_ids, analyzer._suffix_ids) == ([CLS], [SEP])
+
+    ids = list(range(1000, 1600))
+    truncated = analyzer.truncate_ids(ids)
+    assert truncated == ids[:200] + [VOCAB["[...]"]] + ids[-250:]
+    assert analyzer.truncate_ids(ids[:450]) == ids[:450]
+
+    # the same ids truncate_text keeps, without decoding and re-encoding
+    text = " ".join(f"w{i}" for i in ids)
+    assert analyzer.tokenizer.encode(analyzer.truncate_text(text), add_special_tokens=False) == truncated
+
+
+def test_long_review_is_truncated_before_inference(analyzer):
+    """Test that the model sees the truncated ids wrapped in the special tokens"""
+    text = _text("good", 600)
+    analyzer.analyze_batch([text, _text("bad", 3)])
+
+    [(rows, masks)] = analyzer.model.batches
+    ids = analyzer.tokenizer.encode(text, add_special_tokens=False)
+    assert rows[1] == [CLS] + ids[:200] + [VOCAB["[...]"]] + ids[-250:] + [SEP]
+    assert sum(masks[1]) == 453
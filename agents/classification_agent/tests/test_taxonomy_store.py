@@ -0,0 +1,99 @@
+"""
+Tests for the shared category taxonomy store
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.nodes import category_normalizer
+from src.nodes.category_normalizer import CategoryNormalizer
+from src.taxonomy_store import TaxonomyStore
+
+# first word of a label decides its embedding, so "Billing errors" is close to "Billing"
+AXES = {"billing": 0, "invoice": 0, "login": 1, "password": 1, "shipping": 2}
+
+
+class FakeModel:
+    def encode(self, texts, convert_to_numpy=True):
+        return np.eye(4)[[AXES[text.split()[0].lower()] for text in texts]]
+
+
+def _worker(path, monkeypatch):
+    """A normalizer with its own connection, as a separate process would have"""
+    monkeypatch.setattr(category_normalizer, "get_sentence_model", lambda name: FakeModel())
+    directory = os.path.dirname(path)
+    return CategoryNormalizer(
+        cache_file=os.path.join(directory, "unused.json"), similarity_threshold=0.9, store=TaxonomyStore(path)
+    )
+
+
+def test_workers_converge(monkeypatch):
+    """Test that a category created by one worker is used by another"""
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "taxonomy.db")
+        a = _worker(path, monkeypatch)
+        b = _worker(path, monkeypatch)
+
+        assert a.normalize_category("Billing") == "Billing"
+        assert b.normalize_category("billing") == "Billing"
+        assert b.normalize_category("Invoice wrong") == "Billing"
+        assert a.get_category_variants("Billing") == ["Invoice wrong"]
+        assert a.normalize_category("INVOICE WRONG") == "Billing"
+
+
+def test_concurrent_create_is_merged(monkeypatch):
+    """Test that two workers creating similar categories from stale views end up with one"""
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "taxonomy.db")
+        a = _worker(path, monkeypatch)
+        b = _worker(path, monkeypatch)
+
+        # b decides "Invoice issues" is new before it has seen a's write
+        embedding = b._encode(["Invoice issues"])[0]
+        assert b._find_similar_category("Invoice issues", embedding) is None
+        assert a.normalize_category("Billing") == "Billing"
+        assert b._normalize_category("Invoice issues", embedding) == "Billing"
+
+        assert a.get_all_categories() == b.get_all_categories() == ["Billing"]
+        assert a.normalize_category("invoice issues") == "Billing"
+
+
+def test_merge_and_reset_propagate(monkeypatch):
+    """Test that merges and resets by one worker reach the others"""
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "taxonomy.db")
+        a = _worker(path, monkeypatch)
+        b = _worker(path, monkeypatch)
+
+        a.normalize_batch(["Login", "Password reset", "Shipping"])
+        assert b.get_all_categories() == ["Login", "Shipping"]
+
+        assert a.merge_categories("Login", "Shipping", keep="Login")
+        assert b.get_all_categories() == ["Login"]
+        assert b.normalize_category("shipping") == "Login"
+
+        b.reset()
+        assert a.get_all_categories() == []
+
+
+def test_store_seeded_from_mappings_file(monkeypatch):
+    """Test that an empty store imports the existing JSON mappings"""
+    with tempfile.TemporaryDirectory() as d:
+        cache_file = os.path.join(d, "mappings.json")
+        with open(cache_file, "w") as f:
+            json.dump({"Billing": {"embedding": [1.0, 0, 0, 0], "variants": ["Invoice"]}}, f)
+
+        monkeypatch.setattr(category_normalizer, "get_sentence_model", lambda name: FakeModel())
+        store = TaxonomyStore(os.path.join(d, "taxonomy.db"))
+        normalizer = CategoryNormalizer(cache_file=cache_file, similarity_threshold=0.9, store=store)
+
+        assert len(store) == 1
+        assert normalizer.normalize_category("invoice") == "Billing"
+        assert normalizer.normalize_category("Billing overdue") == "Billing"
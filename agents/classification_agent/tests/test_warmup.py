@@ -0,0 +1,66 @@
+"""
+Tests for lazy tool imports and background model warm-up
+"""
+
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src import warmup
+
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_agent_graph_does_not_import_models():
+    """Test that importing the agent graph leaves torch and transformers unloaded"""
+    code = (
+        "import sys\n"
+        "import src.agent.agent_graph\n"
+        "print(sorted(m for m in ('torch', 'transformers', 'sentence_transformers') if m in sys.modules))\n"
+    )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([os.path.dirname(os.path.dirname(AGENT_DIR)), AGENT_DIR])
+    result = subprocess.run([sys.executable, "-c", code], cwd=AGENT_DIR, env=env,
+                            capture_output=True, text=True, timeout=300)
+    if result.returncode != 0 and "ModuleNotFoundError" in result.stderr:
+        pytest.skip(f"agent dependencies not installed: {result.stderr.strip().splitlines()[-1]}")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_warmup_loads_in_the_background(monkeypatch):
+    """Test that warm-up runs every component once on a daemon thread and records failures"""
+    release = threading.Event()
+    loaded = []
+
+    def slow():
+        release.wait(5)
+        loaded.append((threading.current_thread().name, threading.current_thread().daemon))
+
+    def broken():
+        raise OSError("model not found")
+
+    monkeypatch.setattr(warmup, "AGENT_WARMUP", True)
+    monkeypatch.setattr(warmup, "_ready", threading.Event())
+    monkeypatch.setattr(warmup, "_thread", None)
+    monkeypatch.setattr(warmup, "_loaded", {})
+    monkeypatch.setattr(warmup, "_failed", {})
+    monkeypatch.setattr(warmup, "_components", lambda enable_memory: [("slow", slow), ("broken", broken)])
+
+    assert warmup.start_warmup()
+    assert not warmup.start_warmup()
+    # start_warmup returned before the model finished loading
+    assert not warmup.is_ready()
+
+    release.set()
+    assert warmup.wait_ready(5)
+    assert loaded == [("model-warmup", True)]
+    status = warmup.warmup_status()
+    assert list(status["loaded"]) == ["slow"]
+    assert status["failed"] == {"broken": "OSError: model not found"}
@@ -17,6 +17,7 @@ import asyncio
 import logging
 from common.ChatManager import ChatManager
 from common.ConnectionManager import ConnectionManager
+from common.WorkerPool import WorkerPool, sender_key
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s %(levelname)s %(message)s')
 
@@ -26,30 +27,28 @@ class AgentManager():
            class from the common directory to reduce duplicate code"""
     def __init__(self):
         self.chat_manager = ChatManager(name="DirectoryAgent")
-        self.task_queue = asyncio.Queue()
+        # tasks from one sender run in order, different senders run concurrently
+        self.task_queue = WorkerPool(self.handle_task, name="DirectoryAgent")
         self.connection_manager = ConnectionManager("DirectoryAgent",
                                                     "An agent that given a query can retrieve information on agents that are able to help with that quary",
                                                     ["RegisterAgentInformation", "RetriveAgentInformaton", "UpdateAgentStatus"])
 
-    async def worker(self):
-        logging.info("Starting worker thread")
-        while True:
-            task_data = await self.task_queue.get()
-            logging.info(f"Worker thread picked up {task_data}")
-            message = ""
-            if task_data["message_type"] == "message":
-                message = f"You have a new message from: {task_data['sender_id']}\n+ Message:{task_data['message']}"
-            elif task_data["message_type"] == "registration":
-                message = (f"You have a new agent to register:{task_data["agent_id"]}\n+ "
-                           f"Description:{task_data["description"]}\n+"
-                           f"Capabilities: {task_data['capabilities']}")
-            elif task_data["message_type"] == "update":
-                message = f"Notification:{task_data['agent_id']} is no longer available."
-                logging.info(message)
-            else:
-                logging.info(f"Unknown message type: {task_data['message_type']}")
-            await self.chat_manager.run_agent(message)
-            self.task_queue.task_done()
+    async def handle_task(self, task_data):
+        logging.info(f"Worker picked up {task_data}")
+        message = ""
+        if task_data["message_type"] == "message":
+            message = f"You have a new message from: {task_data['sender_id']}\n+ Message:{task_data['message']}"
+        elif task_data["message_type"] == "registration":
+            message = (f"You have a new agent to register:{task_data["agent_id"]}\n+ "
+                       f"Description:{task_data["description"]}\n+"
+                       f"Capabilities: {task_data['capabilities']}")
+        elif task_data["message_type"] == "update":
+            message = f"Notification:{task_data['agent_id']} is no longer available."
+            logging.info(message)
+        else:
+            logging.info(f"Unknown message type: {task_data['message_type']}")
+        output = await self.chat_manager.run_agent(message, conversation_id=sender_key(task_data))
+        await self.connection_manager.reply(task_data, output)
 
     async def message_handler(self, message: dict):
         await self.task_queue.put(message)
@@ -143,7 +142,7 @@ class AgentManager():
 
            """)
         await self.chat_manager.setup(tools=tools, prompt=description, type="web")
-        asyncio.create_task(self.worker())
+        self.task_queue.start()
 
 
 async def main():
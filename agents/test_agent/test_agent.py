@@ -16,6 +16,7 @@ from common.tools.databse import DatabaseTool
 from common.tools.communicate import create_comm_tool
 from common.ConnectionManager import ConnectionManager
 from common.ChatManager import ChatManager
+from common.WorkerPool import WorkerPool, sender_key
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s %(levelname)s %(message)s')
 
@@ -29,23 +30,21 @@ class AgentManager():
             agent_id="DatabaseAgent",
             description="An agent that specializes in everything database related",
             capabilities=["DatabaseInsertion"])
-        self.task_queue = asyncio.Queue()
+        # tasks from one sender run in order, different senders run concurrently
+        self.task_queue = WorkerPool(self.handle_task, name="DatabaseAgent")
         self.user_input = None
 
-    async def worker(self):
-        logging.info("Starting worker thread")
-        while True:
-            task_data = await self.task_queue.get()
-            logging.info(f"Worker thread picked up {task_data}")
-            message = ""
-            if isinstance(task_data, dict):
-                message = f"You have a new message from: {task_data['sender_id']}\n+ Message:{task_data['message']}"
-            elif isinstance(task_data, str):
-                message = task_data
-            else:
-                logging.info(f"Incorrect message format")
-            await self.chat_manager.run_agent(message)
-            self.task_queue.task_done()
+    async def handle_task(self, task_data):
+        logging.info(f"Worker picked up {task_data}")
+        message = ""
+        if isinstance(task_data, dict):
+            message = f"You have a new message from: {task_data['sender_id']}\n+ Message:{task_data['message']}"
+        elif isinstance(task_data, str):
+            message = task_data
+        else:
+            logging.info(f"Incorrect message format")
+        output = await self.chat_manager.run_agent(message, conversation_id=sender_key(task_data))
+        await self.connection_manager.reply(task_data, output)
 
 
     async def message_handler(self, message: dict):
@@ -92,7 +91,7 @@ class AgentManager():
             "4.  **Reply to the Sender**: **You MUST always reply.** Use the 'ContactOtherAgents' tool to send the result back to the original agent who contacted you. This is your final step."
         )
         await self.chat_manager.setup(tools=tools, prompt=description, type="web")
-        asyncio.create_task(self.worker())
+        self.task_queue.start()
 
 
 async def main():
@@ -1,6 +1,5 @@
 import websockets
 from nicegui import app, ui
-import asyncio
 import json
 import logging
 import sys
@@ -15,6 +14,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 
 from common.ChatManager import ChatManager
 from common.ConnectionManager import ConnectionManager
+from common.WorkerPool import WorkerPool, sender_key
 from agents.web_agent.tools.webscrape import WebScrape
 from agents.web_agent.tools.websearch import WebSearch
 from common.tools.memorytool import MemoryTool
@@ -36,27 +36,24 @@ class AgentManager():
             description="An agent that specializes in everything web related",
             capabilities=["WebSearch", "Webscrape"])
         self.chat_manager = ChatManager(name="WebAgent")
-        self.task_queue = asyncio.Queue()
+        # tasks from one sender run in order, different senders run concurrently
+        self.task_queue = WorkerPool(self.handle_task, name="WebAgent")
         self.user_input = None
         self.update_ui_callback = None
 
-    async def worker(self):
-        logging.info("Starting worker thread")
-        while True:
-            task_data = await self.task_queue.get()
-            logging.info(f"Worker thread picked up {task_data}")
-            logging.info(type(self.chat_manager))
-            message = ""
-            if isinstance(task_data, dict):
-                message = f"You have a new message from: {task_data['sender_id']}\n+ Message:{task_data['message']}"
-            elif isinstance(task_data, str):
-                message = task_data
-            else:
-                logging.info(f"Incorrect message format")
-            await self.chat_manager.run_agent(message)
-            self.task_queue.task_done()
-            if self.update_ui_callback:
-                self.update_ui_callback()
+    async def handle_task(self, task_data):
+        logging.info(f"Worker picked up {task_data}")
+        message = ""
+        if isinstance(task_data, dict):
+            message = f"You have a new message from: {task_data['sender_id']}\n+ Message:{task_data['message']}"
+        elif isinstance(task_data, str):
+            message = task_data
+        else:
+            logging.info(f"Incorrect message format")
+        output = await self.chat_manager.run_agent(message, conversation_id=sender_key(task_data))
+        await self.connection_manager.reply(task_data, output)
+        if self.update_ui_callback:
+            self.update_ui_callback()
 
     async def message_handler(self, message: dict):
         await self.task_queue.put(message)
@@ -90,7 +87,7 @@ class AgentManager():
         )
 
         tools = [websearch, webscrape, datetime, csv, communicate]
-        asyncio.create_task(self.worker())
+        self.task_queue.start()
         #asyncio.create_task(self.messanger())
         await self.chat_manager.setup(tools = tools, prompt=description, type="web")
 
@@ -1,10 +1,10 @@
 from common.ChatManager import ChatManager
 import websockets
 from typing import List, Any
-import asyncio
 import json
 import logging
 from common.ConnectionManager import ConnectionManager
+from common.WorkerPool import WorkerPool, sender_key
 from agents.web_agent.tools.webscrape import WebScrape
 from agents.web_agent.tools.websearch import WebSearch
 from common.tools.memorytool import MemoryTool
@@ -29,27 +29,25 @@ class AgentManager():
             description=self.description,
             capabilities=self.capabilities)
         self.chat_manager = ChatManager(name=self.agent_id)
-        self.task_queue = asyncio.Queue()
+        # tasks from one sender run in order, different senders run concurrently
+        self.task_queue = WorkerPool(self.handle_task, name=self.agent_id)
         self.user_input = None
         self.update_ui_callback = None
 
-    async def worker(self):
-        logging.info("Starting worker thread")
-        while True:
-            task_data = await self.task_queue.get()
-            logging.info(f"Worker thread picked up {task_data}")
-            logging.info(type(self.chat_manager))
-            message = ""
-            if isinstance(task_data, dict):
-                message = f"You have a new message from: {task_data['sender']}\n+ Message:{task_data['message']}"
-            elif isinstance(task_data, str):
-                message = task_data
-            else:
-                logging.info(f"Incorrect message format")
-            await self.chat_manager.run_agent(message)
-            self.task_queue.task_done()
-            if self.update_ui_callback:
-                self.update_ui_callback()
+    async def handle_task(self, task_data):
+        logging.info(f"Worker picked up {task_data}")
+        message = ""
+        if isinstance(task_data, dict):
+            message = f"You have a new message from: {task_data['sender']}\n+ Message:{task_data['message']}"
+        elif isinstance(task_data, str):
+            message = task_data
+        else:
+            logging.info(f"Incorrect message format")
+        output = await self.chat_manager.run_agent(message, conversation_id=sender_key(task_data))
+        # requests sent with ConnectionManager.request get the agent's answer back as their reply
+        await self.connection_manager.reply(task_data, output)
+        if self.update_ui_callback:
+            self.update_ui_callback()
 
     async def message_handler(self, message: dict):
         await self.task_queue.put(message)
@@ -63,5 +61,10 @@ class AgentManager():
             return
         await self.connection_manager.start_listening(message_handler=self.message_handler)
 
-        asyncio.create_task(self.worker())
-        await self.chat_manager.setup(tools = self.tools, prompt=self.prompt)
\ No newline at end of file
+        self.task_queue.start()
+        await self.chat_manager.setup(tools = self.tools, prompt=self.prompt)
+
+    async def shutdown(self):
+        await self.task_queue.shutdown()
+        await self.chat_manager.close()
+        await self.connection_manager.close()
@@ -1,19 +1,29 @@
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, RemoveMessage
 from common.agent.Agent import Agent
 import aiosqlite
+import asyncio
+import weakref
 from typing import List, Any
 import logging
+import os
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s %(levelname)s %(message)s')
 
 class ChatManager:
-    def __init__(self, name: str):
+    def __init__(self, name: str, max_history: int | None = None):
         self.messages = []
         self.agent = None
         self.graph = None
         self.connection = None
         self.websocket = None
         self.name = name
+        # messages kept in a checkpoint thread, older turns are dropped before each run
+        if max_history is None:
+            max_history = int(os.getenv("CHAT_MAX_HISTORY", "40"))
+        self.max_history = max_history
+        # runs on the same thread are serialized, different threads run concurrently,
+        # a lock is dropped once no run holds or waits for it
+        self._thread_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
     async def setup(self, tools: List[Any], prompt: str, type: str):
         logging.info("ChatManager setup")
         if type == "web":
@@ -31,6 +41,14 @@ class ChatManager:
             self.connection = await aiosqlite.connect(f'db/{self.name}.db')
             self.graph = await self.agent.build_graph(self.connection)
 
+    async def close(self):
+        """Shut down the agent's tool pool and close the checkpoint database"""
+        if self.agent is not None:
+            self.agent.close()
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
     def load_message(self, messages):
         for message in messages["messages"]:
             if isinstance(message, HumanMessage):
@@ -42,18 +60,47 @@ class ChatManager:
             else:
                 continue
 
-    async def run_agent(self, user_input):
-        try:
-            input_to = {"messages": [HumanMessage(content=user_input)]}
-            final_state = await self.graph.ainvoke(input = input_to,
-                                                   config={"configurable": {"thread_id": "3"}})
-            msg = final_state["messages"][-1].content
-            self.messages.append({"role": "agent", "content": msg})
-            logging.info(f"Agent output {msg}")
-        except Exception as e:
-            logging.error(e)
-        finally:
-            logging.info("Agent finished")
+    def thread_id(self, conversation_id: str | None) -> str:
+        """Checkpoint thread of a conversation, every sender talks to the agent on its own thread"""
+        return str(conversation_id) if conversation_id is not None else "user"
+
+    async def _trim_history(self, config: dict) -> list:
+        """RemoveMessages for the oldest turns once a thread holds more than max_history messages"""
+        if self.max_history <= 0:
+            return []
+        snapshot = await self.graph.aget_state(config)
+        history = snapshot.values.get("messages", []) if snapshot.values else []
+        if len(history) < self.max_history:
+            return []
+        # cut at a human turn so tool calls are never separated from their results,
+        # leaving room for the message about to be added
+        start = len(history) - self.max_history + 1
+        while start < len(history) and not isinstance(history[start], HumanMessage):
+            start += 1
+        if start == len(history):
+            # the latest turn alone is longer than max_history, keep it whole
+            start -= 1
+            while start > 0 and not isinstance(history[start], HumanMessage):
+                start -= 1
+        return [RemoveMessage(id=message.id) for message in history[:start]]
+
+    async def run_agent(self, user_input, conversation_id: str | None = None):
+        thread_id = self.thread_id(conversation_id)
+        config = {"configurable": {"thread_id": thread_id}}
+        lock = self._thread_locks.setdefault(thread_id, asyncio.Lock())
+        async with lock:
+            try:
+                removed = await self._trim_history(config)
+                input_to = {"messages": removed + [HumanMessage(content=user_input)]}
+                final_state = await self.graph.ainvoke(input = input_to, config=config)
+                msg = final_state["messages"][-1].content
+                self.messages.append({"role": "agent", "content": msg})
+                logging.info(f"Agent output {msg}")
+                return msg
+            except Exception as e:
+                logging.error(e)
+            finally:
+                logging.info(f"Agent finished on thread {thread_id}")
 
 
 
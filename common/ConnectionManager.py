@@ -3,19 +3,45 @@ import websockets
 import asyncio
 import json
 import logging
+import os
+import uuid
 from websockets import ConnectionClosedError
+from communication_server.protocol import BATCH_FEATURE, ENVELOPE_FEATURE, BatchSettings, pack_batch, unpack_frame
+from communication_server.serialization import JSON, EnvelopeCodec, get_codec
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s %(levelname)s %(message)s')
 class ConnectionManager:
-    def __init__(self, agent_id: str, description: str, capabilities: List[str],):
+    def __init__(self, agent_id: str, description: str, capabilities: List[str],
+                 batch: bool | None = None, batch_settings: BatchSettings | None = None,
+                 codec: str | None = None, envelope: bool | None = None):
         self.connection = None,
-        self.uri = "ws://localhost:8765"
+        # any node of a clustered server can be connected to
+        self.uri = os.getenv("AGENT_SERVER_URI", "ws://localhost:8765")
         self._websocket: websockets.ClientProtocol | None = None
         self.agent_id = agent_id
         self.description = description
         self.capabilities = capabilities
         self.message_handler = None
+        if batch is None:
+            batch = os.getenv("AGENT_BUS_BATCH", "false").lower() in ("true", "1", "yes")
+        self.batch = batch
+        self.batch_settings = batch_settings or BatchSettings()
+        # preferred frame codec, the server may answer with JSON if it does not support it
+        self.preferred_codec = codec or os.getenv("AGENT_BUS_CODEC", "json")
+        if envelope is None:
+            envelope = os.getenv("AGENT_BUS_ENVELOPE", "false").lower() in ("true", "1", "yes")
+        self.envelope = envelope
+        # features and codec the server accepted in the register handshake
+        self.features: List[str] = []
+        self.codec = JSON
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._flush_task = None
+        # error of a batch that failed to send in the background, raised by the next send() or flush()
+        self._flush_error: Exception | None = None
+        # futures of our requests waiting for a reply, by correlation id
+        self._pending_requests: dict[str, asyncio.Future] = {}
 
     async def connect(self):
         try:
@@ -39,19 +65,167 @@ class ConnectionManager:
             "agent_id": self.agent_id,
             "description": self.description,
             "capabilities": self.capabilities,
-
+            "features": self._offered_features(),
+            "codecs": [get_codec(self.preferred_codec).name, JSON.name],
         }))
         registration_response = await self._websocket.recv()
         logging.info(registration_response)
+        try:
+            # servers without negotiation do not send "features" or "codec"
+            response = json.loads(registration_response)
+            self.features = response.get("features", [])
+            self.codec = get_codec(response.get("codec"))
+            if ENVELOPE_FEATURE in self.features:
+                self.codec = EnvelopeCodec(self.codec)
+        except (ValueError, AttributeError):
+            self.features = []
+            self.codec = JSON
+
+    def _offered_features(self) -> List[str]:
+        features = []
+        if self.batch:
+            features.append(BATCH_FEATURE)
+        if self.envelope:
+            features.append(ENVELOPE_FEATURE)
+        return features
 
     async def send(self, payload):
         logging.info(f"Sending message")
         if not self._websocket:
-            logging.error("Websocket not connected")
-            return "Websocket not connected"
+            raise ConnectionError("Websocket not connected")
+        self._raise_flush_error()
+
+        frame = self.codec.encode(payload)
+        if BATCH_FEATURE not in self.features:
+            await self._websocket.send(frame)
+            return
+
+        # batch mode: coalesce messages sent within the window into one frame
+        self._pending.append(frame)
+        self._pending_bytes += len(frame)
+        if (len(self._pending) >= self.batch_settings.max_messages
+                or self._pending_bytes >= self.batch_settings.max_bytes):
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def request(self, recipient_id: str, message, timeout: float = 60.0,
+                      message_type: str = "message") -> dict:
+        """Send a message and wait for the recipient's reply.
 
+        Args:
+            recipient_id: Agent to send the message to
+            message: Message content
+            timeout: Seconds to wait for the reply
+            message_type: message_type of the request
 
-        await self._websocket.send(json.dumps(payload))
+        Returns:
+            The reply message, the one whose in_reply_to is the request's correlation_id
+
+        Raises:
+            asyncio.TimeoutError: If no reply arrives within the timeout
+            ConnectionError: If the request could not be sent or the server rejected it
+        """
+        correlation_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending_requests[correlation_id] = future
+        try:
+            try:
+                await self.send({
+                    "message_type": message_type,
+                    "recipient_id": recipient_id,
+                    "sender_id": self.agent_id,
+                    "correlation_id": correlation_id,
+                    "message": message,
+                })
+                if BATCH_FEATURE in self.features:
+                    await self.flush()
+            except websockets.exceptions.ConnectionClosed as e:
+                raise ConnectionError(f"Sending the request to {recipient_id} failed: {e}") from e
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending_requests.pop(correlation_id, None)
+
+    async def reply(self, request, message, message_type: str = "message"):
+        """Answer a request another agent sent with ConnectionManager.request.
+
+        Does nothing if request is not a request, so handlers can call it for
+        every message they process. A message of None tells the requester no
+        answer could be produced instead of leaving it to time out.
+
+        Args:
+            request: The received message being answered
+            message: Reply content
+            message_type: message_type of the reply
+        """
+        if not isinstance(request, dict) or request.get("correlation_id") is None:
+            return
+        if message is None:
+            message_type, message = "error", f"{self.agent_id} could not answer the request"
+        await self.send({
+            "message_type": message_type,
+            "recipient_id": request.get("sender_id"),
+            "sender_id": self.agent_id,
+            "in_reply_to": request["correlation_id"],
+            "message": message,
+        })
+        if BATCH_FEATURE in self.features:
+            await self.flush()
+
+    def _resolve_reply(self, task_data: dict) -> bool:
+        """Hand a reply to the request waiting for it, False if the message is not a reply"""
+        in_reply_to = task_data.get("in_reply_to")
+        if in_reply_to is None:
+            return False
+        future = self._pending_requests.get(in_reply_to)
+        if future is None:
+            # the request already timed out, nobody is waiting for this reply
+            logging.warning(f"Dropping late reply from {task_data.get('sender_id')} to request {in_reply_to}")
+            return True
+        if not future.done():
+            if task_data.get("message_type") == "error":
+                future.set_exception(ConnectionError(task_data.get("message")))
+            else:
+                future.set_result(task_data)
+        return True
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_settings.window)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f"Failed to send batch: {e}")
+            self._flush_error = e
+
+    def _raise_flush_error(self):
+        """Raise the error of a background flush that failed since the last send"""
+        error, self._flush_error = self._flush_error, None
+        if error is not None:
+            raise ConnectionError(f"Sending a batch failed: {error}") from error
+
+    async def flush(self):
+        """Send any messages still waiting in the batch buffer.
+
+        Raises:
+            ConnectionError: If a batch sent in the background failed since the
+                last call, or the websocket is not connected. The unsent
+                messages stay buffered and go out with the next flush.
+        """
+        self._raise_flush_error()
+        if not self._pending:
+            return
+        if not self._websocket:
+            raise ConnectionError("Websocket not connected")
+        frames = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        try:
+            await self._websocket.send(pack_batch(frames, self.codec))
+        except Exception:
+            self._pending = frames + self._pending
+            self._pending_bytes += sum(len(frame) for frame in frames)
+            raise
 
     def set_message_handler(self, message_handler):
         """Set the message handler callback"""
@@ -73,9 +247,11 @@ class ConnectionManager:
                 try:
                     async with self._websocket as websocket:
                         async for message in websocket:
-                            task_data = json.loads(message)
-                            logging.info(f"Received message: {task_data}")
-                            await message_handler(task_data)
+                            for task_data in unpack_frame(message):
+                                logging.info(f"Received message: {task_data}")
+                                if self._resolve_reply(task_data):
+                                    continue
+                                await message_handler(task_data)
                 except (websockets.exceptions.ConnectionClosedError, ConnectionResetError) as error:
                     logging.error(error)
                     self.websocket = None
@@ -88,7 +264,13 @@ class ConnectionManager:
                     await asyncio.sleep(5)
 
     async def close(self):
-        self._websocket.close()
+        if self._websocket is None:
+            return
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f"Failed to send batch before closing: {e}")
+        await self._websocket.close()
         self._websocket = None
 
 
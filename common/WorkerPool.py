@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Hashable
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s %(levelname)s %(message)s')
+
+
+def sender_key(task_data) -> Hashable:
+    """Order tasks per sender, registration and status notifications per agent they are about"""
+    if isinstance(task_data, dict):
+        return task_data.get("sender_id") or task_data.get("sender") or task_data.get("agent_id")
+    # text typed into the UI is one conversation with the user
+    return "user"
+
+
+class WorkerPool:
+    """Runs queued tasks concurrently up to a limit.
+
+    Tasks with the same key run one at a time in the order they were queued,
+    tasks with different keys run in parallel. Tasks without a key are
+    unordered. Each task logs how long it waited in the queue and how long it
+    ran, and the totals are available from metrics().
+    """
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], concurrency: int | None = None,
+                 key: Callable[[Any], Hashable] = sender_key, name: str = "worker"):
+        if concurrency is None:
+            concurrency = int(os.getenv("AGENT_WORKER_CONCURRENCY", "4"))
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.key = key
+        self.name = name
+        # queued tasks per key, a key is in _ready at most once and never while one of its tasks runs
+        self._lanes: dict[Hashable, deque] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def start(self):
+        logging.info(f"Starting {self.concurrency} {self.name} workers")
+        for _ in range(self.concurrency):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def put(self, task_data):
+        key = self.key(task_data)
+        if key is None:
+            key = object()
+        item = (task_data, time.perf_counter())
+        self._idle.clear()
+        lane = self._lanes.get(key)
+        if lane is None:
+            self._lanes[key] = deque([item])
+            self._ready.put_nowait(key)
+        else:
+            lane.append(item)
+
+    def qsize(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            task_data, queued_at = lane.popleft()
+            started = time.perf_counter()
+            wait = started - queued_at
+            self.running += 1
+            try:
+                await self.handler(task_data)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"{self.name} task from {key} failed: {e}")
+            finally:
+                self.running -= 1
+                run = time.perf_counter() - started
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+                self.run_total += run
+                self.run_max = max(self.run_max, run)
+                logging.info(f"{self.name} task from {key} waited {wait:.3f}s and ran {run:.3f}s")
+                if lane:
+                    # back of the line, so a busy sender cannot starve the others
+                    self._ready.put_nowait(key)
+                else:
+                    del self._lanes[key]
+                    if not self._lanes:
+                        self._idle.set()
+
+    async def join(self):
+        """Wait until every queued task has run"""
+        await self._idle.wait()
+
+    def metrics(self) -> dict:
+        done = self.completed + self.failed
+        return {
+            "concurrency": self.concurrency,
+            "queued": self.qsize(),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_avg": self.wait_total / done if done else 0.0,
+            "wait_max": self.wait_max,
+            "run_avg": self.run_total / done if done else 0.0,
+            "run_max": self.run_max,
+        }
+
+    async def shutdown(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
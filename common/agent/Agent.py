@@ -1,9 +1,10 @@
 from langmem import create_memory_manager
 from .AgentState import State
+from .PlanRouter import PlanRouter
+from .ToolExecutor import ToolExecutor
 from langgraph.graph import StateGraph, START, END
 from langchain_anthropic import ChatAnthropic
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
-from langgraph.prebuilt import ToolNode
 from typing_extensions import List, Any
 from common.memory.semantic import Semantic
 from common.memory.episodic import Episode
@@ -30,6 +31,7 @@ class Agent:
         )
         self.tools = tools
         self.llm_with_tools = self.llm.bind_tools(self.tools)
+        self.tool_executor = ToolExecutor(self.tools)
 
         # Use Anthropic for memory manager too
         self.manager = create_memory_manager(
@@ -38,10 +40,18 @@ class Agent:
             instructions="Extract all user information and events as Episodes, and any facts as Semantic",
         )
         #self.store = QdrantStore(collection_name="WebAgent") #don't uncomment if you don't have qdrant running
+        self.plan_router = PlanRouter()
 
-    def planner(self, state: State):
+    async def planner(self, state: State):
         #state["tools"] = self.tools
        # print(self.friends)
+        request = state["messages"][-1].content
+        # acknowledgements and notifications go straight to chat, repeated requests reuse their plan
+        if not self.plan_router.needs_plan(request):
+            return {"plan": ""}
+        plan = self.plan_router.cached_plan(request)
+        if plan is not None:
+            return {"plan": plan}
         planner_messages =  [("user", f"{state["messages"][-1].content}")] + [
             (
                 "system",
@@ -49,20 +59,21 @@ class Agent:
                 f"These are the tools available for use {self.tools}"
             )
         ]
-        plan = self.llm_with_tools.invoke(planner_messages).content
+        plan = (await self.llm_with_tools.ainvoke(planner_messages)).content
+        self.plan_router.remember(request, plan)
 
         state["plan"] = plan
 
         return state
 
-    def chat(self, state: State):
+    async def chat(self, state: State):
         system_prompt = (
            self.prompt
         )
         if state.get('critique') and state['critique'] != 'None':
             system_prompt += f"you must revise your previous answer based on the following critique: {state['critique']}"
         messages_with_prompt = [("system", system_prompt)] + state["messages"]
-        ai_response = self.llm_with_tools.invoke(messages_with_prompt)
+        ai_response = await self.llm_with_tools.ainvoke(messages_with_prompt)
         return {"messages":[ai_response]}
 
 
@@ -86,6 +97,14 @@ class Agent:
         else:
             return {'critique': critique}
 
+    async def tools_node(self, state: State):
+        """Run the tool calls of the last message concurrently"""
+        return {"messages": await self.tool_executor.run(state["messages"][-1].tool_calls)}
+
+    def close(self):
+        """Release the tool thread pool"""
+        self.tool_executor.shutdown()
+
     def route_tools(self, state: State):
         ai_message = state["messages"][-1]
         if hasattr(ai_message, "tool_calls") and len(ai_message.tool_calls) > 0:
@@ -106,8 +125,7 @@ class Agent:
         graph_builder = StateGraph(State)
         graph_builder.add_node("planner", self.planner)
         graph_builder.add_node("chatbot", self.chat)
-        tool_node = ToolNode(tools=self.tools)
-        graph_builder.add_node("tools", tool_node)
+        graph_builder.add_node("tools", self.tools_node)
         graph_builder.add_node("critique", self.critique)
 
         graph_builder.add_edge(START, "planner")
@@ -0,0 +1,79 @@
+import os
+import re
+from collections import OrderedDict
+
+# header the agent managers put in front of messages from other agents
+_SENDER_HEADER = re.compile(r"^You have a new message from:.*?\n\+ Message:", re.DOTALL)
+# server notifications the DirectoryAgent acts on directly
+_NOTIFICATIONS = ("You have a new agent to register:", "Notification:")
+_ACKNOWLEDGEMENTS = re.compile(
+    r"((thanks|thank you|thx|so much|very much|a lot|again|ok|okay|great|perfect|cool|nice|got it|noted|"
+    r"understood|sounds good|hi|hello|hey|bye|goodbye|good morning|good night|yes|no|sure)[\s.!,]*)+",
+    re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+class PlanRouter:
+    """Decides whether a turn needs the planner and remembers plans for repeated requests.
+
+    Acknowledgements, greetings and server notifications are answered without
+    a plan. Requests that only differ in case or whitespace share a cached
+    plan. Anything else, including ids and numbers, changes the key, since
+    the plan names the reviews and values it works on.
+    """
+    def __init__(self, enabled: bool | None = None, cache_size: int | None = None, ack_max_words: int = 8):
+        if enabled is None:
+            enabled = os.getenv("AGENT_PLAN_FAST_PATH", "true").lower() in ("true", "1", "yes")
+        if cache_size is None:
+            cache_size = int(os.getenv("AGENT_PLAN_CACHE_SIZE", "128"))
+        self.enabled = enabled
+        self.cache_size = cache_size
+        self.ack_max_words = ack_max_words
+        self._plans: OrderedDict[str, str] = OrderedDict()
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _body(text) -> str:
+        text = text if isinstance(text, str) else str(text)
+        return _SENDER_HEADER.sub("", text, count=1).strip()
+
+    def needs_plan(self, text) -> bool:
+        if not self.enabled:
+            return True
+        body = self._body(text)
+        trivial = (not body
+                   or body.startswith(_NOTIFICATIONS)
+                   or (len(body.split()) <= self.ack_max_words and _ACKNOWLEDGEMENTS.fullmatch(body) is not None))
+        if trivial:
+            self.skipped += 1
+        return not trivial
+
+    def shape(self, text) -> str:
+        """Cache key of a request, only case and whitespace are normalized"""
+        return _SPACES.sub(" ", self._body(text).lower())
+
+    def cached_plan(self, text) -> str | None:
+        if not self.enabled or self.cache_size <= 0:
+            return None
+        key = self.shape(text)
+        plan = self._plans.get(key)
+        if plan is None:
+            self.misses += 1
+            return None
+        self._plans.move_to_end(key)
+        self.hits += 1
+        return plan
+
+    def remember(self, text, plan: str):
+        if not self.enabled or self.cache_size <= 0 or not plan:
+            return
+        key = self.shape(text)
+        self._plans[key] = plan
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.cache_size:
+            self._plans.popitem(last=False)
+
+    def metrics(self) -> dict:
+        return {"skipped": self.skipped, "hits": self.hits, "misses": self.misses, "cached": len(self._plans)}
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+
+def _is_async(tool) -> bool:
+    """Tools with a native coroutine run on the event loop, the rest on the thread pool"""
+    if getattr(tool, "coroutine", None) is not None:
+        return True
+    if isinstance(tool, StructuredTool):
+        # StructuredTool overrides _arun for every tool, only a coroutine makes it async
+        return False
+    return isinstance(tool, BaseTool) and type(tool)._arun is not BaseTool._arun
+
+
+class ToolExecutor:
+    """Runs the tool calls of one AI message concurrently.
+
+    Async tools are awaited directly, sync tools run on a bounded thread pool.
+    Every call has its own timeout, a failing or slow call becomes an error
+    ToolMessage, and results come back in the order of the tool calls.
+    """
+    def __init__(self, tools: List[Any], max_workers: int | None = None, timeout: float | None = None):
+        if max_workers is None:
+            max_workers = int(os.getenv("AGENT_TOOL_WORKERS", "8"))
+        if timeout is None:
+            timeout = float(os.getenv("AGENT_TOOL_TIMEOUT", "120"))
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.timeout = timeout if timeout > 0 else None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        # owners that never call shutdown still release the pool when they are collected
+        self._finalizer = weakref.finalize(self, self.executor.shutdown, wait=False, cancel_futures=True)
+
+    async def _call(self, tool_call: dict) -> ToolMessage:
+        tool_name = tool_call["name"]
+        tool = self.tools_by_name.get(tool_name)
+        if tool is None:
+            result = f"Error: Tool '{tool_name}' not found."
+        else:
+            try:
+                if _is_async(tool):
+                    pending = tool.ainvoke(tool_call["args"])
+                else:
+                    pending = asyncio.get_running_loop().run_in_executor(self.executor, tool.invoke, tool_call["args"])
+                result = await asyncio.wait_for(pending, self.timeout)
+            except asyncio.TimeoutError:
+                # a sync tool cannot be interrupted, its thread finishes in the background
+                result = f"Error executing {tool_name}: timed out after {self.timeout:g} seconds"
+                logging.warning(result)
+            except Exception as e:
+                result = f"Error executing {tool_name}: {str(e)}"
+        if not isinstance(result, (str, list)):
+            result = str(result)
+        return ToolMessage(content=result, name=tool_name, tool_call_id=tool_call["id"])
+
+    async def run(self, tool_calls: List[dict]) -> List[ToolMessage]:
+        return list(await asyncio.gather(*(self._call(tool_call) for tool_call in tool_calls)))
+
+    def shutdown(self):
+        """Stop the thread pool, calls still queued are cancelled"""
+        self._finalizer()
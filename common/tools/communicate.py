@@ -20,11 +20,12 @@ class Communicate(BaseTool):
 
     web_connection: ConnectionManager = Field(exclude=True)
     sender_id: str = Field(exclude=True)
-    def _run(self, recipient_id: str, message: str):
+    reply_timeout: float = Field(default=60.0, exclude=True)
+    def _run(self, recipient_id: str, message: str, wait_for_reply: bool = False):
         pass
         #return self._arun(sender_id, recipient_id, message)
 
-    async def _arun(self, recipient_id: str, message: str):
+    async def _arun(self, recipient_id: str, message: str, wait_for_reply: bool = False):
         logging.info(f"ARUN id: {recipient_id}")
         logging.info(f"Web connection id: {self.web_connection.agent_id}")
 
@@ -35,16 +36,27 @@ class Communicate(BaseTool):
                     'message': message
                     }
 
+        if wait_for_reply:
+            try:
+                logging.info(f"Sending request: {message_to_send}")
+                reply = await self.web_connection.request(recipient_id, message, timeout=self.reply_timeout)
+                return reply.get("message")
+            except asyncio.TimeoutError:
+                return f"{recipient_id} did not reply within {self.reply_timeout:g} seconds"
+            except Exception as e:
+                logging.error(f"Request to {recipient_id} failed: {e}")
+                return f"Request to {recipient_id} failed: {e}"
+
         try:
             logging.info(f"Sending message: {message_to_send}")
             await self.web_connection.send(message_to_send)
         except Exception as e:
             logging.error(f"Failed to connect: {e}")
-            return
+            return f"Sending the message to {recipient_id} failed: {e}"
 
 
 
-def create_comm_tool(id:str, connection: ConnectionManager) -> Communicate:
+def create_comm_tool(id:str, connection: ConnectionManager, reply_timeout: float = 60.0) -> Communicate:
 
     if id != "DirectoryAgent":
         CommunicateInput = create_model(
@@ -52,6 +64,8 @@ def create_comm_tool(id:str, connection: ConnectionManager) -> Communicate:
             message = (str, Field(description="The content of the message to send.")),
             recipient_id = (str, Field(description="The recipient ID of the agent to contact, if you don't have information on the agent id of any other agent, "
                                                    "you may contact 'DirectoryAgent' which can help with finding other agents in the network")                        ),
+            wait_for_reply = (bool, Field(default=False, description="Wait for the recipient's answer and get it back as the result of this tool "
+                                                                     "instead of as a new message later.")),
         )
     else:
         CommunicateInput = create_model(
@@ -59,13 +73,15 @@ def create_comm_tool(id:str, connection: ConnectionManager) -> Communicate:
             message=(str, Field(description="The content of the message to send.")),
             recipient_id=(str, Field(
                 description="The recipient ID of the agent to contact, if you don't have information on the agent id you can use your tools")),
-
+            wait_for_reply=(bool, Field(default=False, description="Wait for the recipient's answer and get it back as the result of this tool "
+                                                                   "instead of as a new message later.")),
         )
 
     tool = Communicate(
         args_schema=CommunicateInput,
         web_connection=connection,
         sender_id=id,
+        reply_timeout=reply_timeout,
     )
     return tool
 
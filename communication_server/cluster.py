@@ -0,0 +1,81 @@
+"""Links between clustered AgentServer nodes.
+
+A node forwards messages for agents connected to a sibling over a websocket
+link to that sibling. Links always carry envelope frames, so the receiving
+node routes them on the header like frames from an envelope agent, and they
+are queued and batched through the same channels used for agents.
+"""
+import asyncio
+import json
+import logging
+
+import websockets
+
+from communication_server.dispatcher import DispatchEngine, OverflowPolicy
+from communication_server.protocol import BatchSettings
+from communication_server.serialization import ENVELOPE
+
+NODE_REGISTER = "node_register"
+
+
+class NodeLinks:
+    """Outbound links from this node to its siblings, opened on first use"""
+    def __init__(self, node_id: str, registry, queue_size: int = 1000,
+                 policy: OverflowPolicy | str = OverflowPolicy.BLOCK,
+                 batch_settings: BatchSettings | None = None):
+        self.node_id = node_id
+        self.registry = registry
+        self.dispatcher = DispatchEngine(queue_size=queue_size, policy=policy)
+        self.batch_settings = batch_settings or BatchSettings()
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._watchers: set[asyncio.Task] = set()
+
+    async def _connect(self, node_id: str) -> bool:
+        if node_id in self.dispatcher.channels:
+            return True
+        lock = self._locks.setdefault(node_id, asyncio.Lock())
+        async with lock:
+            if node_id in self.dispatcher.channels:
+                return True
+            address = await self.registry.node_address(node_id)
+            if address is None:
+                logging.warning(f"Node {node_id} is not in the registry")
+                return False
+            try:
+                websocket = await websockets.connect(address)
+                await websocket.send(json.dumps({"message_type": NODE_REGISTER, "node_id": self.node_id}))
+            except Exception as e:
+                logging.error(f"Could not link to node {node_id} at {address}: {e}")
+                return False
+            await self.dispatcher.open(node_id, websocket, batch=self.batch_settings, codec=ENVELOPE)
+            watcher = asyncio.create_task(self._watch(node_id, websocket))
+            self._watchers.add(watcher)
+            watcher.add_done_callback(self._watchers.discard)
+            logging.info(f"Linked to node {node_id} at {address}")
+        return True
+
+    async def _watch(self, node_id: str, websocket):
+        """Drop the link once the sibling closes it, the next message reconnects"""
+        await websocket.wait_closed()
+        await self.dispatcher.close(node_id, websocket)
+        logging.info(f"Link to node {node_id} closed")
+
+    async def send(self, node_id: str, frame) -> bool:
+        """Queue an envelope frame for a sibling node.
+
+        Returns False if the node cannot be reached.
+        Raises QueueFullError when the link queue rejects the frame.
+        """
+        if not await self._connect(node_id):
+            return False
+        return await self.dispatcher.enqueue(node_id, frame)
+
+    def metrics(self) -> dict[str, dict]:
+        return self.dispatcher.metrics()
+
+    async def shutdown(self):
+        for watcher in list(self._watchers):
+            watcher.cancel()
+        for channel in list(self.dispatcher.channels.values()):
+            await channel.websocket.close()
+        await self.dispatcher.shutdown()
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from enum import Enum
+
+from websockets.exceptions import ConnectionClosed
+
+from communication_server.protocol import BatchSettings, pack_batch
+from communication_server.serialization import JSON
+
+
+class OverflowPolicy(str, Enum):
+    """What a recipient queue does when it is full"""
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    REJECT = "reject"
+
+
+class QueueFullError(Exception):
+    """Raised when a recipient queue is full and the policy is reject"""
+    def __init__(self, recipient_id: str):
+        super().__init__(f"Outbound queue for {recipient_id} is full")
+        self.recipient_id = recipient_id
+
+
+class RecipientChannel:
+    """A bounded outbound queue and a writer task for one connected agent.
+
+    Every connection gets its own channel so a slow recipient only backs up
+    its own queue and never stalls delivery to the other agents.
+    """
+    def __init__(self, agent_id: str, websocket, maxsize: int, policy: OverflowPolicy,
+                 batch: BatchSettings | None = None, codec=JSON):
+        self.agent_id = agent_id
+        self.websocket = websocket
+        self.policy = policy
+        self.batch = batch
+        self.codec = codec
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+        self.task = None
+        self.frames = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failed = 0
+        self.high_watermark = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self._writer())
+
+    async def put(self, frame) -> bool:
+        """Queue a frame for this recipient, applying the overflow policy.
+
+        Returns False if the channel was closed while waiting.
+        Raises QueueFullError when the queue is full under the reject policy.
+        """
+        if self.closed:
+            return False
+        if self.policy == OverflowPolicy.BLOCK:
+            await self.queue.put(frame)
+        elif self.policy == OverflowPolicy.DROP_OLDEST:
+            while self.queue.full():
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+            self.queue.put_nowait(frame)
+        else:
+            if self.queue.full():
+                self.rejected += 1
+                raise QueueFullError(self.agent_id)
+            self.queue.put_nowait(frame)
+        if self.closed:
+            return False
+        self.high_watermark = max(self.high_watermark, self.queue.qsize())
+        return True
+
+    async def _collect(self, first) -> list:
+        """Gather frames queued within the batch window, up to the batch limits"""
+        frames = [first]
+        size = len(first)
+        deadline = asyncio.get_running_loop().time() + self.batch.window
+        while len(frames) < self.batch.max_messages and size < self.batch.max_bytes:
+            if self.queue.empty():
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                frame = self.queue.get_nowait()
+            frames.append(frame)
+            size += len(frame)
+        return frames
+
+    async def _writer(self):
+        while True:
+            frames = [await self.queue.get()]
+            try:
+                if self.batch is not None:
+                    frames = await self._collect(frames[0])
+                await self.websocket.send(pack_batch(frames, self.codec))
+                self.frames += 1
+                self.delivered += len(frames)
+            except ConnectionClosed:
+                self.failed += len(frames)
+                logging.warning(f"Delivery to {self.agent_id} failed, connection closed")
+            except Exception as e:
+                self.failed += len(frames)
+                logging.error(f"Delivery to {self.agent_id} failed: {e}")
+            finally:
+                for _ in frames:
+                    self.queue.task_done()
+
+    async def close(self):
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        # drain so any producer blocked on a full queue is released
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+
+    def metrics(self) -> dict:
+        return {
+            "depth": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "high_watermark": self.high_watermark,
+            "frames": self.frames,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+
+class DispatchEngine:
+    """Routes encoded frames to per-recipient channels"""
+    def __init__(self, queue_size: int = 1000, policy: OverflowPolicy | str = OverflowPolicy.BLOCK):
+        self.queue_size = queue_size
+        self.policy = OverflowPolicy(policy)
+        self.channels: dict[str, RecipientChannel] = {}
+
+    async def open(self, agent_id: str, websocket, batch: BatchSettings | None = None,
+                   codec=JSON) -> RecipientChannel:
+        existing = self.channels.get(agent_id)
+        if existing is not None:
+            if existing.websocket is websocket:
+                return existing
+            await existing.close()
+        channel = RecipientChannel(agent_id, websocket, self.queue_size, self.policy, batch, codec)
+        channel.start()
+        self.channels[agent_id] = channel
+        return channel
+
+    async def close(self, agent_id: str, websocket=None):
+        channel = self.channels.get(agent_id)
+        if channel is None:
+            return
+        if websocket is not None and channel.websocket is not websocket:
+            return
+        del self.channels[agent_id]
+        await channel.close()
+
+    def codec_for(self, agent_id: str):
+        """The codec frames for this recipient must be encoded with, None if not connected"""
+        channel = self.channels.get(agent_id)
+        return channel.codec if channel is not None else None
+
+    async def enqueue(self, recipient_id: str, frame) -> bool:
+        """Queue a frame for a recipient.
+
+        Returns False if the recipient is not connected.
+        Raises QueueFullError when the recipient queue rejects the frame.
+        """
+        channel = self.channels.get(recipient_id)
+        if channel is None:
+            return False
+        return await channel.put(frame)
+
+    def metrics(self) -> dict[str, dict]:
+        return {agent_id: channel.metrics() for agent_id, channel in self.channels.items()}
+
+    async def shutdown(self):
+        for agent_id in list(self.channels):
+            await self.close(agent_id)
@@ -0,0 +1,63 @@
+"""Wire format helpers shared by the AgentServer and the ConnectionManager.
+
+Optional protocol features are negotiated in the register handshake: the
+client lists the features it supports under "features" and the server answers
+with the subset it accepted. Peers that do not send "features" get the plain
+one-message-per-frame protocol. The frame codec is negotiated the same way,
+through "codecs" in the register message and "codec" in the reply.
+
+The envelope feature switches a connection to header-first envelope frames,
+see communication_server.serialization.
+
+A request carries a "correlation_id" and the reply to it carries the same id
+as "in_reply_to", which is how ConnectionManager.request matches replies to
+requests. Plain messages carry neither. The server passes both through
+untouched.
+"""
+from dataclasses import dataclass
+
+from communication_server.serialization import JSON, codec_for_frame
+
+BATCH_FEATURE = "batch"
+ENVELOPE_FEATURE = "envelope"
+SUPPORTED_FEATURES = (BATCH_FEATURE, ENVELOPE_FEATURE)
+
+
+@dataclass
+class BatchSettings:
+    """How long to wait for more messages and how many to coalesce into one frame"""
+    window: float = 0.002
+    max_messages: int = 64
+    max_bytes: int = 256 * 1024
+
+
+def negotiate_features(offered) -> list[str]:
+    """Return the offered features this side supports, in the offered order"""
+    if not isinstance(offered, list):
+        return []
+    return [feature for feature in offered if feature in SUPPORTED_FEATURES]
+
+
+def correlation_fields(correlation_id: str | None, in_reply_to: str | None) -> dict:
+    """The request/reply fields of a message, for payloads the server rebuilds"""
+    fields = {}
+    if correlation_id is not None:
+        fields["correlation_id"] = correlation_id
+    if in_reply_to is not None:
+        fields["in_reply_to"] = in_reply_to
+    return fields
+
+
+def pack_batch(frames: list, codec=JSON):
+    """Join already encoded messages into one array frame"""
+    if len(frames) == 1:
+        return frames[0]
+    return codec.pack_batch(frames)
+
+
+def unpack_frame(frame) -> list[dict]:
+    """Decode a frame into the list of messages it carries"""
+    data = codec_for_frame(frame).decode(frame)
+    if isinstance(data, list):
+        return data
+    return [data]
@@ -0,0 +1,165 @@
+"""Shared agent registry for clustered AgentServer nodes.
+
+Each node keeps the websockets of its own agents locally and records in the
+shared registry which node every agent is connected to, so any node can
+route a message to an agent connected to a sibling. InMemoryRegistry serves
+nodes running in one process (and tests), SqliteRegistry is shared by
+processes on the same host.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+
+class InMemoryRegistry:
+    def __init__(self):
+        self.agents: dict[str, dict] = {}
+        self.nodes: dict[str, str] = {}
+
+    async def register_node(self, node_id: str, address: str):
+        self.nodes[node_id] = address
+
+    async def unregister_node(self, node_id: str):
+        self.nodes.pop(node_id, None)
+        await self.release_node(node_id)
+
+    async def node_address(self, node_id: str) -> str | None:
+        return self.nodes.get(node_id)
+
+    async def claim(self, agent_id: str, node_id: str, description: str = "", capabilities=None):
+        self.agents[agent_id] = {
+            "node_id": node_id,
+            "description": description,
+            "capabilities": capabilities or [],
+        }
+
+    async def release(self, agent_id: str, node_id: str):
+        """Forget an agent, unless it has reconnected to another node meanwhile"""
+        entry = self.agents.get(agent_id)
+        if entry is not None and entry["node_id"] == node_id:
+            del self.agents[agent_id]
+
+    async def release_node(self, node_id: str):
+        for agent_id in [a for a, entry in self.agents.items() if entry["node_id"] == node_id]:
+            del self.agents[agent_id]
+
+    async def locate(self, agent_id: str, fresh: bool = False) -> str | None:
+        entry = self.agents.get(agent_id)
+        return entry["node_id"] if entry is not None else None
+
+
+class SqliteRegistry:
+    """Registry in a SQLite database in WAL mode, shared by node processes on one host
+
+    Queries run in worker threads so a sibling holding the write lock never
+    stalls the event loop. locate() answers are cached for locate_ttl seconds,
+    claims and releases made through this instance drop the cached entry, and
+    changes made by other processes are seen once it expires. Unknown agents
+    are never cached, so an agent is found as soon as it registers.
+    """
+    def __init__(self, path: str, locate_ttl: float = 1.0):
+        self.path = path
+        self.locate_ttl = locate_ttl
+        self._local = threading.local()
+        # agent_id -> (node_id, expiry on the monotonic clock)
+        self._located: dict[str, tuple[str | None, float]] = {}
+        # bumped on every invalidation, a lookup that raced one is not cached
+        self._generation = 0
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                node_id TEXT PRIMARY KEY,
+                address TEXT NOT NULL,
+                started_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS agents (
+                agent_id TEXT PRIMARY KEY,
+                node_id TEXT NOT NULL,
+                description TEXT,
+                capabilities TEXT,
+                registered_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _execute_write(self, query: str, params: tuple):
+        conn = self._connection()
+        with conn:
+            conn.execute(query, params)
+
+    def _execute_read(self, query: str, params: tuple):
+        return self._connection().execute(query, params).fetchone()
+
+    async def _write(self, query: str, params: tuple):
+        await asyncio.to_thread(self._execute_write, query, params)
+
+    async def _read(self, query: str, params: tuple):
+        return await asyncio.to_thread(self._execute_read, query, params)
+
+    def _forget(self, agent_id: str | None = None, node_id: str | None = None):
+        self._generation += 1
+        if agent_id is not None:
+            self._located.pop(agent_id, None)
+        else:
+            self._located = {a: entry for a, entry in self._located.items() if entry[0] != node_id}
+
+    async def register_node(self, node_id: str, address: str):
+        await self._write("INSERT OR REPLACE INTO nodes (node_id, address, started_at) VALUES (?, ?, ?)",
+                          (node_id, address, time.time()))
+
+    async def unregister_node(self, node_id: str):
+        await self._write("DELETE FROM nodes WHERE node_id = ?", (node_id,))
+        await self.release_node(node_id)
+
+    async def node_address(self, node_id: str) -> str | None:
+        row = await self._read("SELECT address FROM nodes WHERE node_id = ?", (node_id,))
+        return row[0] if row else None
+
+    async def _write_and_forget(self, query: str, params: tuple, agent_id: str | None = None,
+                                node_id: str | None = None):
+        # forgotten again once the write is committed, a lookup made while it
+        # was in flight may have read and cached the old row
+        self._forget(agent_id, node_id)
+        try:
+            await self._write(query, params)
+        finally:
+            self._forget(agent_id, node_id)
+
+    async def claim(self, agent_id: str, node_id: str, description: str = "", capabilities=None):
+        await self._write_and_forget("""
+            INSERT OR REPLACE INTO agents (agent_id, node_id, description, capabilities, registered_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (agent_id, node_id, description, json.dumps(capabilities or []), time.time()), agent_id=agent_id)
+
+    async def release(self, agent_id: str, node_id: str):
+        """Forget an agent, unless it has reconnected to another node meanwhile"""
+        await self._write_and_forget("DELETE FROM agents WHERE agent_id = ? AND node_id = ?",
+                                     (agent_id, node_id), agent_id=agent_id)
+
+    async def release_node(self, node_id: str):
+        await self._write_and_forget("DELETE FROM agents WHERE node_id = ?", (node_id,), node_id=node_id)
+
+    async def locate(self, agent_id: str, fresh: bool = False) -> str | None:
+        """The node an agent is connected to, fresh skips the cached answer"""
+        cached = self._located.get(agent_id)
+        if not fresh and cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        generation = self._generation
+        row = await self._read("SELECT node_id FROM agents WHERE agent_id = ?", (agent_id,))
+        node_id = row[0] if row else None
+        if node_id is not None and generation == self._generation:
+            self._located[agent_id] = (node_id, time.monotonic() + self.locate_ttl)
+        return node_id
@@ -0,0 +1,168 @@
+"""Codecs for agent bus frames.
+
+JSON text frames are the default. If msgpack is installed, peers can
+negotiate it in the register handshake and exchange binary frames instead.
+The frame type tells the codec apart, so a receiver never has to guess:
+text frames are JSON and binary frames are msgpack.
+
+Peers that negotiate the envelope feature exchange envelope frames instead:
+a magic byte, a length prefixed JSON routing header and the encoded message
+body. The server routes on the header alone and relays the body untouched.
+"""
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, JSON is always available
+    msgpack = None
+
+
+class JsonCodec:
+    name = "json"
+    binary = False
+
+    def encode(self, obj) -> str:
+        return json.dumps(obj)
+
+    def decode(self, frame):
+        return json.loads(frame)
+
+    def pack_batch(self, frames: list[str]) -> str:
+        """Join already encoded messages into one array frame"""
+        return "[" + ",".join(frames) + "]"
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    binary = True
+
+    def encode(self, obj) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, frame):
+        return msgpack.unpackb(frame, raw=False)
+
+    def pack_batch(self, frames: list[bytes]) -> bytes:
+        """Prefix an array header, msgpack arrays are their encoded items back to back"""
+        count = len(frames)
+        if count < 16:
+            header = bytes([0x90 | count])
+        elif count < 2 ** 16:
+            header = b"\xdc" + struct.pack(">H", count)
+        else:
+            header = b"\xdd" + struct.pack(">I", count)
+        return header + b"".join(frames)
+
+
+JSON = JsonCodec()
+CODECS = {JSON.name: JSON}
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+ENVELOPE_MAGIC = 0xE1
+ENVELOPE_BATCH_MAGIC = 0xE2
+_LENGTH = struct.Struct(">I")
+_BODY_OFFSET = 1 + _LENGTH.size
+
+
+def is_envelope(frame) -> bool:
+    return (isinstance(frame, (bytes, bytearray, memoryview)) and len(frame) > 0
+            and frame[0] in (ENVELOPE_MAGIC, ENVELOPE_BATCH_MAGIC))
+
+
+def read_header(frame) -> dict:
+    """Decode only the routing header of an envelope frame, the body is left untouched"""
+    (length,) = _LENGTH.unpack_from(frame, 1)
+    return json.loads(bytes(frame[_BODY_OFFSET:_BODY_OFFSET + length]))
+
+
+def split_envelopes(frame) -> list:
+    """The envelope frames carried by a frame, as zero-copy views for batches"""
+    if frame[0] == ENVELOPE_MAGIC:
+        return [frame]
+    view = memoryview(frame)
+    envelopes = []
+    offset = 1
+    while offset < len(view):
+        (length,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        envelopes.append(view[offset:offset + length])
+        offset += length
+    return envelopes
+
+
+class EnvelopeCodec:
+    """Header-first frames, the message body is encoded with the wrapped codec"""
+    binary = True
+
+    def __init__(self, body_codec=JSON):
+        self.body_codec = body_codec
+        self.name = body_codec.name
+
+    def encode(self, obj: dict) -> bytes:
+        header = {key: value for key, value in obj.items() if key != "message"}
+        header["codec"] = self.body_codec.name
+        body = b""
+        if "message" in obj:
+            body = self.body_codec.encode(obj["message"])
+            if isinstance(body, str):
+                body = body.encode()
+        header_bytes = json.dumps(header, separators=(",", ":")).encode()
+        return b"".join((bytes([ENVELOPE_MAGIC]), _LENGTH.pack(len(header_bytes)), header_bytes, body))
+
+    def decode(self, frame):
+        if frame[0] == ENVELOPE_BATCH_MAGIC:
+            return [self._decode_envelope(envelope) for envelope in split_envelopes(frame)]
+        return self._decode_envelope(frame)
+
+    def _decode_envelope(self, frame) -> dict:
+        message = read_header(frame)
+        (length,) = _LENGTH.unpack_from(frame, 1)
+        body = bytes(frame[_BODY_OFFSET + length:])
+        # the body is decoded with the codec the sender named, not our own
+        body_codec = get_codec(message.pop("codec", None))
+        if body:
+            message["message"] = body_codec.decode(body)
+        return message
+
+    def pack_batch(self, frames: list) -> bytes:
+        parts = [bytes([ENVELOPE_BATCH_MAGIC])]
+        for frame in frames:
+            parts.append(_LENGTH.pack(len(frame)))
+            parts.append(frame)
+        return b"".join(parts)
+
+
+ENVELOPE = EnvelopeCodec()
+
+
+def get_codec(name: str | None):
+    """Look up a codec by name, falling back to JSON"""
+    return CODECS.get(name or JSON.name, JSON)
+
+
+def negotiate_codec(offered):
+    """Pick the first offered codec this side supports, JSON if none match"""
+    if isinstance(offered, list):
+        for name in offered:
+            if name in CODECS:
+                return CODECS[name]
+    return JSON
+
+
+def codec_for_frame(frame):
+    """Text frames are JSON, binary frames are envelopes or use the binary codec"""
+    if is_envelope(frame):
+        return ENVELOPE
+    if isinstance(frame, (bytes, bytearray, memoryview)):
+        return CODECS.get(MsgpackCodec.name, JSON)
+    return JSON
+
+
+def can_relay(source_codec, target_codec) -> bool:
+    """Whether a frame encoded with source_codec can be sent to a target_codec peer unchanged"""
+    if isinstance(source_codec, EnvelopeCodec):
+        # envelope peers decode the body with the codec named in the header
+        return isinstance(target_codec, EnvelopeCodec)
+    return source_codec is target_codec
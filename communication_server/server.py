@@ -1,56 +1,198 @@
+import argparse
 import asyncio
+import multiprocessing
 import websockets
 import json
 import logging
+import os
+import sys
 
 from websockets import ConnectionClosedOK
 from websockets.client import ClientConnection
 from websockets.exceptions import ConnectionClosed, ConnectionClosedError
 
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from communication_server.cluster import NODE_REGISTER, NodeLinks
+from communication_server.dispatcher import DispatchEngine, OverflowPolicy, QueueFullError
+from communication_server.protocol import (BATCH_FEATURE, ENVELOPE_FEATURE, BatchSettings, correlation_fields,
+                                           negotiate_features)
+from communication_server.registry import InMemoryRegistry, SqliteRegistry
+from communication_server.serialization import (ENVELOPE, EnvelopeCodec, can_relay, codec_for_frame,
+                                                negotiate_codec, read_header, split_envelopes)
+
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s %(levelname)s %(message)s')
 
 class AgentServer:
-    def __init__(self):
+    def __init__(self, queue_size: int = 1000,
+                 overflow_policy: OverflowPolicy | str = OverflowPolicy.BLOCK,
+                 metrics_interval: float = 0,
+                 batch_settings: BatchSettings | None = None,
+                 node_id: str = "node-0",
+                 registry=None,
+                 node_address: str | None = None):
+        # websockets of the agents connected to this node
         self.agent_registry = {}
-        self.queue = asyncio.Queue(maxsize=1000)
+        self.dispatcher = DispatchEngine(queue_size=queue_size, policy=overflow_policy)
+        self.metrics_interval = metrics_interval
+        self._metrics_task: asyncio.Task | None = None
+        self.batch_settings = batch_settings or BatchSettings()
+        # which node every agent in the cluster is connected to
+        self.node_id = node_id
+        self.registry = registry or InMemoryRegistry()
+        self.node_address = node_address
+        self.links = NodeLinks(node_id, self.registry, queue_size=queue_size, policy=overflow_policy,
+                               batch_settings=self.batch_settings)
         logging.info("Agent server started.")
 
-    async def unregister_agent(self, agent_id:str):
+    async def unregister_agent(self, agent_id:str, websocket=None):
         if agent_id in self.agent_registry:
+            if websocket is not None and self.agent_registry[agent_id] is not websocket:
+                # the agent already reconnected on a new connection
+                return
             del self.agent_registry[agent_id]
-            await self.update_directory_agent(agent_id, None)
+            await self.dispatcher.close(agent_id)
+            await self.registry.release(agent_id, self.node_id)
+            if await self.registry.locate(agent_id) is None:
+                # an agent that reconnected to another node is still there
+                await self.update_directory_agent(agent_id, None)
             logging.info(f"Agent {agent_id} was unregistered.")
 
     async def register_agent(self, agent_id:str, websocket: ClientConnection):
         self.agent_registry[agent_id] = websocket
+        await self.dispatcher.open(agent_id, websocket)
         logging.info(f"Agent {agent_id} was registered.")
-        await websocket.send(json.dumps({"status": "registered"}))
+        await self.send_to(agent_id, {"status": "registered"})
+
+    async def remote_node(self, agent_id: str) -> str | None:
+        """The sibling node an agent is connected to, None if it is local or unknown"""
+        if agent_id is None or agent_id in self.agent_registry:
+            return None
+        node_id = await self.registry.locate(agent_id)
+        return node_id if node_id != self.node_id else None
+
+    async def is_connected(self, agent_id: str) -> bool:
+        """Whether the agent is connected to this node or a sibling"""
+        return agent_id in self.agent_registry or await self.remote_node(agent_id) is not None
 
-    async def forward_message(self, message_type: str, sender_id: str, recipient_id: str ,message:str):
-        recipient_ws = self.agent_registry.get(recipient_id)
-        if recipient_ws:
+    async def send_to(self, recipient_id: str, payload: dict) -> bool:
+        """Encode a server generated message with the recipient's codec and queue it"""
+        codec = self.dispatcher.codec_for(recipient_id)
+        if codec is None:
+            node_id = await self.remote_node(recipient_id)
+            if node_id is None:
+                return False
+            return await self.links.send(node_id, ENVELOPE.encode({**payload, "recipient_id": recipient_id}))
+        return await self.dispatcher.enqueue(recipient_id, codec.encode(payload))
+
+    async def forward_message(self, message_type: str, sender_id: str, recipient_id: str ,message:str,
+                              frame=None, codec=None, relayed: bool = False, correlation_id: str | None = None,
+                              in_reply_to: str | None = None):
+        """Queue a message for its recipient.
+
+        frame and codec are the message as the sender encoded it. When the
+        recipient can read that encoding the frame is relayed as-is instead of
+        being encoded again. Messages for agents on a sibling node go over the
+        link to that node. relayed marks messages that arrived over a link: if
+        the recipient is no longer here the sender's node routed on a stale
+        location, so the agent is looked up again and the message goes on to
+        its current node. correlation_id marks a request and in_reply_to the
+        reply to one, both are passed through untouched. The sender of a
+        message for an agent that is not connected gets an error, which
+        answers its request at once instead of leaving it to time out.
+        """
+        recipient_codec = self.dispatcher.codec_for(recipient_id)
+        if recipient_codec is None:
+            if relayed:
+                node_id = await self.registry.locate(recipient_id, fresh=True)
+                if node_id == self.node_id:
+                    node_id = None
+            else:
+                node_id = await self.remote_node(recipient_id)
+            if node_id is None:
+                logging.warning(f"Agent {sender_id} sending {message} failed")
+                if message_type != "error":
+                    await self.notify_rejected(sender_id, recipient_id, correlation_id,
+                                               reason="the recipient is not connected")
+                return
+            if frame is None or not isinstance(codec, EnvelopeCodec):
+                payload = {
+                    "message_type": message_type,
+                    "sender_id": sender_id,
+                    "recipient_id": recipient_id,
+                    "message": message,
+                }
+                payload.update(correlation_fields(correlation_id, in_reply_to))
+                frame = ENVELOPE.encode(payload)
             try:
-                await recipient_ws.send(json.dumps({
+                if not await self.links.send(node_id, frame):
+                    logging.warning(f"Agent {sender_id} sending to {recipient_id} on {node_id} failed")
+            except QueueFullError as e:
+                logging.warning(f"Agent {sender_id} sending to {recipient_id} rejected: {e}")
+                await self.notify_rejected(sender_id, recipient_id, correlation_id)
+            return
+        if frame is None or not can_relay(codec, recipient_codec):
+            if frame is not None and isinstance(codec, EnvelopeCodec):
+                # the recipient does not speak envelopes, only now is the body decoded
+                payload = codec.decode(frame)
+            else:
+                payload = {
                     "message_type": message_type,
                     "sender_id": sender_id,
                     "message": message,
-                }))
+                }
+                payload.update(correlation_fields(correlation_id, in_reply_to))
+            frame = recipient_codec.encode(payload)
+        try:
+            if await self.dispatcher.enqueue(recipient_id, frame):
                 logging.info(f"Agent {message_type}{sender_id} sent a message to {recipient_id}.")
-            except ConnectionClosedError:
+            else:
                 logging.warning(f"Agent {sender_id} sending {message} failed")
-        else:
-            logging.warning(f"Agent {sender_id} sending {message} failed")
+        except QueueFullError as e:
+            logging.warning(f"Agent {sender_id} sending to {recipient_id} rejected: {e}")
+            await self.notify_rejected(sender_id, recipient_id, correlation_id)
 
-    async def dispatch_message(self):
+    async def notify_rejected(self, sender_id: str, recipient_id: str, correlation_id: str | None = None,
+                              reason: str = "the recipient queue is full"):
+        """Tell the sender its message was rejected, by default because the recipient queue is full"""
+        if sender_id is None:
+            return
+        error = {
+            "message_type": "error",
+            "sender_id": "AgentServer",
+            "recipient_id": recipient_id,
+            "message": f"Message to {recipient_id} was rejected, {reason}",
+        }
+        if correlation_id is not None:
+            # answers the rejected request, failing it instead of leaving it to time out
+            error["in_reply_to"] = correlation_id
+        try:
+            await self.send_to(sender_id, error)
+        except QueueFullError:
+            logging.warning(f"Could not notify {sender_id} about the rejected message, its queue is full too")
+
+    def negotiated_codec(self, registration: dict):
+        """The codec frames to this agent are encoded with, from its register message"""
+        codec = negotiate_codec(registration.get("codecs"))
+        if ENVELOPE_FEATURE in negotiate_features(registration.get("features")):
+            codec = EnvelopeCodec(codec)
+        return codec
+
+    def queue_metrics(self) -> dict[str, dict]:
+        """Per-recipient outbound queue depth and delivery counters, links to sibling nodes included"""
+        metrics = self.dispatcher.metrics()
+        for node_id, link_metrics in self.links.metrics().items():
+            metrics[f"link:{node_id}"] = link_metrics
+        return metrics
+
+    async def report_metrics(self):
         while True:
-            try:
-                message_type, recipient_id, sender_id, message = await self.queue.get()
-                await self.forward_message(message_type, sender_id, recipient_id, message)
-                self.queue.task_done()
-            except Exception as e:
-                logging.error(f"Error sending message: {e}")
+            await asyncio.sleep(self.metrics_interval)
+            for agent_id, metrics in self.queue_metrics().items():
+                logging.info(f"Queue {agent_id}: {metrics}")
 
     async def update_directory_agent(self, message, websocket: websockets.ClientProtocol | None):
         data = message
@@ -61,12 +203,14 @@ class AgentServer:
                 logging.error(f"Agent {data["agent_id"]} is missing agent_id.")
                 return
             self.agent_registry[agent_id] = websocket
+            batch = None
+            if BATCH_FEATURE in negotiate_features(data.get("features")):
+                batch = self.batch_settings
+            await self.dispatcher.open(agent_id, websocket, batch=batch, codec=self.negotiated_codec(data))
             if agent_id == "DirectoryAgent":
                 logging.info(f"Agent {agent_id} was registered.")
                 return
-            directory_ws = self.agent_registry.get("DirectoryAgent")
-
-            if directory_ws:
+            if await self.is_connected("DirectoryAgent"):
                 logging.info(f"Notifying Directory Agent about new agent: {agent_id}")
                 notification = {
                     "message_type": "registration",
@@ -76,9 +220,8 @@ class AgentServer:
                 }
                 try:
                     logging.info(f"Agent {agent_id} was registered.")
-                    await directory_ws.send(json.dumps(notification))
-                    # logging.info(f"Agent {agent_id} was registered.")
-                except ConnectionClosedError:
+                    await self.send_to("DirectoryAgent", notification)
+                except QueueFullError:
                     logging.info(f"Agent {agent_id} sending {notification} failed")
                 return
             else:
@@ -86,16 +229,15 @@ class AgentServer:
         elif websocket is None:
             try:
                 agent_id = data
-                directory_ws = self.agent_registry.get("DirectoryAgent")
-                if directory_ws:
+                if await self.is_connected("DirectoryAgent"):
                     logging.info(f"Notifying Directory Agent that {agent_id} disconnected")
                     notification = {
                         "message_type": "update",
                         "agent_id": agent_id,
                     }
                     try:
-                        await directory_ws.send(json.dumps(notification))
-                    except ConnectionClosedError:
+                        await self.send_to("DirectoryAgent", notification)
+                    except QueueFullError:
                         logging.info(f"Agent {agent_id} sending {notification} failed")
                     finally:
                         logging.info(f"Agent {agent_id} was disconnected.")
@@ -109,36 +251,84 @@ class AgentServer:
 
 
 
+    async def link_handler(self, websocket, node_id: str):
+        """Deliver the envelope frames a sibling node forwards to agents connected here"""
+        logging.info(f"Node {node_id} linked")
+        try:
+            async for frame in websocket:
+                for envelope in split_envelopes(frame):
+                    try:
+                        header = read_header(envelope)
+                        await self.forward_message(header.get("message_type"), header.get("sender_id"),
+                                                   header.get("recipient_id"), None,
+                                                   frame=envelope, codec=ENVELOPE, relayed=True,
+                                                   correlation_id=header.get("correlation_id"),
+                                                   in_reply_to=header.get("in_reply_to"))
+                    except Exception as e:
+                        logging.error(f"Error delivering message from node {node_id}: {e}")
+        except ConnectionClosed:
+            pass
+        logging.info(f"Node {node_id} unlinked")
+
     async def connection_handler(self, websocket):
             #logging.info("A client connected")
             agent_id = None
             try:
                 registration_message = await websocket.recv()
                 data = json.loads(registration_message)
+                if data.get("message_type") == NODE_REGISTER and "node_id" in data:
+                    await self.link_handler(websocket, data["node_id"])
+                    return
                 if data.get("message_type") == "register" and "agent_id" in data:
                     agent_id = data["agent_id"]
                     logging.info(f"Client Connected and registering: {data['agent_id']}")
+                    # claimed before the reply so siblings can route to the agent once it is told it is registered
+                    await self.registry.claim(agent_id, self.node_id, data.get("description", ""),
+                                              data.get("capabilities", []))
+                    # reply before the channel opens so the response is always the first frame
+                    await websocket.send(json.dumps({
+                        "status": "registration successful",
+                        "features": negotiate_features(data.get("features")),
+                        "codec": negotiate_codec(data.get("codecs")).name,
+                    }))
                     await self.update_directory_agent(message=data, websocket=websocket)
-                    await websocket.send(json.dumps({"status": "registration successful"}))
                 else:
                     await websocket.close(1008, json.dumps({"status": "registration failed"}))
 
                     return
-                async for message in websocket:
+                async for frame in websocket:
+                    codec = codec_for_frame(frame)
                     try:
-                        data = json.loads(message)
-                        message_type = data.get("message_type")
-                        recipient_id = data.get("recipient_id")
-                        sender_id = data.get("sender_id")
-                        message_content = data.get("message")
-                        if recipient_id and message:
-                            item = (message_type, recipient_id, sender_id, message_content)
-                            #logging.info(f"Agent {sender_id} sending {message}")
-                            await self.queue.put(item)
+                        if isinstance(codec, EnvelopeCodec):
+                            # envelopes are routed on their header, the body stays encoded
+                            messages = [(read_header(envelope), envelope) for envelope in split_envelopes(frame)]
                         else:
-                            logging.error(f"Invalid message format: {message}")
+                            decoded = codec.decode(frame)
+                            # a single message can be relayed as it arrived,
+                            # a batch frame carries several messages that are routed one by one
+                            if isinstance(decoded, list):
+                                messages = [(data, None) for data in decoded]
+                            else:
+                                messages = [(decoded, frame)]
                     except Exception as e:
-                        logging.error(f"Error sending message: {e}")
+                        logging.error(f"Error decoding frame: {e}")
+                        continue
+                    for data, raw in messages:
+                        try:
+                            message_type = data.get("message_type")
+                            recipient_id = data.get("recipient_id")
+                            sender_id = data.get("sender_id")
+                            message_content = data.get("message")
+                            if recipient_id:
+                                #logging.info(f"Agent {sender_id} sending {message_content}")
+                                await self.forward_message(message_type, sender_id, recipient_id, message_content,
+                                                           frame=raw, codec=codec,
+                                                           correlation_id=data.get("correlation_id"),
+                                                           in_reply_to=data.get("in_reply_to"))
+                            else:
+                                logging.error(f"Invalid message format: {data}")
+                        except Exception as e:
+                            logging.error(f"Error sending message: {e}")
             except ConnectionClosedError:
                 logging.info(f"Connection closed for agent {agent_id} (normal closure)")
             except ConnectionClosedOK:
@@ -148,19 +338,98 @@ class AgentServer:
                 logging.error(f"Connection handler error for agent {agent_id} : {e}")
             finally:
                 if agent_id is not None:
-                    await self.unregister_agent(agent_id)
+                    await self.unregister_agent(agent_id, websocket)
 
     async def startup(self):
         logging.info("Server Started startup")
-        asyncio.create_task(self.dispatch_message())
+        # agents left behind by a previous run of this node are gone
+        await self.registry.release_node(self.node_id)
+        if self.node_address is not None:
+            await self.registry.register_node(self.node_id, self.node_address)
+        if self.metrics_interval > 0:
+            self._metrics_task = asyncio.create_task(self.report_metrics())
+
+    async def shutdown(self):
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            try:
+                await self._metrics_task
+            except asyncio.CancelledError:
+                pass
+            self._metrics_task = None
+        await self.registry.unregister_node(self.node_id)
+        await self.links.shutdown()
+        await self.dispatcher.shutdown()
 
-async def main():
-    server = AgentServer()
+
+async def serve(host: str, port: int, node_id: str, registry_path: str | None = None,
+                advertise: str | None = None):
+    """Run one server node until cancelled"""
+    server = AgentServer(
+        queue_size=int(os.getenv("AGENT_SERVER_QUEUE_SIZE", "1000")),
+        overflow_policy=os.getenv("AGENT_SERVER_OVERFLOW_POLICY", "block"),
+        metrics_interval=float(os.getenv("AGENT_SERVER_METRICS_INTERVAL", "0")),
+        batch_settings=BatchSettings(
+            window=float(os.getenv("AGENT_SERVER_BATCH_WINDOW_MS", "2")) / 1000,
+            max_messages=int(os.getenv("AGENT_SERVER_BATCH_MAX_MESSAGES", "64")),
+            max_bytes=int(os.getenv("AGENT_SERVER_BATCH_MAX_BYTES", str(256 * 1024))),
+        ),
+        node_id=node_id,
+        registry=SqliteRegistry(registry_path) if registry_path else InMemoryRegistry(),
+        node_address=advertise or f"ws://{host}:{port}",
+    )
     await server.startup()
-    async with websockets.serve(server.connection_handler, "localhost", 8765):
-        logging.info("WebSocket server started on ws://localhost:8765")
-        await asyncio.Future()
+    try:
+        async with websockets.serve(server.connection_handler, host, port):
+            logging.info(f"WebSocket server {node_id} started on ws://{host}:{port}")
+            await asyncio.Future()
+    finally:
+        await server.shutdown()
+
+
+def run_node(host: str, port: int, node_id: str, registry_path: str | None, advertise: str | None):
+    try:
+        asyncio.run(serve(host, port, node_id, registry_path, advertise))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent communication server")
+    parser.add_argument("--host", default=os.getenv("AGENT_SERVER_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("AGENT_SERVER_PORT", "8765")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("AGENT_SERVER_WORKERS", "1")),
+                        help="Worker processes, each a node listening on its own port from --port up")
+    parser.add_argument("--node-id", default=os.getenv("AGENT_SERVER_NODE_ID", "node-0"),
+                        help="Name of this node in the cluster, worker processes append their index")
+    parser.add_argument("--registry", default=os.getenv("AGENT_SERVER_REGISTRY"),
+                        help="SQLite file of the registry shared by the nodes, required with several workers")
+    parser.add_argument("--advertise", default=os.getenv("AGENT_SERVER_ADVERTISE"),
+                        help="Address sibling nodes reach this node at, defaults to ws://host:port")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        run_node(args.host, args.port, args.node_id, args.registry, args.advertise)
+        return
+    if not args.registry:
+        parser.error("--registry is required with more than one worker")
+    workers = [
+        multiprocessing.Process(
+            target=run_node,
+            args=(args.host, args.port + index, f"{args.node_id}-{index}", args.registry, None),
+            name=f"{args.node_id}-{index}",
+        )
+        for index in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
 
@@ -0,0 +1,27 @@
+import contextlib
+import os
+import sys
+
+import pytest
+import websockets
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from communication_server.server import AgentServer
+
+
+@pytest.fixture
+def agent_server():
+    """Start an AgentServer on a free local port: async with agent_server(**options) as (server, uri)"""
+    @contextlib.asynccontextmanager
+    async def start(**options):
+        server = AgentServer(**options)
+        await server.startup()
+        async with websockets.serve(server.connection_handler, "localhost", 0) as listener:
+            port = listener.sockets[0].getsockname()[1]
+            try:
+                yield server, f"ws://localhost:{port}"
+            finally:
+                await server.shutdown()
+    return start
@@ -0,0 +1,161 @@
+"""
+Tests for the negotiated batch frame mode
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+import websockets
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from common.ConnectionManager import ConnectionManager
+from communication_server.dispatcher import DispatchEngine
+from communication_server.protocol import BATCH_FEATURE, BatchSettings, negotiate_features, pack_batch, unpack_frame
+from communication_server.serialization import CODECS, JSON
+
+
+class FakeWebSocket:
+    def __init__(self, replies=()):
+        self.sent = []
+        self.replies = list(replies)
+        self.failure = None
+
+    async def send(self, frame):
+        if self.failure is not None:
+            raise self.failure
+        self.sent.append(frame)
+
+    async def recv(self):
+        return self.replies.pop(0)
+
+
+def test_pack_and_unpack():
+    """Test that a batch frame carries its messages in order, and a single message stays a plain frame"""
+    messages = [{"message": i, "sender_id": "a"} for i in range(3)]
+    for codec in CODECS.values():
+        frames = [codec.encode(message) for message in messages]
+        assert unpack_frame(pack_batch(frames, codec)) == messages
+        assert pack_batch(frames[:1], codec) is frames[0]
+        assert unpack_frame(frames[0]) == messages[:1]
+
+
+def test_negotiate_features():
+    """Test that only supported features are accepted, and peers without the field get none"""
+    assert negotiate_features(["batch", "compression"]) == ["batch"]
+    assert negotiate_features(None) == []
+    assert negotiate_features("batch") == []
+
+
+def test_channel_coalesces_within_the_window():
+    """Test that frames queued within the batch window go out as one frame"""
+    async def run():
+        engine = DispatchEngine()
+        websocket = FakeWebSocket()
+        await engine.open("bob", websocket, batch=BatchSettings(window=0.05, max_messages=3))
+        for i in range(4):
+            await engine.enqueue("bob", JSON.encode({"message": i}))
+        await asyncio.sleep(0.1)
+        await engine.shutdown()
+        return [unpack_frame(frame) for frame in websocket.sent]
+
+    assert asyncio.run(run()) == [[{"message": 0}, {"message": 1}, {"message": 2}], [{"message": 3}]]
+
+
+def test_client_falls_back_without_negotiation():
+    """Test that a client talking to a server that does not negotiate sends plain frames"""
+    async def run():
+        manager = ConnectionManager("alice", "test agent", [], batch=True, envelope=False)
+        manager._websocket = FakeWebSocket(replies=[json.dumps({"status": "registered"})])
+        await manager._register()
+        assert json.loads(manager._websocket.sent[0])["features"] == ["batch"]
+        assert manager.features == [] and manager.codec is JSON
+
+        for i in range(2):
+            await manager.send({"recipient_id": "bob", "message": i})
+        return manager._websocket.sent[1:]
+
+    assert [json.loads(frame) for frame in asyncio.run(run())] == [
+        {"recipient_id": "bob", "message": 0},
+        {"recipient_id": "bob", "message": 1},
+    ]
+
+
+def test_failed_batch_is_kept_and_reported():
+    """Test that a batch failing in the background is raised by the next send and sent again later"""
+    async def run():
+        manager = ConnectionManager("alice", "test agent", [], batch=True, envelope=False,
+                                    batch_settings=BatchSettings(window=0.01))
+        manager._websocket = FakeWebSocket()
+        manager.features = [BATCH_FEATURE]
+        manager._websocket.failure = ConnectionResetError("connection lost")
+
+        for i in range(2):
+            await manager.send({"recipient_id": "bob", "message": i})
+        await asyncio.sleep(0.05)
+        with pytest.raises(ConnectionError):
+            await manager.send({"recipient_id": "bob", "message": 2})
+
+        manager._websocket.failure = None
+        await manager.send({"recipient_id": "bob", "message": 3})
+        await manager.flush()
+        return manager._websocket.sent
+
+    assert [unpack_frame(frame) for frame in asyncio.run(run())] == [
+        [{"recipient_id": "bob", "message": 0}, {"recipient_id": "bob", "message": 1},
+         {"recipient_id": "bob", "message": 3}],
+    ]
+
+
+def test_send_without_connection_raises():
+    """Test that sending without a websocket raises instead of returning a status string"""
+    manager = ConnectionManager("alice", "test agent", [], batch=False, envelope=False)
+    with pytest.raises(ConnectionError):
+        asyncio.run(manager.send({"recipient_id": "bob", "message": 0}))
+
+
+def test_batching_and_plain_clients_interoperate(agent_server):
+    """Test that a batching client and an old client without negotiation exchange messages"""
+    async def run():
+        async with agent_server(batch_settings=BatchSettings(window=0.05)) as (server, uri):
+            received = []
+
+            async def handler(message):
+                received.append(message["message"])
+
+            alice = ConnectionManager("alice", "batching agent", [], batch=True, envelope=False)
+            alice.uri = uri
+            await alice.connect()
+            assert alice.features == ["batch"]
+            await alice.start_listening(handler)
+
+            # an old client registers without "features" and expects one message per frame
+            async with websockets.connect(uri) as bob:
+                await bob.send(json.dumps({"message_type": "register", "agent_id": "bob"}))
+                assert json.loads(await bob.recv())["features"] == []
+
+                for i in range(3):
+                    await alice.send({"message_type": "message", "recipient_id": "bob",
+                                      "sender_id": "alice", "message": i})
+                frames = [json.loads(await bob.recv()) for _ in range(3)]
+
+                for i in range(3):
+                    await bob.send(json.dumps({"message_type": "message", "recipient_id": "alice",
+                                               "sender_id": "bob", "message": i}))
+                for _ in range(50):
+                    if len(received) == 3:
+                        break
+                    await asyncio.sleep(0.02)
+
+            alice.task.cancel()
+            await alice.close()
+            return frames, received
+
+    frames, received = asyncio.run(run())
+    assert [frame["message"] for frame in frames] == [0, 1, 2]
+    assert all(isinstance(frame, dict) for frame in frames)
+    assert received == [0, 1, 2]
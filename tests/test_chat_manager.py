@@ -0,0 +1,73 @@
+"""
+Tests for per-conversation history trimming and run serialization
+"""
+
+import asyncio
+import gc
+import os
+import sys
+from types import SimpleNamespace
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+
+from common.ChatManager import ChatManager
+
+
+class FakeGraph:
+    def __init__(self, history):
+        self.history = history
+
+    async def aget_state(self, config):
+        return SimpleNamespace(values={"messages": self.history})
+
+    async def ainvoke(self, input, config):
+        await asyncio.sleep(0)
+        return {"messages": [AIMessage(content="done")]}
+
+
+def _turn(n, tool_calls=0):
+    messages = [HumanMessage(content=f"q{n}", id=f"h{n}")]
+    for i in range(tool_calls):
+        messages.append(AIMessage(content="", id=f"a{n}.{i}"))
+        messages.append(ToolMessage(content="r", tool_call_id=f"c{n}.{i}", id=f"t{n}.{i}"))
+    messages.append(AIMessage(content=f"a{n}", id=f"a{n}"))
+    return messages
+
+
+def _trim(history, max_history):
+    manager = ChatManager(name="test", max_history=max_history)
+    manager.graph = FakeGraph(history)
+    removed = asyncio.run(manager._trim_history({}))
+    assert all(isinstance(message, RemoveMessage) for message in removed)
+    return [message.id for message in removed]
+
+
+def test_trim_cuts_at_a_human_turn():
+    """Test that the oldest turns are removed whole"""
+    history = _turn(1) + _turn(2, tool_calls=1) + _turn(3)
+    assert _trim(history, 5) == ["h1", "a1", "h2", "a2.0", "t2.0", "a2"]
+    assert _trim(history, 20) == []
+
+
+def test_trim_keeps_the_latest_turn():
+    """Test that a latest turn longer than max_history is kept with everything after it"""
+    history = _turn(1) + _turn(2, tool_calls=4)
+    assert _trim(history, 4) == ["h1", "a1"]
+    assert _trim(_turn(1, tool_calls=4), 4) == []
+
+
+def test_idle_thread_locks_are_dropped():
+    """Test that a conversation's lock does not outlive its runs"""
+    manager = ChatManager(name="test", max_history=0)
+    manager.graph = FakeGraph([])
+
+    async def run():
+        outputs = await asyncio.gather(*(manager.run_agent("hi", conversation_id=f"agent-{i}") for i in range(20)))
+        assert outputs == ["done"] * 20
+
+    asyncio.run(run())
+    gc.collect()
+    assert len(manager._thread_locks) == 0
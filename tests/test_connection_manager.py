@@ -0,0 +1,175 @@
+"""
+Tests for request/reply correlation in the ConnectionManager
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from common.ConnectionManager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(json.loads(frame))
+
+
+def _manager(agent_id):
+    manager = ConnectionManager(agent_id, "test agent", [], batch=False, envelope=False)
+    manager._websocket = FakeWebSocket()
+    return manager
+
+
+def _deliver(manager, message):
+    """What receive() does with a message before it reaches the handler, True if it was consumed"""
+    return manager._resolve_reply(message)
+
+
+def test_reply_resolves_its_request():
+    """Test that a reply is matched to the request by in_reply_to"""
+    async def run():
+        alice, bob = _manager("alice"), _manager("bob")
+        pending = asyncio.create_task(alice.request("bob", "status?", timeout=1))
+        await asyncio.sleep(0)
+
+        request = alice._websocket.sent[-1]
+        assert "in_reply_to" not in request
+        assert not _deliver(bob, request)
+
+        await bob.reply(request, "all good")
+        reply = bob._websocket.sent[-1]
+        assert reply["in_reply_to"] == request["correlation_id"]
+        assert "correlation_id" not in reply
+        assert _deliver(alice, reply)
+        return await pending
+
+    assert asyncio.run(run())["message"] == "all good"
+
+
+def test_late_reply_is_dropped():
+    """Test that a reply arriving after its request timed out doesn't leak into later messages"""
+    async def run():
+        alice, bob = _manager("alice"), _manager("bob")
+        with pytest.raises(asyncio.TimeoutError):
+            await alice.request("bob", "first", timeout=0.01)
+        first = alice._websocket.sent[-1]
+
+        # bob answers too late, alice drops it instead of treating it as a request
+        await bob.reply(first, "late answer")
+        assert _deliver(alice, bob._websocket.sent[-1])
+
+        # alice's next plain message to bob carries no ids
+        await alice.send({"message_type": "message", "recipient_id": "bob", "sender_id": "alice", "message": "hi"})
+        plain = alice._websocket.sent[-1]
+        assert "correlation_id" not in plain and "in_reply_to" not in plain
+        assert not _deliver(bob, plain)
+        await bob.reply(plain, "not a request")
+        assert bob._websocket.sent[-1]["message"] == "late answer"
+
+        # a later request still gets its own reply
+        pending = asyncio.create_task(alice.request("bob", "second", timeout=1))
+        await asyncio.sleep(0)
+        second = alice._websocket.sent[-1]
+        assert second["correlation_id"] != first["correlation_id"]
+        await bob.send({"message_type": "message", "recipient_id": "alice", "sender_id": "bob", "message": "unrelated"})
+        assert not _deliver(alice, bob._websocket.sent[-1])
+        await bob.reply(second, "second answer")
+        assert _deliver(alice, bob._websocket.sent[-1])
+        return await pending
+
+    assert asyncio.run(run())["message"] == "second answer"
+
+
+def test_error_reply_fails_the_request():
+    """Test that a rejection from the server, or a request the agent could not answer, raises"""
+    async def run():
+        alice, bob = _manager("alice"), _manager("bob")
+        pending = asyncio.create_task(alice.request("bob", "status?", timeout=1))
+        await asyncio.sleep(0)
+        await bob.reply(alice._websocket.sent[-1], None)
+        assert bob._websocket.sent[-1]["message_type"] == "error"
+        _deliver(alice, bob._websocket.sent[-1])
+        await pending
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+
+
+def test_request_fails_when_it_cannot_be_sent():
+    """Test that a request raises at once instead of waiting for a reply that cannot come"""
+    async def run():
+        manager = ConnectionManager("alice", "test agent", [], batch=False, envelope=False)
+        with pytest.raises(ConnectionError):
+            await manager.request("bob", "status?", timeout=60)
+        return manager._pending_requests
+
+    assert asyncio.run(run()) == {}
+
+
+def test_request_to_unknown_agent_fails_fast(agent_server):
+    """Test that the server answers a request for an agent that is not connected with an error"""
+    async def run():
+        async with agent_server() as (server, uri):
+            alice = _manager("alice")
+            alice.uri = uri
+            await alice.connect()
+            await alice.start_listening(lambda message: asyncio.sleep(0))
+            try:
+                with pytest.raises(ConnectionError, match="not connected"):
+                    await alice.request("nobody", "status?", timeout=2)
+            finally:
+                alice.task.cancel()
+                await alice.close()
+
+    asyncio.run(run())
+
+
+def test_request_reply_through_the_server(agent_server):
+    """Test correlation end to end, with a reply that arrives after its request timed out"""
+    async def run():
+        async with agent_server() as (server, uri):
+            alice, bob = _manager("alice"), _manager("bob")
+            seen_by_alice, seen_by_bob = [], []
+            slow = asyncio.Event()
+
+            async def answer(message):
+                seen_by_bob.append(message)
+                if message["message"] == "slow":
+                    await slow.wait()
+                await bob.reply(message, f"re: {message['message']}")
+
+            async def record(message):
+                seen_by_alice.append(message)
+
+            for manager, handler in ((alice, record), (bob, answer)):
+                manager.uri = uri
+                await manager.connect()
+                await manager.start_listening(handler)
+
+            with pytest.raises(asyncio.TimeoutError):
+                await alice.request("bob", "slow", timeout=0.05)
+            slow.set()
+            await alice.send({"message_type": "message", "recipient_id": "bob", "sender_id": "alice",
+                              "message": "fyi"})
+            reply = await alice.request("bob", "fast", timeout=2)
+
+            for manager in (alice, bob):
+                manager.task.cancel()
+                await manager.close()
+            return reply, seen_by_alice, seen_by_bob
+
+    reply, seen_by_alice, seen_by_bob = asyncio.run(run())
+    assert reply["message"] == "re: fast"
+    # the late reply was dropped, the plain message got no reply and carried no ids
+    assert seen_by_alice == []
+    fyi = next(message for message in seen_by_bob if message["message"] == "fyi")
+    assert "correlation_id" not in fyi and "in_reply_to" not in fyi
@@ -0,0 +1,134 @@
+"""
+Tests for the per-recipient outbound queues of the AgentServer
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from communication_server.dispatcher import DispatchEngine, QueueFullError
+from communication_server.server import AgentServer
+
+
+class FakeWebSocket:
+    """Records sent frames, sends wait while the socket is stalled"""
+    def __init__(self, stalled: bool = False):
+        self.sent = []
+        self.open = asyncio.Event()
+        if not stalled:
+            self.open.set()
+
+    async def send(self, frame):
+        await self.open.wait()
+        self.sent.append(frame)
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_block_waits_for_room():
+    """Test that a full queue makes the producer wait and loses nothing"""
+    async def run():
+        engine = DispatchEngine(queue_size=1, policy="block")
+        websocket = FakeWebSocket(stalled=True)
+        await engine.open("bob", websocket)
+
+        await engine.enqueue("bob", "1")
+        await _settle()  # the writer holds 1 while the socket is stalled
+        await engine.enqueue("bob", "2")
+        blocked = asyncio.create_task(engine.enqueue("bob", "3"))
+        await _settle()
+        assert not blocked.done()
+
+        websocket.open.set()
+        assert await blocked
+        await _settle()
+        await engine.shutdown()
+        return websocket.sent
+
+    assert asyncio.run(run()) == ["1", "2", "3"]
+
+
+def test_drop_oldest_keeps_the_newest():
+    """Test that a full queue discards its oldest frames and counts them"""
+    async def run():
+        engine = DispatchEngine(queue_size=2, policy="drop_oldest")
+        websocket = FakeWebSocket(stalled=True)
+        channel = await engine.open("bob", websocket)
+
+        await engine.enqueue("bob", "1")
+        await _settle()
+        for frame in ("2", "3", "4", "5"):
+            assert await engine.enqueue("bob", frame)
+        assert channel.metrics()["dropped"] == 2
+
+        websocket.open.set()
+        await _settle()
+        await engine.shutdown()
+        return websocket.sent
+
+    assert asyncio.run(run()) == ["1", "4", "5"]
+
+
+def test_reject_raises_when_full():
+    """Test that a full queue rejects new frames under the reject policy"""
+    async def run():
+        engine = DispatchEngine(queue_size=1, policy="reject")
+        channel = await engine.open("bob", FakeWebSocket(stalled=True))
+        await engine.enqueue("bob", "1")
+        await _settle()
+        await engine.enqueue("bob", "2")
+        with pytest.raises(QueueFullError):
+            await engine.enqueue("bob", "3")
+        assert channel.metrics()["rejected"] == 1
+        assert not await engine.enqueue("nobody", "4")
+        await engine.shutdown()
+
+    asyncio.run(run())
+
+
+def test_rejected_request_gets_an_error_frame():
+    """Test that the sender of a rejected request is told, with the request's id"""
+    async def run():
+        server = AgentServer(queue_size=1, overflow_policy="reject")
+        alice, bob = FakeWebSocket(), FakeWebSocket(stalled=True)
+        await server.dispatcher.open("alice", alice)
+        await server.dispatcher.open("bob", bob)
+
+        for i in range(2):
+            await server.forward_message("message", "alice", "bob", f"hello {i}")
+            await _settle()
+        await server.forward_message("message", "alice", "bob", "plain")
+        await _settle()
+        await server.forward_message("message", "alice", "bob", "request", correlation_id="c1")
+        await _settle()
+        await server.dispatcher.shutdown()
+        return [json.loads(frame) for frame in alice.sent]
+
+    plain, request = asyncio.run(run())
+    assert plain["message_type"] == request["message_type"] == "error"
+    assert plain["sender_id"] == "AgentServer" and plain["recipient_id"] == "bob"
+    assert "in_reply_to" not in plain
+    assert request["in_reply_to"] == "c1"
+
+
+def test_shutdown_stops_metrics_reporting():
+    """Test that the metrics reporter started by startup() is cancelled by shutdown()"""
+    async def run():
+        server = AgentServer(metrics_interval=0.01)
+        await server.startup()
+        task = server._metrics_task
+        await asyncio.sleep(0.03)
+        await server.shutdown()
+        return task, server._metrics_task
+
+    task, after = asyncio.run(run())
+    assert task.cancelled() and after is None
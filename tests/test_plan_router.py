@@ -0,0 +1,30 @@
+"""
+Tests for the planner fast path and plan cache
+"""
+
+import os
+import sys
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from common.agent.PlanRouter import PlanRouter
+
+
+def test_plans_are_not_shared_across_ids():
+    """Test that requests naming different reviews get different cache entries"""
+    router = PlanRouter(enabled=True, cache_size=8)
+    router.remember("Analyze review_ids 12, 13, 14", "plan for 12-14")
+
+    assert router.cached_plan("analyze   REVIEW_IDS 12, 13, 14") == "plan for 12-14"
+    assert router.cached_plan("Analyze review_ids 40, 41, 42") is None
+
+
+def test_trivial_turns_skip_the_planner():
+    """Test that only acknowledgements and notifications skip planning"""
+    router = PlanRouter(enabled=True)
+
+    assert not router.needs_plan("thanks, got it!")
+    assert not router.needs_plan("Notification: agent registered")
+    assert router.needs_plan("Confirmation needed: delete all reviews from last week?")
+    assert router.needs_plan("Analyze the latest reviews")
@@ -0,0 +1,160 @@
+"""
+Tests for the shared agent registry and routing between cluster nodes
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from communication_server.registry import InMemoryRegistry, SqliteRegistry
+from communication_server.serialization import ENVELOPE
+from communication_server.server import AgentServer
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(frame)
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_locate_is_cached_and_invalidated(tmp_path):
+    """Test that claims through the registry show up at once, other processes' after the ttl"""
+    path = str(tmp_path / "registry.db")
+    node_a = SqliteRegistry(path, locate_ttl=60)
+    node_b = SqliteRegistry(path, locate_ttl=0)
+
+    async def run():
+        await node_a.claim("writer", "a")
+        assert await node_a.locate("writer") == "a"
+
+        # moved by another process, node_a keeps its cached answer until the ttl runs out
+        await node_b.claim("writer", "b")
+        assert await node_b.locate("writer") == "b"
+        assert await node_a.locate("writer") == "a"
+
+        # a claim or release made here drops the entry
+        await node_a.release("writer", "a")
+        assert await node_a.locate("writer") == "b"
+        await node_a.release_node("b")
+        assert await node_a.locate("writer") is None
+
+    asyncio.run(run())
+
+
+def test_locked_database_does_not_block_the_loop(tmp_path):
+    """Test that the event loop keeps running while a sibling holds the write lock"""
+    path = str(tmp_path / "registry.db")
+    registry = SqliteRegistry(path)
+    sibling = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    sibling.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.5, sibling.execute, ("COMMIT",)).start()
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await registry.claim("writer", "a")
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+    sibling.close()
+
+
+def test_lookup_racing_a_write_is_not_cached(tmp_path):
+    """Test that a lookup reading the old row while a claim is written does not outlive the claim"""
+    path = str(tmp_path / "registry.db")
+    other = SqliteRegistry(path, locate_ttl=0)
+    registry = SqliteRegistry(path, locate_ttl=60)
+    started, finish = threading.Event(), threading.Event()
+    execute_write = registry._execute_write
+
+    def slow_write(query, params):
+        started.set()
+        finish.wait(5)
+        execute_write(query, params)
+
+    registry._execute_write = slow_write
+
+    async def run():
+        await other.claim("writer", "a")
+        claim = asyncio.create_task(registry.claim("writer", "c"))
+        await asyncio.to_thread(started.wait, 5)
+        assert await registry.locate("writer") == "a"
+        finish.set()
+        await claim
+        return await registry.locate("writer")
+
+    assert asyncio.run(run()) == "c"
+
+
+def test_unknown_agents_are_not_cached(tmp_path):
+    """Test that an agent registered by another process is found at once after a miss"""
+    path = str(tmp_path / "registry.db")
+    registry = SqliteRegistry(path, locate_ttl=60)
+    other = SqliteRegistry(path, locate_ttl=60)
+
+    async def run():
+        assert await registry.locate("late") is None
+        await other.claim("late", "b")
+        return await registry.locate("late")
+
+    assert asyncio.run(run()) == "b"
+
+
+def test_relayed_miss_is_routed_again():
+    """Test that a message relayed to a node the agent has left goes on to its current node"""
+    async def run():
+        registry = InMemoryRegistry()
+        server = AgentServer(node_id="a", registry=registry)
+        forwarded = []
+
+        async def send(node_id, frame):
+            forwarded.append((node_id, frame))
+            return True
+
+        server.links.send = send
+        await registry.claim("bob", "b")
+        frame = ENVELOPE.encode({"message_type": "message", "sender_id": "alice", "recipient_id": "bob",
+                                 "message": "hello"})
+        await server.forward_message("message", "alice", "bob", None, frame=frame, codec=ENVELOPE,
+                                     relayed=True)
+        return frame, forwarded
+
+    frame, forwarded = asyncio.run(run())
+    assert forwarded == [("b", frame)]
+
+
+def test_relayed_miss_is_bounced():
+    """Test that the sender of a relayed message for an agent that is gone gets an error"""
+    async def run():
+        server = AgentServer(node_id="a")
+        alice = FakeWebSocket()
+        await server.dispatcher.open("alice", alice)
+        await server.forward_message("message", "alice", "bob", "hello", relayed=True, correlation_id="c1")
+        await _settle()
+        await server.dispatcher.shutdown()
+        return [json.loads(frame) for frame in alice.sent]
+
+    (error,) = asyncio.run(run())
+    assert error["message_type"] == "error" and error["in_reply_to"] == "c1"
+    assert error["message"] == "Message to bob was rejected, the recipient is not connected"
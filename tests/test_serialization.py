@@ -0,0 +1,158 @@
+"""
+Tests for frame codecs, their negotiation and relaying frames without re-encoding
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from common.ConnectionManager import ConnectionManager
+from communication_server.serialization import JSON, codec_for_frame, get_codec, negotiate_codec
+from communication_server.server import AgentServer
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(frame)
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_negotiate_codec():
+    """Test that the first supported codec is picked, JSON when none is"""
+    assert negotiate_codec(["cbor", "json"]) is JSON
+    assert negotiate_codec(None) is JSON
+    assert get_codec("unknown") is JSON
+    if get_codec("msgpack") is not JSON:
+        assert negotiate_codec(["msgpack", "json"]).name == "msgpack"
+
+
+def test_frames_are_relayed_or_reencoded():
+    """Test that a frame is relayed untouched to a peer with the same codec and re-encoded otherwise"""
+    msgpack_codec = get_codec("msgpack")
+    if msgpack_codec is JSON:
+        pytest.skip("msgpack not installed")
+
+    async def run():
+        server = AgentServer()
+        same, json_peer = FakeWebSocket(), FakeWebSocket()
+        await server.dispatcher.open("same", same, codec=msgpack_codec)
+        await server.dispatcher.open("json_peer", json_peer, codec=JSON)
+
+        payload = {"message_type": "message", "sender_id": "alice", "message": {"text": "hi"}}
+        frame = msgpack_codec.encode({**payload, "recipient_id": "same"})
+        assert codec_for_frame(frame) is msgpack_codec
+        await server.forward_message("message", "alice", "same", payload["message"],
+                                     frame=frame, codec=msgpack_codec)
+        await server.forward_message("message", "alice", "json_peer", payload["message"],
+                                     frame=msgpack_codec.encode({**payload, "recipient_id": "json_peer"}),
+                                     codec=msgpack_codec)
+        await _settle()
+        await server.dispatcher.shutdown()
+        return frame, same.sent, json_peer.sent
+
+    frame, same, json_peer = asyncio.run(run())
+    assert same == [frame] and same[0] is frame
+    assert [JSON.decode(sent) for sent in json_peer] == [
+        {"message_type": "message", "sender_id": "alice", "message": {"text": "hi"}}
+    ]
+
+
+def test_clients_with_different_codecs(agent_server):
+    """Test that a msgpack client and a JSON client each get frames in their own codec"""
+    if get_codec("msgpack") is JSON:
+        pytest.skip("msgpack not installed")
+
+    async def run():
+        async with agent_server() as (server, uri):
+            inboxes = {"binary": asyncio.Queue(), "text": asyncio.Queue()}
+            managers = {}
+            for agent_id, codec in (("binary", "msgpack"), ("text", "json")):
+                manager = ConnectionManager(agent_id, "test agent", [], batch=False, codec=codec, envelope=False)
+                manager.uri = uri
+                await manager.connect()
+                await manager.start_listening(inboxes[agent_id].put)
+                managers[agent_id] = manager
+            assert managers["binary"].codec.name == "msgpack"
+            assert managers["text"].codec is JSON
+
+            await managers["binary"].send({"message_type": "message", "recipient_id": "text",
+                                           "sender_id": "binary", "message": {"n": 1}})
+            await managers["text"].send({"message_type": "message", "recipient_id": "binary",
+                                         "sender_id": "text", "message": [1, 2]})
+            received = [await asyncio.wait_for(inboxes[agent_id].get(), 2) for agent_id in ("text", "binary")]
+            for manager in managers.values():
+                manager.task.cancel()
+                await manager.close()
+            return received
+
+    to_text, to_binary = asyncio.run(run())
+    assert to_text["message"] == {"n": 1} and to_text["sender_id"] == "binary"
+    assert to_binary["message"] == [1, 2] and to_binary["sender_id"] == "text"
+
+
+def test_envelope_header_is_read_without_the_body():
+    """Test that the routing header decodes on its own and the body round-trips with its codec"""
+    from communication_server.serialization import ENVELOPE, EnvelopeCodec, read_header
+
+    message = {"message_type": "message", "sender_id": "alice", "recipient_id": "bob",
+               "correlation_id": "c1", "message": {"text": "hi"}}
+    frame = ENVELOPE.encode(message)
+    assert read_header(frame) == {"message_type": "message", "sender_id": "alice", "recipient_id": "bob",
+                                  "correlation_id": "c1", "codec": "json"}
+    assert ENVELOPE.decode(frame) == message
+
+    # the header never depends on the body, even one that is not valid in any codec
+    assert read_header(frame[:frame.index(b'{"text"')] + b"\xff\x00garbage")["recipient_id"] == "bob"
+
+    msgpack_codec = get_codec("msgpack")
+    if msgpack_codec is not JSON:
+        binary = EnvelopeCodec(msgpack_codec).encode(message)
+        assert read_header(binary)["codec"] == "msgpack"
+        # the receiver decodes the body with the codec the sender named
+        assert ENVELOPE.decode(binary) == message
+
+
+def test_envelopes_are_relayed_zero_copy():
+    """Test that envelopes in a batch are split into views of the frame and relayed as such"""
+    from communication_server.serialization import ENVELOPE, read_header, split_envelopes
+
+    async def run():
+        server = AgentServer()
+        envelope_peer, json_peer = FakeWebSocket(), FakeWebSocket()
+        await server.dispatcher.open("envelope_peer", envelope_peer, codec=ENVELOPE)
+        await server.dispatcher.open("json_peer", json_peer, codec=JSON)
+
+        frame = ENVELOPE.pack_batch([
+            ENVELOPE.encode({"message_type": "message", "sender_id": "alice", "recipient_id": recipient,
+                             "in_reply_to": "c1", "message": recipient})
+            for recipient in ("envelope_peer", "json_peer")
+        ])
+        envelopes = split_envelopes(frame)
+        assert all(isinstance(view, memoryview) and view.obj is frame for view in envelopes)
+        for envelope in envelopes:
+            header = read_header(envelope)
+            await server.forward_message(header["message_type"], header["sender_id"], header["recipient_id"],
+                                         None, frame=envelope, codec=ENVELOPE,
+                                         in_reply_to=header.get("in_reply_to"))
+        await _settle()
+        await server.dispatcher.shutdown()
+        return envelopes, envelope_peer.sent, json_peer.sent
+
+    envelopes, relayed, reencoded = asyncio.run(run())
+    assert relayed[0] is envelopes[0]
+    assert [JSON.decode(frame) for frame in reencoded] == [
+        {"message_type": "message", "sender_id": "alice", "recipient_id": "json_peer",
+         "in_reply_to": "c1", "message": "json_peer"}
+    ]
@@ -0,0 +1,120 @@
+"""
+Tests for concurrent tool execution
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.tools import StructuredTool
+
+from common.agent.ToolExecutor import ToolExecutor, _is_async
+
+
+def _lookup(query: str) -> str:
+    """Sync tool that reports the thread it ran on"""
+    return threading.current_thread().name
+
+
+async def _alookup(query: str) -> str:
+    """Async tool"""
+    return query
+
+
+def test_sync_structured_tool_uses_the_pool():
+    """Test that a StructuredTool without a coroutine runs on the bounded tool pool"""
+    sync_tool = StructuredTool.from_function(func=_lookup, name="lookup")
+    async_tool = StructuredTool.from_function(coroutine=_alookup, name="alookup")
+    assert not _is_async(sync_tool)
+    assert _is_async(async_tool)
+
+    executor = ToolExecutor([sync_tool], max_workers=1, timeout=5)
+    try:
+        [message] = asyncio.run(executor.run([{"name": "lookup", "args": {"query": "x"}, "id": "1"}]))
+        assert message.content.startswith("tool")
+    finally:
+        executor.shutdown()
+
+
+def test_shutdown_stops_the_pool():
+    """Test that shutdown releases the pool's threads"""
+    executor = ToolExecutor([StructuredTool.from_function(func=_lookup, name="lookup")], max_workers=1)
+    asyncio.run(executor.run([{"name": "lookup", "args": {"query": "x"}, "id": "1"}]))
+    executor.shutdown()
+    assert executor.executor._shutdown
+    workers = [thread for thread in threading.enumerate() if thread.name.startswith("tool")]
+    for thread in workers:
+        thread.join(timeout=2)
+    assert not any(thread.is_alive() for thread in workers)
+
+
+def test_results_follow_the_tool_calls():
+    """Test that calls run concurrently and results come back in call order whatever finishes first"""
+    import time
+
+    def slow_sync(delay: float) -> str:
+        """Sync tool"""
+        time.sleep(delay)
+        return f"sync {delay}"
+
+    async def slow_async(delay: float) -> str:
+        """Async tool"""
+        await asyncio.sleep(delay)
+        return f"async {delay}"
+
+    executor = ToolExecutor([
+        StructuredTool.from_function(func=slow_sync, name="sync"),
+        StructuredTool.from_function(coroutine=slow_async, name="async"),
+    ], max_workers=4, timeout=5)
+    calls = [
+        {"name": "sync", "args": {"delay": 0.3}, "id": "1"},
+        {"name": "async", "args": {"delay": 0.2}, "id": "2"},
+        {"name": "sync", "args": {"delay": 0.0}, "id": "3"},
+        {"name": "missing", "args": {}, "id": "4"},
+        {"name": "async", "args": {"delay": 0.0}, "id": "5"},
+    ]
+    try:
+        started = time.perf_counter()
+        messages = asyncio.run(executor.run(calls))
+        elapsed = time.perf_counter() - started
+    finally:
+        executor.shutdown()
+
+    assert [message.tool_call_id for message in messages] == ["1", "2", "3", "4", "5"]
+    assert [message.content for message in messages] == [
+        "sync 0.3", "async 0.2", "sync 0.0", "Error: Tool 'missing' not found.", "async 0.0"
+    ]
+    assert elapsed < 0.45
+
+
+def test_each_call_has_its_own_timeout():
+    """Test that a slow or failing call becomes an error message without holding up the others"""
+    async def hang(query: str) -> str:
+        """Async tool that never finishes"""
+        await asyncio.Event().wait()
+
+    def fail(query: str) -> str:
+        """Sync tool that raises"""
+        raise RuntimeError("backend down")
+
+    executor = ToolExecutor([
+        StructuredTool.from_function(coroutine=hang, name="hang"),
+        StructuredTool.from_function(func=fail, name="fail"),
+        StructuredTool.from_function(coroutine=_alookup, name="alookup"),
+    ], max_workers=2, timeout=0.1)
+    try:
+        messages = asyncio.run(executor.run([
+            {"name": "hang", "args": {"query": "x"}, "id": "1"},
+            {"name": "fail", "args": {"query": "x"}, "id": "2"},
+            {"name": "alookup", "args": {"query": "ok"}, "id": "3"},
+        ]))
+    finally:
+        executor.shutdown()
+
+    assert messages[0].content == "Error executing hang: timed out after 0.1 seconds"
+    assert messages[1].content == "Error executing fail: backend down"
+    assert messages[2].content == "ok"
@@ -0,0 +1,99 @@
+"""
+Tests for the keyed worker pool agents process incoming tasks with
+"""
+
+import asyncio
+import os
+import sys
+
+# Add repository root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from common.WorkerPool import WorkerPool, sender_key
+
+
+def _message(sender, n):
+    return {"sender_id": sender, "message": n}
+
+
+def test_tasks_of_one_sender_run_in_order():
+    """Test that a sender's tasks never overlap and run in queue order while senders run in parallel"""
+    async def run():
+        running, order = [], []
+        max_parallel = 0
+
+        async def handle(task):
+            nonlocal max_parallel
+            sender = task["sender_id"]
+            assert sender not in running
+            running.append(sender)
+            max_parallel = max(max_parallel, len(running))
+            await asyncio.sleep(0.01)
+            order.append((sender, task["message"]))
+            running.remove(sender)
+
+        pool = WorkerPool(handle, concurrency=4)
+        pool.start()
+        for n in range(5):
+            for sender in ("a", "b", "c"):
+                await pool.put(_message(sender, n))
+        await pool.join()
+        await pool.shutdown()
+        return order, max_parallel, pool.metrics()
+
+    order, max_parallel, metrics = asyncio.run(run())
+    for sender in ("a", "b", "c"):
+        assert [n for s, n in order if s == sender] == list(range(5))
+    assert max_parallel == 3
+    assert metrics["completed"] == 15 and metrics["failed"] == 0 and metrics["queued"] == 0
+
+
+def test_busy_sender_does_not_starve_others():
+    """Test that one worker serves the keys round-robin instead of draining the busiest first"""
+    async def run():
+        order = []
+
+        async def handle(task):
+            order.append(task["sender_id"])
+
+        pool = WorkerPool(handle, concurrency=1)
+        for n in range(4):
+            await pool.put(_message("busy", n))
+        await pool.put(_message("quiet", 0))
+        await pool.put(_message("other", 0))
+        pool.start()
+        await pool.join()
+        await pool.shutdown()
+        return order
+
+    assert asyncio.run(run()) == ["busy", "quiet", "other", "busy", "busy", "busy"]
+
+
+def test_failed_task_does_not_stop_its_lane():
+    """Test that a failing task is counted and the sender's next task still runs"""
+    async def run():
+        done = []
+
+        async def handle(task):
+            if task["message"] == 0:
+                raise ValueError("boom")
+            done.append(task["message"])
+
+        pool = WorkerPool(handle, concurrency=2)
+        pool.start()
+        await pool.put(_message("a", 0))
+        await pool.put(_message("a", 1))
+        await pool.join()
+        await pool.shutdown()
+        return done, pool.metrics()
+
+    done, metrics = asyncio.run(run())
+    assert done == [1]
+    assert metrics["failed"] == 1 and metrics["completed"] == 1
+
+
+def test_sender_key():
+    """Test how messages are keyed"""
+    assert sender_key({"sender_id": "a", "agent_id": "x"}) == "a"
+    assert sender_key({"message_type": "registration", "agent_id": "x"}) == "x"
+    assert sender_key("typed by the user") == "user"